@@ -0,0 +1,263 @@
+import os
+import uuid
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Dict, Any, BinaryIO, Iterator
+
+from .models import PluginBuild
+from .artifact_store import get_artifact_store, ENCODING_SUFFIXES
+from .metadata_publisher import PUBLIC_DIR
+from .storage import StorageBackend, get_storage, guess_content_type
+from .metrics import ARTIFACT_CACHE_REQUESTS
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+# Preferred first when a client accepts several encodings
+ENCODING_PREFERENCE = ("br", "gzip")
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+
+def accepted_encodings(accept_encoding: str) -> set:
+    """Content codings an Accept-Encoding header allows (q=0 excludes one)"""
+    accepted = set()
+    for item in accept_encoding.split(","):
+        coding, *params = [part.strip() for part in item.split(";")]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding and quality > 0:
+            accepted.add(coding.lower())
+    return accepted
+
+
+class ArtifactCache:
+    """Bounded on-disk LRU cache of object storage blobs for the artifact route
+
+    Blobs are content addressed, so a cached copy never goes stale and entries only leave
+    when the cache grows past max_bytes, least recently served first. Objects larger than
+    max_object_bytes are streamed from storage instead of flushing the cache. Concurrent
+    misses for one blob download it once. Copies are handed out as files opened under the
+    index lock, so evicting an entry never pulls it out from under a response still reading
+    it. The index is rebuilt from the directory on start, so the cache survives restarts.
+    """
+
+    def __init__(self, cache_dir: str = None, max_bytes: int = None, max_object_bytes: int = None,
+                 client: Optional[StorageBackend] = None):
+        if cache_dir is None:
+            cache_dir = os.environ.get("ARTIFACT_CACHE_DIR", "/tmp/plugin_build/artifact-cache")
+        if max_bytes is None:
+            max_bytes = int(os.environ.get("ARTIFACT_CACHE_MAX_BYTES", str(512 * 1024 ** 2)))
+        if max_object_bytes is None:
+            max_object_bytes = int(os.environ.get("ARTIFACT_CACHE_MAX_OBJECT_BYTES", str(64 * 1024 ** 2)))
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.max_object_bytes = min(max_object_bytes, max_bytes)
+        self.client = client or get_storage()
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._fetching: Dict[str, threading.Lock] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._load()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key
+
+    def _load(self):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        found = []
+        for path in self.cache_dir.rglob("*"):
+            if not path.is_file():
+                continue
+            if path.name.endswith(".part"):
+                # Left behind by a download that was interrupted
+                path.unlink(missing_ok=True)
+                continue
+            stat = path.stat()
+            found.append((stat.st_atime, path.relative_to(self.cache_dir).as_posix(), stat.st_size))
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._bytes += size
+        with self._lock:
+            self._evict()
+
+    def _evict(self):
+        # The most recent entry stays even if it alone exceeds the budget; it is being served
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            key, size = self._entries.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+            self._path(key).unlink(missing_ok=True)
+
+    def _open_hit(self, key: str) -> Optional[BinaryIO]:
+        if key not in self._entries:
+            return None
+        try:
+            handle = open(self._path(key), "rb")
+        except FileNotFoundError:
+            # Removed behind the cache's back; download it again
+            self._bytes -= self._entries.pop(key)
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        ARTIFACT_CACHE_REQUESTS.inc(outcome="hit")
+        return handle
+
+    def get(self, key: str, size: int) -> Optional[BinaryIO]:
+        """Open the local copy of a blob, downloading it on a miss; None if it is too large to cache
+
+        The caller owns the returned file and must close it.
+        """
+        if size > self.max_object_bytes:
+            ARTIFACT_CACHE_REQUESTS.inc(outcome="bypass")
+            return None
+        with self._lock:
+            handle = self._open_hit(key)
+            if handle is not None:
+                return handle
+            fetch_lock = self._fetching.setdefault(key, threading.Lock())
+
+        with fetch_lock:
+            with self._lock:
+                handle = self._open_hit(key)
+                if handle is not None:
+                    return handle
+                self.misses += 1
+            ARTIFACT_CACHE_REQUESTS.inc(outcome="miss")
+            path = self._path(key)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}.part")
+            try:
+                with open(tmp_path, "wb") as out:
+                    for chunk in self.client.iter_object(key):
+                        out.write(chunk)
+                os.replace(tmp_path, path)
+            except BaseException:
+                tmp_path.unlink(missing_ok=True)
+                with self._lock:
+                    self._fetching.pop(key, None)
+                raise
+            # Indexed before the fetch lock goes away, so a later miss finds the entry instead of downloading again
+            with self._lock:
+                self._fetching.pop(key, None)
+                handle = open(path, "rb")
+                self._entries[key] = os.fstat(handle.fileno()).st_size
+                self._bytes += self._entries[key]
+                self._evict()
+            return handle
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "cache_dir": str(self.cache_dir),
+                "entries": len(self._entries),
+                "size_bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+def resolve_artifact(build: PluginBuild, path: str, accept_encoding: str = "") -> Dict[str, Any]:
+    """Find one file of a build's published output
+
+    Local plugins are read from their public directory. Remote plugins are looked up in the
+    bundle manifest and then the dataset manifest, choosing a precompressed variant the client
+    accepts; the blob is then served from the artifact cache or, when too large for it,
+    streamed from storage. Returns a dict with "file" (a local path), "handle" (an open
+    cached copy the caller must close) or neither (stream "blob" from storage), plus the
+    size, content type, encoding and ETag. Raises LookupError if the build has no such file.
+    """
+    component = build.component_entry or {}
+    if not component.get("expose"):
+        raise LookupError("Build has no published output")
+
+    if component.get("is_local"):
+        root = (PUBLIC_DIR / component["expose"]).resolve()
+        file_path = (root / path).resolve()
+        if root not in file_path.parents or not file_path.is_file():
+            raise LookupError(f"File not found in build artifacts: {path}")
+        stat = file_path.stat()
+        return {
+            "file": file_path,
+            "stat": stat,
+            "size": stat.st_size,
+            "content_type": guess_content_type(file_path),
+            "encoding": None,
+            "etag": f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"',
+        }
+
+    store = get_artifact_store()
+    names = [f"{component['expose']}.bundle"]
+    if build.s3_path:
+        dataset_name = store.manifest_name_from_s3_path(build.s3_path)
+        if dataset_name:
+            names.append(dataset_name)
+    entry = None
+    for name in names:
+        entry = store.resolve(f"{name}/{path}")
+        if entry is not None:
+            break
+    if entry is None:
+        raise LookupError(f"File not found in build artifacts: {path}")
+
+    accepted = accepted_encodings(accept_encoding)
+    variants = entry.get("encodings", {})
+    encoding = next((coding for coding in ENCODING_PREFERENCE if coding in accepted and coding in variants), None)
+    blob, size = (variants[encoding]["blob"], variants[encoding]["size"]) if encoding else (entry["blob"], entry["size"])
+    etag = entry["sha256"][:32] + (ENCODING_SUFFIXES[encoding].replace(".", "-") if encoding else "")
+
+    artifact = {
+        "file": None,
+        "blob": blob,
+        "size": size,
+        "content_type": entry["content_type"],
+        "encoding": encoding,
+        "etag": f'"{etag}"',
+    }
+    # The local storage backend already holds plain files; only remote objects go through the cache
+    local = store.client.local_path(blob)
+    if local is not None:
+        try:
+            artifact.update(file=local, stat=local.stat())
+        except FileNotFoundError:
+            # Deleted since the lookup; stream it, which reports the object as missing
+            pass
+    else:
+        artifact["handle"] = get_artifact_cache().get(blob, size)
+    return artifact
+
+
+def iter_file(handle: BinaryIO, start: int, end: int, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+    """Yield bytes start..end (inclusive) of an open file, closing it when done"""
+    with handle:
+        handle.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = handle.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+artifact_cache = None
+
+def get_artifact_cache() -> ArtifactCache:
+    """Get the global artifact cache instance"""
+    global artifact_cache
+    if artifact_cache is None:
+        artifact_cache = ArtifactCache()
+    return artifact_cache
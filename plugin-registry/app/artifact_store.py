@@ -0,0 +1,370 @@
+import os
+import zlib
+import gzip
+import json
+import shutil
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path, PurePosixPath
+from typing import Optional, Dict, Any, Tuple
+
+from .logger import get_logger
+from .storage import StorageBackend, ObjectNotFound, get_storage, guess_content_type
+from .workspaces import claim_workspace, release_workspace
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; without it only gzip variants are produced
+    brotli = None
+
+logger = get_logger(__name__)
+
+BLOB_PREFIX = "blobs"
+MANIFEST_PREFIX = "manifests"
+# Remote bundles are published as the <expose>.bundle manifest; the portal loads BUNDLE_ENTRY from it
+BUNDLE_SUFFIX = ".bundle"
+BUNDLE_ENTRY = "my-app.umd.js"
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Blobs are addressed by content, so they can be cached forever
+IMMUTABLE_CACHE_CONTROL = f"public, max-age={int(os.getenv('ARTIFACT_MAX_AGE', str(365 * 24 * 3600)))}, immutable"
+COMPRESS_MIN_BYTES = int(os.getenv("ARTIFACT_COMPRESS_MIN_BYTES", "1024"))
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml", "application/xml")
+ENCODING_SUFFIXES = {"gzip": ".gz", "br": ".br"}
+
+
+def is_compressible(content_type: str, size: int) -> bool:
+    return size >= COMPRESS_MIN_BYTES and content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def compress_file(file_path: Path, encoding: str, output_path: Path):
+    """Write the gzip or brotli encoding of file_path to output_path"""
+    data = file_path.read_bytes()
+    if encoding == "gzip":
+        # mtime=0 keeps the output deterministic for identical inputs
+        compressed = gzip.compress(data, compresslevel=9, mtime=0)
+    else:
+        compressed = brotli.compress(data, quality=11)
+    output_path.write_bytes(compressed)
+
+
+def file_checksums(file_path: Path) -> Tuple[str, int]:
+    """sha256 (the blob address) and CRC-32 (needed to zip the file) in a single read"""
+    digest = hashlib.sha256()
+    crc = 0
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+            crc = zlib.crc32(chunk, crc)
+    return digest.hexdigest(), crc
+
+
+def manifest_blob_keys(manifest: Dict[str, Any]) -> set:
+    """Every blob a manifest references, including its compressed variants"""
+    keys = set()
+    for entry in manifest.get("files", {}).values():
+        keys.add(entry["blob"])
+        for variant in entry.get("encodings", {}).values():
+            keys.add(variant["blob"])
+    return keys
+
+
+class ArtifactStore:
+    """Content-addressed artifact storage in the configured storage backend
+
+    Every file is stored once as blobs/<sha[:2]>/<sha><suffix>, and each published tree
+    gets a manifest at manifests/<name>.json mapping its logical paths to blobs. Publishing
+    only uploads blobs the bucket does not already have. Manifests are immutable, so they
+    are cached in memory once read.
+    """
+
+    def __init__(self, client: Optional[StorageBackend] = None, manifest_cache_size: int = 256):
+        self.client = client or get_storage()
+        self._known_blobs = set()
+        self._manifests: "OrderedDict[str, Optional[Dict[str, Any]]]" = OrderedDict()
+        self._manifest_cache_size = manifest_cache_size
+        self._lock = threading.Lock()
+        # Publishes share the store; garbage collection needs it exclusively (see exclusive())
+        self._gc_condition = threading.Condition()
+        self._publishing = 0
+        self._collecting = False
+
+    @staticmethod
+    def blob_key(sha256: str, suffix: str = "") -> str:
+        return f"{BLOB_PREFIX}/{sha256[:2]}/{sha256}{suffix.lower()}"
+
+    @staticmethod
+    def manifest_key(name: str) -> str:
+        return f"{MANIFEST_PREFIX}/{name}.json"
+
+    def s3_path(self, name: str) -> str:
+        return self.client.s3_path(self.manifest_key(name))
+
+    def _blob_exists(self, key: str) -> bool:
+        with self._lock:
+            if key in self._known_blobs:
+                return True
+        exists = self.client.object_exists(key)
+        if exists:
+            with self._lock:
+                self._known_blobs.add(key)
+        return exists
+
+    def _describe(self, file_path: Path, relative_path: str) -> Tuple[str, Dict[str, Any]]:
+        sha256, crc32 = file_checksums(file_path)
+        blob = self.blob_key(sha256, file_path.suffix)
+        size = file_path.stat().st_size
+        content_type = guess_content_type(file_path)
+        entry = {
+            "blob": blob,
+            "sha256": sha256,
+            "crc32": crc32,
+            "size": size,
+            "content_type": content_type,
+        }
+        if is_compressible(content_type, size):
+            entry["encodings"] = {
+                encoding: {"blob": blob + suffix}
+                for encoding, suffix in ENCODING_SUFFIXES.items()
+                if encoding != "br" or brotli is not None
+            }
+        return relative_path, entry
+
+    def _compress_variants(self, file_path: Path, entry: Dict[str, Any], work_dir: Path) -> list:
+        """Precompress a blob once at publish time; return upload jobs for variants worth keeping"""
+        jobs = []
+        for encoding, variant in list(entry.get("encodings", {}).items()):
+            output_path = work_dir / Path(variant["blob"]).name
+            compress_file(file_path, encoding, output_path)
+            compressed_size = output_path.stat().st_size
+            if compressed_size >= entry["size"] * 0.9:
+                # Not worth serving an encoded variant that barely saves anything
+                del entry["encodings"][encoding]
+                continue
+            variant["size"] = compressed_size
+            jobs.append((output_path, variant["blob"], {
+                "ContentType": entry["content_type"],
+                "ContentEncoding": encoding,
+                "CacheControl": IMMUTABLE_CACHE_CONTROL,
+            }))
+        if not entry.get("encodings"):
+            entry.pop("encodings", None)
+        return jobs
+
+    @contextmanager
+    def _publish_guard(self):
+        with self._gc_condition:
+            while self._collecting:
+                self._gc_condition.wait()
+            self._publishing += 1
+        try:
+            yield
+        finally:
+            with self._gc_condition:
+                self._publishing -= 1
+                self._gc_condition.notify_all()
+
+    @contextmanager
+    def exclusive(self):
+        """Block publishes while garbage collection decides which blobs are unreferenced
+
+        A publish may skip uploading a blob because it already exists; sweeping that blob
+        before the publish writes its manifest would leave the manifest dangling.
+        """
+        with self._gc_condition:
+            while self._collecting or self._publishing:
+                self._gc_condition.wait()
+            self._collecting = True
+        try:
+            yield
+        finally:
+            with self._gc_condition:
+                self._collecting = False
+                self._gc_condition.notify_all()
+
+    def forget(self, keys):
+        """Drop deleted blobs and manifests from the in-memory caches"""
+        with self._lock:
+            for key in keys:
+                self._known_blobs.discard(key)
+                if key.startswith(f"{MANIFEST_PREFIX}/") and key.endswith(".json"):
+                    self._manifests.pop(key[len(MANIFEST_PREFIX) + 1:-len(".json")], None)
+
+    def publish_directory(self, local_path: str, name: str) -> Dict[str, Any]:
+        """Store a directory tree as blobs plus a manifest, uploading only blobs the bucket lacks"""
+        with self._publish_guard():
+            return self._publish_directory(Path(local_path), name)
+
+    def _publish_directory(self, local_path: Path, name: str) -> Dict[str, Any]:
+        if not local_path.exists():
+            raise FileNotFoundError(f"Local path does not exist: {local_path}")
+
+        sources = {}
+        for root, dirs, files in os.walk(local_path):
+            for file in files:
+                file_path = Path(root) / file
+                sources[file_path.relative_to(local_path).as_posix()] = file_path
+
+        with ThreadPoolExecutor(max_workers=self.client.upload_workers, thread_name_prefix="artifact-hash") as executor:
+            files = dict(executor.map(lambda item: self._describe(item[1], item[0]), sources.items()))
+
+            # One upload per distinct blob, and only for blobs the bucket does not have yet
+            blob_sources = {}
+            for relative_path, entry in files.items():
+                blob_sources.setdefault(entry["blob"], (sources[relative_path], entry))
+            exists = dict(zip(blob_sources, executor.map(self._blob_exists, blob_sources)))
+
+            jobs = [
+                (file_path, key, {"ContentType": entry["content_type"], "CacheControl": IMMUTABLE_CACHE_CONTROL})
+                for key, (file_path, entry) in blob_sources.items()
+                if not exists[key]
+            ]
+
+            work_dir = Path(tempfile.mkdtemp(prefix="artifact_variants_"))
+            claim_workspace(work_dir)
+            try:
+                # Compressed variants are produced once per new blob; stored blobs already have theirs
+                new_blobs = [blob_sources[key] for _, key, _ in jobs]
+                for variant_jobs in executor.map(lambda item: self._compress_variants(item[0], item[1], work_dir), new_blobs):
+                    jobs.extend(variant_jobs)
+                for key, (file_path, entry) in blob_sources.items():
+                    if exists[key] and "encodings" in entry:
+                        self._prune_missing_variants(entry)
+
+                report = self.client.upload_files(jobs)
+            finally:
+                shutil.rmtree(work_dir, ignore_errors=True)
+                release_workspace(work_dir)
+
+        if report["failed"]:
+            raise RuntimeError(f"Failed to upload {len(report['failed'])} blobs: {report['failed'][:5]}")
+        with self._lock:
+            self._known_blobs.update(key for _, key, _ in jobs)
+        # Entries for the same blob under other paths share the variants computed above
+        for relative_path, entry in files.items():
+            canonical = blob_sources[entry["blob"]][1]
+            if canonical is not entry:
+                if "encodings" in canonical:
+                    entry["encodings"] = canonical["encodings"]
+                else:
+                    entry.pop("encodings", None)
+
+        manifest = {
+            "name": name,
+            "created_at": datetime.utcnow().isoformat(),
+            "files": files,
+        }
+        self.client.put_object(self.manifest_key(name), json.dumps(manifest, indent=2).encode(), "application/json")
+        self._cache_manifest(name, manifest)
+
+        total_bytes = sum(entry["size"] for entry in files.values())
+        new_blobs = sum(1 for key in blob_sources if not exists[key])
+        report.update({
+            "s3_path": self.s3_path(name),
+            "manifest": self.manifest_key(name),
+            "files": len(files),
+            "new_blobs": new_blobs,
+            "reused_blobs": len(blob_sources) - new_blobs,
+            "encoded_variants": len(jobs) - new_blobs,
+            "total_bytes": total_bytes,
+        })
+        logger.info(
+            f"Published {len(files)} files as {name}: {new_blobs} new blobs and "
+            f"{report['encoded_variants']} encoded variants ({report['bytes']} bytes), "
+            f"{report['reused_blobs']} already stored ({total_bytes} bytes logical) in {report['seconds']}s"
+        )
+        return report
+
+    def _prune_missing_variants(self, entry: Dict[str, Any]):
+        """Drop encodings of an already stored blob that were never uploaded (e.g. brotli added later)"""
+        for encoding, variant in list(entry["encodings"].items()):
+            if not self._blob_exists(variant["blob"]):
+                del entry["encodings"][encoding]
+        if not entry["encodings"]:
+            del entry["encodings"]
+
+    def _cache_manifest(self, name: str, manifest: Optional[Dict[str, Any]]):
+        with self._lock:
+            self._manifests[name] = manifest
+            self._manifests.move_to_end(name)
+            while len(self._manifests) > self._manifest_cache_size:
+                self._manifests.popitem(last=False)
+
+    def load_manifest(self, name: str) -> Optional[Dict[str, Any]]:
+        """Return the manifest published under name, or None if there is none"""
+        with self._lock:
+            if name in self._manifests:
+                self._manifests.move_to_end(name)
+                manifest = self._manifests[name]
+                if manifest is not None:
+                    return manifest
+        try:
+            manifest = json.loads(self.client.get_object_bytes(self.manifest_key(name)))
+        except ObjectNotFound:
+            return None
+        self._cache_manifest(name, manifest)
+        return manifest
+
+    def bundle_exists(self, name: str) -> bool:
+        """Check storage, bypassing the caches, for the bundle a remote build published as name
+
+        The manifest and the blob of its entry file must both be present. Builds from before
+        content-addressed storage uploaded the bundle under the <name>/ prefix instead.
+        """
+        try:
+            manifest = json.loads(self.client.get_object_bytes(self.manifest_key(name + BUNDLE_SUFFIX)))
+        except ObjectNotFound:
+            return self.client.object_exists(f"{name}/{BUNDLE_ENTRY}")
+        entry = manifest["files"].get(BUNDLE_ENTRY)
+        return entry is not None and self.client.object_exists(entry["blob"])
+
+    def manifest_name_from_s3_path(self, s3_path: str) -> Optional[str]:
+        """Extract the manifest name from a build's s3_path, if it points at a manifest"""
+        key = s3_path.replace("s3://", "").split("/", 1)[-1]
+        if key.startswith(f"{MANIFEST_PREFIX}/") and key.endswith(".json"):
+            return key[len(MANIFEST_PREFIX) + 1:-len(".json")]
+        return None
+
+    def resolve(self, object_name: str) -> Optional[Dict[str, Any]]:
+        """Resolve '<name>/<logical path>' to its manifest entry"""
+        parts = PurePosixPath(object_name).parts
+        if len(parts) < 2:
+            return None
+        manifest = self.load_manifest(parts[0])
+        if manifest is None:
+            return None
+        return manifest["files"].get("/".join(parts[1:]))
+
+    def get_public_url(self, object_name: str, encoding: Optional[str] = None) -> str:
+        """Public URL for '<name>/<logical path>', resolved through the manifest when there is one
+
+        With an encoding ("gzip" or "br") the precompressed variant is returned when it exists;
+        it is served with a matching Content-Encoding so browsers decode it transparently.
+        """
+        entry = self.resolve(object_name)
+        if entry is not None:
+            variant = entry.get("encodings", {}).get(encoding) if encoding else None
+            return self.client.get_public_url(variant["blob"] if variant else entry["blob"])
+        return self.client.get_public_url(object_name)
+
+    def public_urls(self, name: str) -> Dict[str, str]:
+        """Public URLs of every file in a manifest, keyed by logical path"""
+        manifest = self.load_manifest(name)
+        if manifest is None:
+            return {}
+        return {path: self.client.get_public_url(entry["blob"]) for path, entry in manifest["files"].items()}
+
+
+artifact_store = None
+
+def get_artifact_store() -> ArtifactStore:
+    """Get the global artifact store instance"""
+    global artifact_store
+    if artifact_store is None:
+        artifact_store = ArtifactStore()
+    return artifact_store
@@ -0,0 +1,145 @@
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from .models import (
+    Plugin, PluginBuild, BuildBatch, BuildBatchCreate, BuildStatus,
+    TERMINAL_BUILD_STATUSES
+)
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+GIT_URL_PREFIXES = ("git@", "https://", "http://")
+
+
+def _latest_builds(session: Session) -> Dict[str, PluginBuild]:
+    latest = {}
+    for build in session.query(PluginBuild).order_by(PluginBuild.created_at):
+        latest[build.plugin_id] = build
+    return latest
+
+
+def select_plugins(session: Session, request: BuildBatchCreate) -> List[Plugin]:
+    """Plugins named by plugin_ids or matched by the filter, most recently used first
+
+    A plugin's last use is its most recent build, or its last update if it was never built.
+    Raises LookupError for unknown plugin_ids and ValueError if neither selector is given.
+    """
+    latest = _latest_builds(session)
+    if request.plugin_ids is not None:
+        plugins = session.query(Plugin).filter(Plugin.id.in_(request.plugin_ids)).all()
+        missing = sorted(set(request.plugin_ids) - {plugin.id for plugin in plugins})
+        if missing:
+            raise LookupError(f"Plugins not found: {', '.join(missing)}")
+    elif request.filter is not None:
+        criteria = request.filter
+        query = session.query(Plugin)
+        if criteria.name_contains:
+            query = query.filter(Plugin.name.contains(criteria.name_contains))
+        plugins = []
+        for plugin in query.all():
+            is_local = not (plugin.repository_url or "").startswith(GIT_URL_PREFIXES)
+            if criteria.is_local is not None and is_local != criteria.is_local:
+                continue
+            last_build = latest.get(plugin.id)
+            if criteria.last_status is not None and (last_build is None or last_build.status != criteria.last_status):
+                continue
+            plugins.append(plugin)
+    else:
+        raise ValueError("Give plugin_ids or a filter")
+
+    def last_used(plugin: Plugin) -> datetime:
+        last_build = latest.get(plugin.id)
+        return last_build.created_at if last_build is not None else plugin.updated_at or plugin.created_at
+
+    return sorted(plugins, key=last_used, reverse=True)
+
+
+def create_batch(session: Session, request: BuildBatchCreate) -> Tuple[BuildBatch, List[Dict[str, str]]]:
+    """Queue one build per selected plugin under a new batch
+
+    The builds get consecutive created_at values in most-recently-used order, which is the
+    order the scheduler's FIFO queue hands them to its workers. Plugins that already have a
+    build waiting in the queue are skipped, since that build will pick up the same changes.
+    Returns the batch and the skipped plugins.
+    """
+    plugins = select_plugins(session, request)
+    queued = {
+        plugin_id for (plugin_id,) in session.query(PluginBuild.plugin_id)
+        .filter(PluginBuild.status == BuildStatus.PENDING.value)
+    }
+
+    batch = BuildBatch(selection=request.model_dump(exclude_none=True))
+    session.add(batch)
+    session.flush()
+
+    now = datetime.utcnow()
+    skipped = []
+    position = 0
+    for plugin in plugins:
+        if plugin.id in queued:
+            skipped.append({"plugin_id": plugin.id, "name": plugin.name, "reason": "A build is already queued"})
+            continue
+        session.add(PluginBuild(
+            plugin_id=plugin.id,
+            build_id=str(uuid.uuid4()),
+            status=BuildStatus.PENDING.value,
+            batch_id=batch.id,
+            created_at=now + timedelta(microseconds=position),
+        ))
+        position += 1
+    session.commit()
+    logger.info(f"Queued batch {batch.id}: {position} builds, {len(skipped)} plugins skipped")
+    return batch, skipped
+
+
+def batch_summary(session: Session, batch: BuildBatch) -> Dict[str, Any]:
+    """Aggregate progress of a batch: counts per status, share finished and total duration"""
+    rows = (
+        session.query(PluginBuild, Plugin.name)
+        .join(Plugin, Plugin.id == PluginBuild.plugin_id)
+        .filter(PluginBuild.batch_id == batch.id)
+        .order_by(PluginBuild.created_at)
+        .all()
+    )
+    counts = dict(
+        session.query(PluginBuild.status, func.count())
+        .filter(PluginBuild.batch_id == batch.id)
+        .group_by(PluginBuild.status)
+        .all()
+    )
+    total = len(rows)
+    finished = sum(count for status, count in counts.items() if status in TERMINAL_BUILD_STATUSES)
+    done = finished == total
+    started = [build.started_at for build, _ in rows if build.started_at]
+    finished_at = max((build.finished_at for build, _ in rows if build.finished_at), default=None) if done else None
+    end = finished_at or (batch.created_at if not total else datetime.utcnow())
+
+    return {
+        "batch_id": batch.id,
+        "selection": batch.selection,
+        "total": total,
+        "counts": counts,
+        "finished": finished,
+        "progress": round(finished / total, 4) if total else 1.0,
+        "done": done,
+        "created_at": batch.created_at,
+        "started_at": min(started, default=None),
+        "finished_at": finished_at,
+        "duration_seconds": round((end - batch.created_at).total_seconds(), 3),
+        "builds": [
+            {
+                "build_id": build.build_id,
+                "plugin_id": build.plugin_id,
+                "name": name,
+                "status": build.status,
+                "started_at": build.started_at,
+                "finished_at": build.finished_at,
+            }
+            for build, name in rows
+        ],
+    }
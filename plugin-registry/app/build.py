@@ -5,21 +5,52 @@ import shutil
 import tempfile
 import uuid
 import json
+import hashlib
+import logging
+import time
 from pathlib import Path
 from typing import Optional, Dict, Any
 from urllib.parse import quote
 
 from sparc_me import Dataset
 from .logger import get_logger
-from .minio_client import get_minio_client
+from .artifact_store import get_artifact_store
+from .metadata_publisher import PUBLIC_DIR
+from .releases import get_release_manager
+from .npm_cache import get_npm_cache, get_node_version, get_npm_version
+from .git_mirror import get_git_mirror_cache, normalize_repo_url
+from .build_logs import BuildLog, run_logged
+from .build_daemon import get_build_daemon
+from .build_control import BuildControl, BuildCancelled, StepTimedOut, step_timeouts, time_left
+from .metrics import StepTimer
+from .fsutils import link_tree
+from .workspaces import claim_workspace, release_workspace
+from .rewriter import BundleRewriter
+from .source_archives import source_path
+from .dataset_skeleton import get_dataset_skeleton_cache
+from .models import PluginBuild, BuildStatus, SessionLocal
 from sqlalchemy.orm import Session
 
 logger = get_logger(__name__)
 
+
+# Regex pattern to match name field with single or double quotes
+VITE_NAME_PATTERN = re.compile(r'name:\s*["\']([^"\']*)["\']', re.IGNORECASE)
+VITE_CONFIG_FILES = {"vite.config.js", "vite.config.ts"}
+
+# Directories that never contribute to a build fingerprint
+FINGERPRINT_IGNORE = {"node_modules", "dist", "build", ".git"}
+# Public base URL of this registry; when set, remote bundles are loaded through its /artifacts route
+ARTIFACT_BASE_URL = os.environ.get("ARTIFACT_BASE_URL", "").rstrip("/")
+
 class PluginBuilder:
     """Handles building plugins using git CLI and npm"""
     
-    def __init__(self, dataset_dir: str = None, db: Optional[Session] = None):
+    def __init__(self,
+                 dataset_dir: str = None,
+                 db: Optional[Session] = None,
+                 build_id: Optional[str] = None,
+                 control: Optional[BuildControl] = None):
         if dataset_dir is None:
             # Use environment variable or default to ./datasets for local, /datasets for Docker
             dataset_dir = os.environ.get("DATASET_DIR", "./datasets")
@@ -28,22 +59,46 @@ class PluginBuilder:
         self.dataset_dir = Path(dataset_dir)
         self.dataset_dir.mkdir(parents=True, exist_ok=True)
         self.db = db
+        self.build_log = BuildLog(build_id)
+        self.control = control or BuildControl()
+        self.timeouts = step_timeouts(None)
+
+    def _log(self, message: str, level: int = logging.INFO):
+        """Log a message and append it to the live build log"""
+        logger.log(level, message)
+        self.build_log.write(message)
   
-    def clone_repository(self, repo_url: str, branch: str = "main") -> Path:
-        """Clone a git repository to a temporary directory"""
+    def clone_repository(self, repo_url: str, branch: str = "main", expected_sha: Optional[str] = None) -> Path:
+        """Check out a git repository into a temporary directory via the local mirror cache"""
+        clone_dir = Path(tempfile.gettempdir()) / f"plugin_build_{uuid.uuid4().hex[:8]}"
+        repo_url = normalize_repo_url(repo_url)
+        claim_workspace(clone_dir)
+        # The mirror update, the checkout and any fallback clone share the step's time budget
+        timeout = self.timeouts.get("clone")
+        deadline = time.monotonic() + timeout if timeout else None
         try:
-  
-            clone_dir = Path(tempfile.gettempdir()) / f"plugin_build_{uuid.uuid4().hex[:8]}"
-            clone_dir.mkdir(exist_ok=True)
-            if not repo_url.endswith(".git"):
-                repo_url = repo_url + ".git"
             logger.info(f"Cloning repository: {repo_url} to {clone_dir}")
+            sha = get_git_mirror_cache().checkout(
+                repo_url, branch, clone_dir, expected_sha,
+                deadline=deadline, log=self.build_log, control=self.control
+            )
+            logger.info(f"Successfully cloned repository to {clone_dir} at {sha[:12]}")
+            return clone_dir
             
-            subprocess.run(
-                ["git", "clone", "--branch", branch, repo_url, str(clone_dir)],
-                capture_output=True,
-                text=True,
-                check=True
+        except (BuildCancelled, StepTimedOut):
+            shutil.rmtree(clone_dir, ignore_errors=True)
+            release_workspace(clone_dir)
+            raise
+        except subprocess.CalledProcessError as e:
+            logger.warning(f"Mirror checkout failed, falling back to a shallow clone: {e.stderr}")
+            shutil.rmtree(clone_dir, ignore_errors=True)
+        
+        try:
+            run_logged(
+                ["git", "clone", "--depth", "1", "--branch", branch, repo_url, str(clone_dir)],
+                log=self.build_log,
+                timeout=time_left(deadline, "git clone"),
+                control=self.control
             )
             
             logger.info(f"Successfully cloned repository to {clone_dir}")
@@ -53,8 +108,33 @@ class PluginBuilder:
             logger.error(f"Failed to clone repository: {e}")
             logger.error(f"stdout: {e.stdout}")
             logger.error(f"stderr: {e.stderr}")
+            release_workspace(clone_dir)
             raise RuntimeError(f"Git clone failed: {e}")
+        except (BuildCancelled, StepTimedOut):
+            shutil.rmtree(clone_dir, ignore_errors=True)
+            release_workspace(clone_dir)
+            raise
     
+    def snapshot_local_project(self, source_dir: Path) -> Path:
+        """Snapshot a local plugin or unpacked source archive into a private build workspace
+
+        Files are reflinked where the filesystem supports it and copied otherwise (never
+        hardlinked), so every build can rewrite its config and write dist/ and node_modules/
+        independently; node_modules comes from the npm cache instead of the source tree.
+        """
+        if not source_dir.is_dir():
+            raise RuntimeError(f"Source directory does not exist: {source_dir}")
+        workspace_dir = Path(tempfile.gettempdir()) / f"plugin_build_{uuid.uuid4().hex[:8]}"
+        claim_workspace(workspace_dir)
+        try:
+            counts = link_tree(source_dir, workspace_dir, ignore=FINGERPRINT_IGNORE, allow_hardlink=False)
+            logger.info(f"Snapshot of {source_dir} created in {workspace_dir}: {counts}")
+            return workspace_dir
+        except Exception:
+            shutil.rmtree(workspace_dir, ignore_errors=True)
+            release_workspace(workspace_dir)
+            raise
+
     def check_npm_project(self, project_dir: Path) -> bool:
         """Check if the project directory contains npm project files"""
         package_json = project_dir / "package.json"
@@ -62,23 +142,36 @@ class PluginBuilder:
     
     
     def npm_install(self, project_dir: Path) -> Dict[str, Any]:
-        """Run npm install in the project directory"""
+        """Run npm install in the project directory, restoring node_modules from the cache when possible"""
+        npm_cache = get_npm_cache()
+        cache_key = npm_cache.compute_key(project_dir)
+        if npm_cache.restore(cache_key, project_dir):
+            logger.info(f"npm install skipped, node_modules restored from cache {cache_key[:12]}")
+            return {
+                "success": True,
+                "stdout": "",
+                "stderr": "",
+                "cache_hit": True
+            }
+
         try:
             logger.info(f"Running npm install in {project_dir}")
             
-            result = subprocess.run(
+            result = run_logged(
                 ["npm", "install", "--force"],
                 cwd=project_dir,
-                capture_output=True,
-                text=True,
-                check=True
+                log=self.build_log,
+                timeout=self.timeouts.get("install"),
+                control=self.control
             )
             
             logger.info("npm install completed successfully")
+            npm_cache.store(cache_key, project_dir)
             return {
                 "success": True,
                 "stdout": result.stdout,
-                "stderr": result.stderr
+                "stderr": result.stderr,
+                "cache_hit": False
             }
             
         except subprocess.CalledProcessError as e:
@@ -92,17 +185,52 @@ class PluginBuilder:
                 "error": str(e)
             }
 
-    def npm_build(self, project_dir: Path, build_cmd: str) -> Dict[str, Any]:
-        """Run npm build in the project directory"""
+    def npm_build(self, project_dir: Path, build_cmd: str, cache_key: Optional[str] = None) -> Dict[str, Any]:
+        """Run npm build in the project directory, in the Vite build daemon when it can take the job"""
+        timeout = self.timeouts.get("build")
+        deadline = time.monotonic() + timeout if timeout else None
+        env = None
+        daemon = get_build_daemon()
+        steps = daemon.plan(project_dir, build_cmd) if daemon.enabled else None
+        if steps is not None:
+            # The script's own steps (e.g. vue-tsc) run here; only `vite build` goes to the daemon
+            bin_path = f"{project_dir / 'node_modules' / '.bin'}{os.pathsep}{os.environ.get('PATH', '')}"
+            try:
+                for step in steps:
+                    logger.info(f"Running build step {' '.join(step)} in {project_dir}")
+                    run_logged(step, cwd=project_dir, log=self.build_log, env=dict(os.environ, PATH=bin_path),
+                               timeout=time_left(deadline, "npm build"), control=self.control)
+            except subprocess.CalledProcessError as e:
+                logger.error(f"npm build failed: {e}")
+                return {"success": False, "stdout": e.stdout, "stderr": e.stderr, "error": str(e)}
+
+            result = daemon.build(
+                project_dir,
+                cache_key or project_dir.name,
+                modules_dir=get_npm_cache().modules_dir(project_dir),
+                log=self.build_log,
+                timeout=time_left(deadline, "vite build"),
+                control=self.control
+            )
+            if result is not None:
+                return result
+            daemon.fallbacks += 1
+            logger.info("Vite build daemon unavailable, running vite build directly")
+            if steps:
+                # The steps before it already ran; finish the script the way npm would
+                build_cmd = "vite build"
+                env = dict(os.environ, PATH=bin_path)
+
         try:
             logger.info(f"Running npm build in {project_dir}")
             
-            result = subprocess.run(
+            result = run_logged(
                 build_cmd.split(),
                 cwd=project_dir,
-                capture_output=True,
-                text=True,
-                check=True
+                log=self.build_log,
+                env=env,
+                timeout=time_left(deadline, "npm build"),
+                control=self.control
             )
             
             logger.info("npm build completed successfully")
@@ -135,43 +263,42 @@ class PluginBuilder:
             
             logger.info(f"Creating SPARC dataset in {dataset_dir}")
             
-            dataset = Dataset()
-            dataset.set_path(str(dataset_dir))
-            
-            dataset.create_empty_dataset(version="2.0.0")
-            
-            dataset_description = dataset.get_metadata(metadata_file="dataset_description")
-            dataset_description.add_values(element='type', values="software")
-            dataset_description.add_values(element='Title', values=f"{dataset_name} - Plugin Build")
-            dataset_description.add_values(element='Keywords', values=["plugin", "build", "software"])
-            dataset_description.set_values(
-                element='Contributor orcid',
-                values=["https://orcid.org/0000-0000-0000-0000"]  # Placeholder
-            )
+            def describe(dataset_description):
+                dataset_description.add_values(element='type', values="software")
+                dataset_description.add_values(element='Title', values=f"{dataset_name} - Plugin Build")
+                dataset_description.add_values(element='Keywords', values=["plugin", "build", "software"])
+                dataset_description.set_values(
+                    element='Contributor orcid',
+                    values=["https://orcid.org/0000-0000-0000-0000"]  # Placeholder
+                )
+            
+            skeleton_cache = get_dataset_skeleton_cache()
+            dataset = None
+            if skeleton_cache.enabled:
+                # Link the cached empty 2.0.0 dataset and only write the patched description
+                skeleton_cache.create(dataset_dir, describe)
+            else:
+                dataset = Dataset()
+                dataset.set_path(str(dataset_dir))
+                dataset.create_empty_dataset(version="2.0.0")
+                describe(dataset.get_metadata(metadata_file="dataset_description"))
             
             code_dir = dataset_dir / "code"
             code_dir.mkdir(exist_ok=True)
             
-            for item in project_dir.iterdir():
-                if item.name not in ['node_modules', 'dist', 'build', '.git']:
-                    if item.is_dir():
-                        shutil.copytree(item, code_dir / item.name, dirs_exist_ok=True)
-                    else:
-                        shutil.copy2(item, code_dir / item.name)
+            # Files are reflinked or hardlinked rather than copied when on the same filesystem
+            counts = link_tree(project_dir, code_dir, ignore=['node_modules', 'dist', 'build', '.git'])
+            logger.info(f"Linked source code into {code_dir}: {counts}")
             
             if build_output_dir and build_output_dir.exists():
                 primary_dir = dataset_dir / "primary"
                 primary_dir.mkdir(exist_ok=True)
                 
-                for item in build_output_dir.iterdir():
-                    if item.is_dir():
-                        shutil.copytree(item, primary_dir / item.name, dirs_exist_ok=True)
-                    else:
-                        shutil.copy2(item, primary_dir / item.name)
-                
-                logger.info(f"Copied build artifacts from {build_output_dir} to {primary_dir}")
+                counts = link_tree(build_output_dir, primary_dir)
+                logger.info(f"Linked build artifacts from {build_output_dir} to {primary_dir}: {counts}")
             
-            dataset.save(save_dir=str(dataset_dir))
+            if dataset is not None:
+                dataset.save(save_dir=str(dataset_dir))
             
             logger.info(f"SPARC dataset created successfully in {dataset_dir}")
             logger.info(f"- Source code in: {code_dir}")
@@ -188,29 +315,21 @@ class PluginBuilder:
         """Check if the repository URL is a valid git URL"""
         return repo_url.startswith("git@") or repo_url.startswith("https://") or repo_url.startswith("http://")
     
-    def replace_path_in_umd_js(self, project_dir: Path, metadata: Dict[str, Any]):
+    def replace_path_in_umd_js(self, project_dir: Path, metadata: Dict[str, Any]) -> Dict[str, Any]:
         """Replace the path in file ends with .umd.js file for other files in the dist directory to the new path with the minio path"""
-        other_files = []
-        umd_js_file_path = None
-        for file in (project_dir / "dist").iterdir():
-            if file.is_file() and not file.name.endswith(".umd.js"):
-                other_files.append(file)
-            elif file.is_file() and file.name.endswith(".umd.js"):
-                umd_js_file_path = file
-            else:
-                logger.warning(f"File {file} is not a file")
-        
-        if umd_js_file_path is None:
+        dist_dir = project_dir / "dist"
+        if not any(file.is_file() and file.name.endswith(".umd.js") for file in dist_dir.iterdir()):
             raise RuntimeError("umd.js file not found")
         
-        with open(umd_js_file_path, "r") as f:
-            umd_js_content = f.read()
-
         new_path_prefix = f"http://{os.environ.get('HOST', 'localhost')}:9000/plugins/{metadata['path']}/primary/"
-        umd_js_content = umd_js_content.replace(new_path_prefix, metadata["path"])
-        
-        with open(umd_js_file_path, "w") as f:
-            f.write(umd_js_content)
+        # Every text output in dist is rewritten, not just the umd.js bundle
+        rewriter = BundleRewriter({new_path_prefix: metadata["path"]})
+        report = rewriter.rewrite_tree(dist_dir)
+        self._log(
+            f"Rewrote {report['substitutions']} references in {report['rewritten']} of "
+            f"{report['files']} files ({report['bytes']} bytes scanned)"
+        )
+        return report
 
     def unique_name(self, name: str) -> str:
         """Make the name unique by adding a random string to the end"""
@@ -221,8 +340,7 @@ class PluginBuilder:
         """
         Replace the name field in a Vite config file.
         """
-        # Regex pattern to match name field with single or double quotes
-        name_pattern = re.compile(r'name:\s*["\']([^"\']*)["\']', re.IGNORECASE)
+        name_pattern = VITE_NAME_PATTERN
         
         try:
             with open(file_path, 'r', encoding='utf-8') as file:
@@ -230,13 +348,12 @@ class PluginBuilder:
             
             # Check if name field exists
             if not name_pattern.search(content):
-                print(f"No 'name' field found in {file_path}")
+                logger.warning(f"No 'name' field found in {file_path}")
                 return False
             
             # Replace the name field, preserving the quote style
             def replacer(match):
                 full_match = match.group(0)
-                old_name = match.group(1)
                 
                 # Determine quote style from the original
                 if '"' in full_match:
@@ -246,15 +363,23 @@ class PluginBuilder:
             
             new_content = name_pattern.sub(replacer, content)
             
-            # Write back to file
-            with open(file_path, 'w', encoding='utf-8') as file:
-                file.write(new_content)
-            
-            print(f" Updated name in {file_path}")
+            # Write a new file and rename it over the old one, so a config shared by links
+            # with another workspace is never modified in place
+            fd, tmp_path = tempfile.mkstemp(prefix=f".{Path(file_path).name}.", dir=Path(file_path).parent)
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as file:
+                    file.write(new_content)
+                shutil.copymode(file_path, tmp_path)
+                os.replace(tmp_path, file_path)
+            except BaseException:
+                Path(tmp_path).unlink(missing_ok=True)
+                raise
+            
+            logger.info(f"Updated name in {file_path}")
             return True
             
         except Exception as e:
-            print(f"Error processing {file_path}: {e}")
+            logger.warning(f"Error processing {file_path}: {e}")
             return False
     def update_vite_config(self, project_dir: Path, metadata: Dict[str, Any]):
         """Update the vite.config.js file to use the unique name"""
@@ -269,197 +394,327 @@ class PluginBuilder:
         
         self.replace_vite_name(vite_config_file, metadata["path"])
         
+    def resolve_local_project(self, repo_url: str) -> Path:
+        """Map a local repository path onto the /plugins volume mounted in the container"""
+        logger.info(f"DEBUG: repo_url = '{repo_url}' (type: {type(repo_url)}, length: {len(repo_url)})")
+        # For local paths, map them to the mounted volume
+        # If the path starts with ./plugins or /plugins, use it as-is
+        # Otherwise, assume it's a relative path under /plugins
+        if repo_url.startswith('./plugins/'):
+            logger.info("DEBUG: Taking ./plugins/ branch")
+            # Convert relative path to absolute within container
+            project_dir = Path(f"/plugins/{repo_url.replace('./plugins/', '')}")
+        elif repo_url.startswith('/plugins/'):
+            logger.info("DEBUG: Taking /plugins/ branch")
+            # Already an absolute path in the container
+            project_dir = Path(repo_url)
+        else:
+            logger.info("DEBUG: Taking else branch")
+            # Assume it's a plugin name/path under /plugins
+            # Remove leading ./ if present
+            clean_path = repo_url.lstrip('./')
+            logger.info(f"DEBUG: clean_path = '{clean_path}'")
+            project_dir = Path(f'/plugins/{clean_path}')
+        
+        if not project_dir.exists():
+            raise RuntimeError(f"Local path does not exist: {project_dir}")
+        if not project_dir.is_dir():
+            raise RuntimeError(f"Local path is not a directory: {project_dir}")
+        return project_dir
+
+    def hash_source_tree(self, project_dir: Path) -> str:
+        """Hash the plugin sources, ignoring build outputs and the per-build vite library name"""
+        digest = hashlib.sha256()
+        for root, dirs, files in os.walk(project_dir):
+            dirs[:] = sorted(d for d in dirs if d not in FINGERPRINT_IGNORE)
+            for name in sorted(files):
+                file_path = Path(root) / name
+                relative_path = file_path.relative_to(project_dir).as_posix()
+                if file_path.is_symlink():
+                    content = os.readlink(file_path).encode()
+                elif relative_path in VITE_CONFIG_FILES:
+                    # update_vite_config rewrites the name on every build, so leave it out of the hash
+                    content = VITE_NAME_PATTERN.sub('name: ""', file_path.read_text(encoding="utf-8")).encode()
+                else:
+                    content = file_path.read_bytes()
+                digest.update(relative_path.encode() + b"\0")
+                digest.update(hashlib.sha256(content).digest())
+        return digest.hexdigest()
+
+    def git_head(self, project_dir: Path) -> str:
+        """Return the commit SHA checked out in project_dir"""
+        result = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=project_dir,
+            capture_output=True,
+            text=True,
+            check=True
+        )
+        return result.stdout.strip()
+
+    def compute_fingerprint(self, source_id: str, build_cmd: str) -> str:
+        """Combine the source identity, build command and toolchain versions into a build fingerprint"""
+        digest = hashlib.sha256()
+        for part in [source_id, build_cmd, get_node_version() or "", get_npm_version() or ""]:
+            digest.update(part.encode() + b"\0")
+        return digest.hexdigest()
+
+    def find_reusable_build(self, plugin_id: str, fingerprint: str) -> Optional[Dict[str, Any]]:
+        """Find a completed build of this plugin whose artifacts match the fingerprint
+
+        Candidates are only returned while their files still exist: local bundles in the
+        public directory, remote ones in object storage.
+        """
+        session = self.db or SessionLocal()
+        try:
+            builds = (
+                session.query(PluginBuild)
+                .filter(
+                    PluginBuild.plugin_id == plugin_id,
+                    PluginBuild.fingerprint == fingerprint,
+                    PluginBuild.status == BuildStatus.COMPLETED.value,
+                    PluginBuild.component_entry.isnot(None),
+                    PluginBuild.pruned_at.is_(None),
+                )
+                .order_by(PluginBuild.created_at.desc())
+                .all()
+            )
+            for build in builds:
+                component = build.component_entry
+                if component.get("is_local"):
+                    # Local plugins are served from the public dir, which must still hold the bundle
+                    if not (PUBLIC_DIR / component["expose"]).exists():
+                        continue
+                else:
+                    # The row outlives its objects after delete_plugin, a manual cleanup or an interrupted upload
+                    try:
+                        if not get_artifact_store().bundle_exists(component["expose"]):
+                            self._log(f"Not reusing build {build.build_id}: its bundle is gone from storage", logging.WARNING)
+                            continue
+                    except Exception as e:
+                        self._log(f"Not reusing build {build.build_id}: could not check its bundle: {e}", logging.WARNING)
+                        continue
+                return {
+                    "build_id": build.build_id,
+                    "s3_path": build.s3_path,
+                    "component": component,
+                }
+            return None
+        finally:
+            if self.db is None:
+                session.close()
+
+    def _begin_step(self, step_timer: StepTimer, step: str):
+        """Stop here if the build was cancelled, otherwise start timing the next step"""
+        self.control.checkpoint()
+        step_timer.start(step)
+
+    def publish_component(self, component_entry: Dict[str, Any]):
+        """Publish a component entry and make this build the plugin's current one"""
+        get_release_manager().activate(component_entry["id"], self.build_log.build_id, component_entry)
+
     def build_plugin(self, 
                     plugin: Dict[str, Any]) -> Dict[str, Any]:
         """Complete plugin build process"""
-        build_logs = []
         error_message = None
         repo_url = plugin.get("repository_url")
         branch = plugin.get("branch", "main")
-        metadata = plugin.get("plugin_metadata", {})
+        metadata = plugin.get("plugin_metadata") or {}
         plugin_id = plugin.get("id")
         plugin_name = plugin.get("name", "unknown")
         version = plugin.get("version", "1.0.0")
         creaated_at = plugin.get("created_at", "unknown")
         author = plugin.get("author", "unknown")
         description = plugin.get("description", "No description provided")
+        build_cmd = metadata.get("build_command", "npm run build")
+        source_archive = plugin.get("source_archive")
+        self.timeouts = step_timeouts(metadata)
         cloned_dir = None
+        workspace_dir = None
+        fingerprint = None
+        step_timer = StepTimer()
 
 
         try:
             plugin_unique_name = self.unique_name(plugin_name)
             metadata["path"] = plugin_unique_name
             metadata["expose"] = plugin_unique_name
-            # Step 0: Check for existing metadata
-            logger.info("Step 0: Checking for existing plugin metadata...")
+            
+            # Step 0: Resolve the branch head so an unchanged remote is detected before any transfer
+            remote_sha = None
+            reusable = None
+            if source_archive:
+                # The archive hash identifies the sources exactly, like a commit SHA
+                fingerprint = self.compute_fingerprint(f"archive:{source_archive}", build_cmd)
+                self._log(f"Build fingerprint {fingerprint[:12]} (source archive {source_archive[:12]})")
+                reusable = self.find_reusable_build(plugin_id, fingerprint)
+            elif self.is_git_url(repo_url):
+                self._begin_step(step_timer, "resolve")
+                self._log("Step 0: Resolving remote branch head...")
+                remote_sha = get_git_mirror_cache().ls_remote(
+                    normalize_repo_url(repo_url), branch, timeout=self.timeouts.get("clone"), control=self.control
+                )
+                if remote_sha:
+                    fingerprint = self.compute_fingerprint(f"git:{normalize_repo_url(repo_url)}@{remote_sha}", build_cmd)
+                    self._log(f"Build fingerprint {fingerprint[:12]} ({branch} at {remote_sha[:12]})")
+                    reusable = self.find_reusable_build(plugin_id, fingerprint)
             
             # Step 1: Clone the repository or use local path
-            if self.is_git_url(repo_url):
-                logger.info("Step 1: Cloning repository...")
-                project_dir = self.clone_repository(repo_url, branch)
+            self._begin_step(step_timer, "clone")
+            if reusable:
+                self._log("Step 1: Skipping clone, sources are unchanged")
+            elif source_archive:
+                self._log("Step 1: Using uploaded source archive...")
+                project_dir = self.snapshot_local_project(source_path(plugin_id, source_archive))
+                cloned_dir = project_dir  # Published like a cloned repository and removed after packaging
+                self._log(f"Source archive {source_archive[:12]} unpacked to: {project_dir}")
+            elif self.is_git_url(repo_url):
+                self._log("Step 1: Cloning repository...")
+                project_dir = self.clone_repository(repo_url, branch, remote_sha)
                 cloned_dir = project_dir  # Mark for cleanup
-                logger.info(f"Repository cloned to: {project_dir}")
+                self._log(f"Repository cloned to: {project_dir}")
+                head_sha = self.git_head(project_dir)
+                if head_sha != remote_sha:
+                    fingerprint = self.compute_fingerprint(f"git:{normalize_repo_url(repo_url)}@{head_sha}", build_cmd)
+                    self._log(f"Build fingerprint {fingerprint[:12]} ({branch} at {head_sha[:12]})")
+                    reusable = self.find_reusable_build(plugin_id, fingerprint)
             else:
-                logger.info("Step 1: Using local repository...")
-                logger.info(f"DEBUG: repo_url = '{repo_url}' (type: {type(repo_url)}, length: {len(repo_url)})")
-                logger.info(f"DEBUG: repo_url.startswith('./plugins/') = {repo_url.startswith('./plugins/')}")
-                logger.info(f"DEBUG: repo_url.startswith('/plugins/') = {repo_url.startswith('/plugins/')}")
-                # For local paths, map them to the mounted volume
-                # If the path starts with ./plugins or /plugins, use it as-is
-                # Otherwise, assume it's a relative path under /plugins
-                if repo_url.startswith('./plugins/'):
-                    logger.info("DEBUG: Taking ./plugins/ branch")
-                    # Convert relative path to absolute within container
-                    plugin_name = repo_url.replace('./plugins/', '')
-                    project_dir = Path(f'/plugins/{plugin_name}')
-                elif repo_url.startswith('/plugins/'):
-                    logger.info("DEBUG: Taking /plugins/ branch")
-                    # Already an absolute path in the container
-                    project_dir = Path(repo_url)
-                else:
-                    logger.info("DEBUG: Taking else branch")
-                    # Assume it's a plugin name/path under /plugins
-                    # Remove leading ./ if present
-                    clean_path = repo_url.lstrip('./')
-                    logger.info(f"DEBUG: clean_path = '{clean_path}'")
-                    project_dir = Path(f'/plugins/{clean_path}')
-                
-                if not project_dir.exists():
-                    raise RuntimeError(f"Local path does not exist: {project_dir}")
-                if not project_dir.is_dir():
-                    raise RuntimeError(f"Local path is not a directory: {project_dir}")
-                logger.info(f"Using local project directory: {project_dir}")
+                self._log("Step 1: Using local repository...")
+                source_dir = self.resolve_local_project(repo_url)
+                project_dir = self.snapshot_local_project(source_dir)
+                workspace_dir = project_dir  # Mark for cleanup
+                self._log(f"Using a snapshot of local project directory {source_dir}: {project_dir}")
+                fingerprint = self.compute_fingerprint(f"tree:{self.hash_source_tree(project_dir)}", build_cmd)
+                self._log(f"Build fingerprint {fingerprint[:12]}")
+                reusable = self.find_reusable_build(plugin_id, fingerprint)
+            
+            # Step 1.1: Reuse the output of an earlier build with the same fingerprint
+            if reusable:
+                self._begin_step(step_timer, "publish")
+                self._log(f"Reusing output of build {reusable['build_id']}, skipping install, build and upload")
+                component_entry = dict(reusable["component"])
+                component_entry.update({
+                    "id": plugin_id,
+                    "name": plugin_name,
+                    "description": description,
+                    "version": version,
+                    "created_at": creaated_at,
+                    "author": author,
+                    "repository_url": repo_url,
+                })
+                self.publish_component(component_entry)
+                for scratch_dir in (cloned_dir, workspace_dir):
+                    if scratch_dir:
+                        shutil.rmtree(scratch_dir)
+                        release_workspace(scratch_dir)
+                step_timer.close()
+                return {
+                    "success": True,
+                    "dataset_path": None,
+                    "s3_path": reusable["s3_path"],
+                    "build_logs": self.build_log.read(),
+                    "error_message": None,
+                    "is_local": component_entry.get("is_local", False),
+                    "fingerprint": fingerprint,
+                    "component": component_entry,
+                    "reused_build_id": reusable["build_id"],
+                    "step_metrics": step_timer.steps,
+                }
             
             # Step 2: Check if it's an npm project and extract metadata
-            logger.info("Step 2: Checking for npm project...")
+            self._log("Step 2: Checking for npm project...")
             if not self.check_npm_project(project_dir):
                 raise RuntimeError("No package.json found - not an npm project")
-            logger.info("npm project detected")
+            self._log("npm project detected")
             
 
             # Step 2.1: update vite.config.js
-            logger.info("Step 2.1: Updating vite.config.js...")
+            self._log("Step 2.1: Updating vite.config.js...")
             self.update_vite_config(project_dir, metadata)
-            logger.info("vite.config.js updated successfully")
+            self._log("vite.config.js updated successfully")
 
             # Step 3: npm install
-            logger.info("Step 3: Running npm install...")
+            self._begin_step(step_timer, "install")
+            self._log("Step 3: Running npm install...")
             install_result = self.npm_install(project_dir)
             if not install_result["success"]:
                 raise RuntimeError(f"npm install failed: {install_result.get('error', 'Unknown error')}")
-            logger.info("npm install completed successfully")
+            self._log("npm install completed successfully")
             
             # Step 4: npm build
-            logger.info("Step 4: Running npm build...")
-            build_result = self.npm_build(project_dir, metadata.get("build_command", "npm run build"))
+            self._begin_step(step_timer, "build")
+            self._log("Step 4: Running npm build...")
+            build_result = self.npm_build(project_dir, build_cmd, cache_key=plugin_id)
             if not build_result["success"]:
                 raise RuntimeError(f"npm build failed: {build_result.get('error', 'Unknown error')}")
-            logger.info("npm build completed successfully")
+            self._log("npm build completed successfully")
 
             # Step 5: replace the path in the umd.js file (only for remote repos, not local)
+            self._begin_step(step_timer, "rewrite")
             if cloned_dir:
-                logger.info("Step 5: Replacing path in umd.js file...")
+                self._log("Step 5: Replacing path in umd.js file...")
                 self.replace_path_in_umd_js(project_dir, metadata)
-                logger.info("Path in umd.js file replaced successfully")
+                self._log("Path in umd.js file replaced successfully")
             else:
-                logger.info("Step 5: Skipping path replacement for local plugin")
+                self._log("Step 5: Skipping path replacement for local plugin")
 
             
                         # read config file in the cloned directory
             config_file = project_dir / "config.sparc.json"
             config = {}
             if config_file.exists():
-                logger.info(f"Reading config from {config_file}")
+                self._log(f"Reading config from {config_file}")
                 with open(config_file, "r") as f:
                     config = json.loads(f.read())
             else:
-                logger.warning(f"No config.sparc.json file found in {project_dir}")
-            
-            # Step 5: Create SPARC-ME dataset (only for remote repos)
-            dataset_dir = None
-            if cloned_dir:
-                logger.info("Step 5: Creating SPARC-ME dataset...")
-                
-                # Look for common build output directories
-                build_output_dir = None
-                possible_build_dirs = ["dist"]
-                for dir_name in possible_build_dirs:
-                    potential_dir = project_dir / dir_name
-                    if potential_dir.exists():
-                        build_output_dir = potential_dir
-                        logger.info(f"Found build output directory: {build_output_dir}")
-                        break
-                
-                dataset_dir = self.create_sparc_dataset(project_dir, build_output_dir)
-                logger.info(f"SPARC dataset created in: {dataset_dir}")
-            else:
-                logger.info("Step 5: Skipping SPARC dataset creation for local plugin")
+                self._log(f"No config.sparc.json file found in {project_dir}", logging.WARNING)
             
-            # Step 6: Upload dataset to MinIO or copy to public directory
-            s3_path = None
+            # Step 6: Upload the dist bundle to MinIO or copy to public directory. The SPARC dataset
+            # is packaged afterwards by package_dataset so the plugin becomes visible right away
+            self._begin_step(step_timer, "upload")
+            bundle_name = f"{metadata['path']}.bundle"
+            package = None
             if cloned_dir:
-                logger.info("Step 6: Uploading dataset to MinIO...")
-                try:
-                    minio_client = get_minio_client()
-                    logger.info(f"Uploading dataset to MinIO: {metadata}")
-                    dataset_name = f"{metadata['path']}"
-                    logger.info(f"Uploading dataset to MinIO: {dataset_name}")
-                    s3_path = minio_client.upload_directory(str(dataset_dir), dataset_name)
-                    logger.info(f"Dataset uploaded to MinIO: {s3_path}")
-                except Exception as e:
-                    logger.error(f"Failed to upload to MinIO: {e}")
-                    s3_path = None
+                self._log("Step 6: Uploading bundle to MinIO...")
+                upload_report = get_artifact_store().publish_directory(str(project_dir / "dist"), bundle_name)
+                self._log(
+                    f"Bundle uploaded to MinIO: {upload_report['s3_path']} ({upload_report['files']} files, "
+                    f"{upload_report['new_blobs']} new blobs, {upload_report['reused_blobs']} already stored, "
+                    f"{upload_report['bytes']} of {upload_report['total_bytes']} bytes sent in "
+                    f"{upload_report['seconds']}s, {upload_report['bytes_per_second']} B/s)"
+                )
+                # The clone is kept for the package stage, which removes it when done
+                package = {
+                    "project_dir": str(project_dir),
+                    "dataset_name": f"{metadata['path']}_{self.build_log.build_id or uuid.uuid4().hex}"[:120],
+                    "object_name": metadata["path"],
+                }
             else:
-                logger.info("Step 6: Copying local plugin to public directory...")
+                self._log("Step 6: Copying local plugin to public directory...")
                 # For local plugins, copy dist files to public directory using the path from metadata
-                public_dir = Path("/app/portal/public")
+                public_dir = PUBLIC_DIR
                 
                 # Use the path from metadata as the folder name
                 plugin_path_name = metadata.get('path', 'plugin')
                 plugin_public_dir = public_dir / plugin_path_name
                 plugin_public_dir.mkdir(parents=True, exist_ok=True)
                 
-                # Copy dist folder contents directly
+                # Link dist folder contents directly; vite empties dist before writing, so a
+                # rebuild never modifies files shared with the public directory in place
                 dist_dir = project_dir / "dist"
                 if dist_dir.exists():
-                    for item in dist_dir.iterdir():
-                        if item.is_file():
-                            shutil.copy2(item, plugin_public_dir / item.name)
-                            logger.info(f"Copied {item.name} to public/{plugin_path_name}")
-                        elif item.is_dir():
-                            shutil.copytree(item, plugin_public_dir / item.name, dirs_exist_ok=True)
-                            logger.info(f"Copied directory {item.name} to public/{plugin_path_name}")
-                    logger.info(f"Local plugin files copied to {plugin_public_dir}")
-            
-            # Clean up temporary files (only for cloned repos, not local paths)
-            logger.info("Step 7: Cleaning up temporary files...")
-            if cloned_dir:
-                shutil.rmtree(cloned_dir)
-                logger.info("Cleaned up cloned repository")
-            else:
-                logger.info("Skipping cleanup for local path")
-            
-            # write metadata to the portal public metadata.json file which is mounted in this docker container
-            # /app/portal/public
-            metadata_file = Path("/app/portal/public/metadata.json")
-            
-            existing_metadata = {}
-            if metadata_file.exists():
-                logger.info(f"Reading existing metadata from {metadata_file}")
-                try:
-                    with open(metadata_file, "r") as f:
-                        existing_metadata = json.loads(f.read())
-                except (json.JSONDecodeError, Exception) as e:
-                    logger.warning(f"Failed to read existing metadata, starting fresh: {e}")
-                    existing_metadata = {}
-            
-            if "components" not in existing_metadata:
-                existing_metadata["components"] = []
+                    counts = link_tree(dist_dir, plugin_public_dir)
+                    self._log(f"Local plugin files linked to {plugin_public_dir}: {counts}")
             
             # Determine the path based on whether it's a local plugin or remote
-            if cloned_dir:
+            if cloned_dir and ARTIFACT_BASE_URL and self.build_log.build_id:
+                # Remote plugin served by the registry, which negotiates gzip/br and caches blobs
+                plugin_path = f"{ARTIFACT_BASE_URL}/artifacts/{self.build_log.build_id}/my-app.umd.js"
+            elif cloned_dir:
                 # Remote plugin - use MinIO URL
-                plugin_path = f"http://{os.environ.get('HOST', 'localhost')}:9000/plugins/{metadata['path']}/primary/my-app.umd.js"
+                plugin_path = get_artifact_store().get_public_url(
+                    f"{bundle_name}/my-app.umd.js", encoding="gzip"
+                )
             else:
                 # Local plugin - use public directory path with metadata path
                 plugin_path = f"/{metadata['path']}/my-app.umd.js"
@@ -480,41 +735,104 @@ class PluginBuilder:
                 "config": config
             }
             
-            component_exists = False
-            for i, component in enumerate(existing_metadata["components"]):
-                if component.get("name") == component_entry["name"]:
-                    existing_metadata["components"][i] = component_entry
-                    component_exists = True
-                    logger.info(f"Updated existing component: {component_entry['name']}")
-                    break
-            
-            if not component_exists:
-                existing_metadata["components"].append(component_entry)
-                logger.info(f"Added new component: {component_entry['name']}")
-            
-            logger.info(f"Writing metadata to {metadata_file}")
-            with open(metadata_file, "w") as f:
-                f.write(json.dumps(existing_metadata, indent=4))
+            self._begin_step(step_timer, "publish")
+            self.publish_component(component_entry)
+            if workspace_dir:
+                # The public directory holds its own links to dist, so the snapshot can go
+                shutil.rmtree(workspace_dir, ignore_errors=True)
+                release_workspace(workspace_dir)
+            step_timer.close()
         
-            logger.info("Build process completed successfully")
+            self._log("Build process completed successfully")
             
             return {
                 "success": True,
-                "dataset_path": str(dataset_dir) if dataset_dir else None,
-                "s3_path": s3_path,
-                "build_logs": "\n".join(build_logs),
+                "dataset_path": None,
+                "s3_path": None,
+                "package": package,
+                "build_logs": self.build_log.read(),
                 "error_message": None,
                 "is_local": not bool(cloned_dir),
+                "fingerprint": fingerprint,
+                "component": component_entry,
+                "reused_build_id": None,
+                "step_metrics": step_timer.steps,
             }
             
         except Exception as e:
+            step_timer.close()
+            for scratch_dir in (cloned_dir, workspace_dir):
+                if scratch_dir:
+                    # Left on disk for inspection; retention removes it once it is no longer active
+                    release_workspace(scratch_dir)
             error_message = str(e)
-            logger.info(f"Build failed: {error_message}")
-            logger.error(f"Build process failed: {e}")
+            self._log(f"Build failed: {error_message}")
+            self._log(f"Build process failed: {e}", logging.ERROR)
             
+            if isinstance(e, BuildCancelled):
+                status = BuildStatus.CANCELLED.value
+            elif isinstance(e, StepTimedOut):
+                status = BuildStatus.TIMED_OUT.value
+            else:
+                status = BuildStatus.FAILED.value
+            return {
+                "success": False,
+                "status": status,
+                "dataset_path": None,
+                "build_logs": self.build_log.read(),
+                "error_message": error_message,
+                "fingerprint": fingerprint,
+                "step_metrics": step_timer.steps,
+            }
+
+    def package_dataset(self, package: Dict[str, Any]) -> Dict[str, Any]:
+        """Package stage: build the SPARC dataset of a published build and upload it
+
+        Runs after build_plugin has published the bundle. The build outputs are already stored
+        as blobs by then, so the upload normally only adds the source code and metadata files.
+        The cloned repository is removed afterwards whether packaging succeeds or not.
+        """
+        project_dir = Path(package["project_dir"])
+        step_timer = StepTimer()
+        try:
+            step_timer.start("dataset")
+            self._log("Package: Creating SPARC-ME dataset...")
+            build_output_dir = project_dir / "dist"
+            dataset_dir = self.create_sparc_dataset(
+                project_dir,
+                build_output_dir if build_output_dir.exists() else None,
+                package["dataset_name"]
+            )
+            self._log(f"SPARC dataset created in: {dataset_dir}")
+            
+            step_timer.start("dataset_upload")
+            self._log(f"Package: Uploading dataset to MinIO: {package['object_name']}")
+            upload_report = get_artifact_store().publish_directory(str(dataset_dir), package["object_name"])
+            self._log(
+                f"Dataset uploaded to MinIO: {upload_report['s3_path']} ({upload_report['files']} files, "
+                f"{upload_report['new_blobs']} new blobs, {upload_report['reused_blobs']} already stored, "
+                f"{upload_report['bytes']} of {upload_report['total_bytes']} bytes sent in "
+                f"{upload_report['seconds']}s, {upload_report['bytes_per_second']} B/s)"
+            )
+            return {
+                "success": True,
+                "dataset_path": str(dataset_dir),
+                "s3_path": upload_report["s3_path"],
+                "error_message": None,
+                "step_metrics": step_timer.steps,
+            }
+        except Exception as e:
+            self._log(f"Packaging failed: {e}", logging.ERROR)
             return {
                 "success": False,
                 "dataset_path": None,
-                "build_logs": "\n".join(build_logs),
-                "error_message": error_message
+                "s3_path": None,
+                "error_message": str(e),
+                "step_metrics": step_timer.steps,
             }
+        finally:
+            step_timer.start("cleanup")
+            shutil.rmtree(project_dir, ignore_errors=True)
+            release_workspace(project_dir)
+            self._log("Cleaned up cloned repository")
+            step_timer.close()
@@ -0,0 +1,108 @@
+import os
+import time
+import signal
+import threading
+from typing import Optional, Dict, Any
+
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+# Seconds a step may run before its process group is killed; plugin_metadata["timeouts"] overrides these
+DEFAULT_STEP_TIMEOUTS = {
+    "clone": float(os.environ.get("BUILD_TIMEOUT_CLONE", "600")),
+    "install": float(os.environ.get("BUILD_TIMEOUT_INSTALL", "1800")),
+    "build": float(os.environ.get("BUILD_TIMEOUT_BUILD", "1800")),
+}
+KILL_GRACE_SECONDS = float(os.environ.get("BUILD_KILL_GRACE", "5"))
+
+
+class BuildCancelled(RuntimeError):
+    """Raised inside a build once it has been cancelled"""
+
+
+class StepTimedOut(RuntimeError):
+    """Raised when a build step exceeds its time budget"""
+
+
+def step_timeouts(plugin_metadata: Optional[Dict[str, Any]]) -> Dict[str, Optional[float]]:
+    """Per-step timeouts for a plugin: the defaults overridden by plugin_metadata["timeouts"]"""
+    timeouts = dict(DEFAULT_STEP_TIMEOUTS)
+    overrides = (plugin_metadata or {}).get("timeouts") or {}
+    for step, value in overrides.items():
+        try:
+            timeouts[step] = float(value) if value else None
+        except (TypeError, ValueError):
+            logger.warning(f"Ignoring invalid timeout {value!r} for step {step}")
+    return timeouts
+
+
+def time_left(deadline: Optional[float], what: str) -> Optional[float]:
+    """Seconds until a time.monotonic() deadline shared by several commands of one step
+
+    Returns None without a deadline and raises StepTimedOut once it has passed.
+    """
+    if deadline is None:
+        return None
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise StepTimedOut(f"{what} ran out of time")
+    return remaining
+
+
+def _terminate(kill, target: int, grace: float):
+    try:
+        kill(target, signal.SIGTERM)
+    except ProcessLookupError:
+        return
+    deadline = time.monotonic() + grace
+    while time.monotonic() < deadline:
+        try:
+            kill(target, 0)
+        except ProcessLookupError:
+            return
+        time.sleep(0.05)
+    try:
+        kill(target, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+def terminate_process_group(pgid: int, grace: float = KILL_GRACE_SECONDS):
+    """SIGTERM a whole process group, then SIGKILL whatever is left after grace seconds"""
+    _terminate(os.killpg, pgid, grace)
+
+
+def terminate_process(pid: int, grace: float = KILL_GRACE_SECONDS):
+    """Stop a process that is not ours: its whole group if it leads one, otherwise just the process"""
+    try:
+        pgid = os.getpgid(pid)
+    except ProcessLookupError:
+        return
+    if pgid == pid:
+        _terminate(os.killpg, pgid, grace)
+    else:
+        _terminate(os.kill, pid, grace)
+
+
+class BuildControl:
+    """Cancellation state of one running build
+
+    Commands started through run_logged run in their own process group and watch this
+    object; cancel() makes them kill their whole group, and checkpoint() stops the build
+    between steps.
+    """
+
+    def __init__(self):
+        self._cancelled = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def checkpoint(self):
+        if self.cancelled:
+            raise BuildCancelled("Build was cancelled")
@@ -0,0 +1,248 @@
+import os
+import re
+import json
+import time
+import shutil
+import socket
+import threading
+import subprocess
+from pathlib import Path
+from typing import Optional, Dict, Any, List
+
+from .build_logs import BuildLog
+from .build_control import BuildControl, BuildCancelled, StepTimedOut, terminate_process_group, terminate_process
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+DAEMON_SCRIPT = Path(__file__).resolve().parent.parent / "build-daemon" / "daemon.mjs"
+# package.json build scripts the daemon can run in-process; anything else goes through npm
+VITE_BUILD_SCRIPT = re.compile(r"^\s*(npx\s+)?vite\s+build\s*$")
+DEFAULT_BUILD_COMMANDS = {"npm run build", "npm run-script build"}
+# Steps a script may run before `vite build` (e.g. the template's `vue-tsc -b`): plain words, no shell syntax
+PRE_STEP = re.compile(r"^\s*[\w./:=@+,-]+(\s+[\w./:=@+,-]+)*\s*$")
+
+
+class BuildDaemon:
+    """Client for the long-lived Vite build daemon in build-daemon/daemon.mjs
+
+    The daemon keeps Node and Vite loaded between builds and runs `vite build` in-process
+    for any plugin directory sent over its unix socket. That saves process start-up and the
+    Vite import, not the bundling itself: no Rollup transform results carry over between builds. It is started on demand as a child
+    of the registry when BUILD_DAEMON_ENABLED is set (the default) and node is installed.
+    build() returns None whenever the daemon cannot take a job (not running, busy with another
+    build or crashed), so callers fall back to running vite as a subprocess; plan() decides
+    which build commands it can take at all.
+    """
+
+    def __init__(self, socket_path: str = None, enabled: bool = None):
+        if socket_path is None:
+            socket_path = os.environ.get("BUILD_DAEMON_SOCKET", "/tmp/plugin_build/vite-daemon.sock")
+        if enabled is None:
+            enabled = os.environ.get("BUILD_DAEMON_ENABLED", "true").lower() == "true"
+        self.socket_path = Path(socket_path)
+        self.enabled = enabled and DAEMON_SCRIPT.exists() and shutil.which("node") is not None
+        self.start_timeout = float(os.environ.get("BUILD_DAEMON_START_TIMEOUT", "10"))
+        self.process: Optional[subprocess.Popen] = None
+        self._lock = threading.Lock()
+        self.builds = 0
+        self.fallbacks = 0
+
+    def _connect(self, timeout: float = 1.0) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        try:
+            sock.connect(str(self.socket_path))
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    def _request(self, request: Dict[str, Any], timeout: float = 1.0) -> Optional[Dict[str, Any]]:
+        """Send a single-reply request (ping, stats); None if the daemon is unreachable"""
+        try:
+            with self._connect(timeout) as sock:
+                sock.sendall(json.dumps(request).encode() + b"\n")
+                with sock.makefile("r", encoding="utf-8") as reader:
+                    line = reader.readline()
+            return json.loads(line) if line else None
+        except (OSError, ValueError):
+            return None
+
+    def ping(self) -> bool:
+        reply = self._request({"op": "ping"})
+        return reply is not None and reply.get("type") == "pong"
+
+    def start(self) -> bool:
+        """Start the daemon unless one is already listening; return whether it is available"""
+        if not self.enabled:
+            return False
+        with self._lock:
+            if self.ping():
+                return True
+            if self.process is not None and self.process.poll() is None:
+                terminate_process_group(self.process.pid)
+            logger.info(f"Starting Vite build daemon on {self.socket_path}")
+            self.process = subprocess.Popen(
+                ["node", str(DAEMON_SCRIPT)],
+                env={**os.environ, "BUILD_DAEMON_SOCKET": str(self.socket_path)},
+                stdout=subprocess.DEVNULL,
+                start_new_session=True,
+            )
+            deadline = time.monotonic() + self.start_timeout
+            while time.monotonic() < deadline:
+                if self.ping():
+                    return True
+                if self.process.poll() is not None:
+                    break
+                time.sleep(0.05)
+            logger.warning("Vite build daemon did not come up, builds will run npm directly")
+            self.stop()
+            return False
+
+    def stop(self):
+        process, self.process = self.process, None
+        if process is not None and process.poll() is None:
+            terminate_process_group(process.pid)
+            process.wait()
+
+    def plan(self, project_dir: Path, build_cmd: str) -> Optional[List[List[str]]]:
+        """Commands to run before the daemon's `vite build`, or None if it cannot run build_cmd
+
+        build_cmd qualifies when it is a plain `vite build`, or an npm build script of the form
+        `[step && ...] vite build` whose steps are simple commands, such as the plugin
+        template's `vue-tsc -b && vite build`. The caller runs the returned steps itself
+        (with node_modules/.bin on PATH, as npm would) and then sends the build to the daemon.
+        """
+        build_cmd = " ".join(build_cmd.split())
+        if VITE_BUILD_SCRIPT.match(build_cmd):
+            return []
+        if build_cmd not in DEFAULT_BUILD_COMMANDS:
+            return None
+        try:
+            scripts = json.loads((project_dir / "package.json").read_text()).get("scripts") or {}
+        except (OSError, ValueError):
+            return None
+        # npm would also run prebuild/postbuild hooks, which the daemon does not
+        if "prebuild" in scripts or "postbuild" in scripts:
+            return None
+        *steps, last = (scripts.get("build") or "").split("&&")
+        if not VITE_BUILD_SCRIPT.match(last) or not all(PRE_STEP.match(step) for step in steps):
+            return None
+        return [step.split() for step in steps]
+
+    def build(self,
+              project_dir: Path,
+              cache_key: str,
+              modules_dir: Optional[Path] = None,
+              log: Optional[BuildLog] = None,
+              timeout: Optional[float] = None,
+              control: Optional[BuildControl] = None) -> Optional[Dict[str, Any]]:
+        """Run `vite build` for project_dir in the daemon
+
+        Returns a result dict like PluginBuilder.npm_build, or None if the daemon could not
+        take the job. A timeout or cancellation kills the daemon, whichever process started it,
+        since Vite cannot abort a running build; the next build starts a fresh one. Raises
+        StepTimedOut or BuildCancelled like run_logged.
+        """
+        if not self.enabled:
+            return None
+        try:
+            sock = self._connect()
+        except OSError:
+            if not self.start():
+                return None
+            try:
+                sock = self._connect()
+            except OSError:
+                return None
+
+        request = {
+            "op": "build",
+            "root": str(project_dir),
+            "cacheKey": cache_key,
+            "modulesDir": str(modules_dir) if modules_dir else None,
+            "wait": False,
+        }
+        lines = []
+        buffer = b""
+        deadline = time.monotonic() + timeout if timeout else None
+        with sock:
+            try:
+                sock.sendall(json.dumps(request).encode() + b"\n")
+                sock.settimeout(0.1)
+                while True:
+                    if control is not None and control.cancelled:
+                        self._abort("cancelled")
+                        raise BuildCancelled("Build was cancelled while running vite build")
+                    if deadline is not None and time.monotonic() >= deadline:
+                        self._abort("timed out")
+                        raise StepTimedOut(f"vite build timed out after {timeout:g}s")
+                    try:
+                        chunk = sock.recv(65536)
+                    except socket.timeout:
+                        continue
+                    if not chunk:
+                        logger.warning("Vite build daemon closed the connection mid-build")
+                        return None
+                    buffer += chunk
+                    while b"\n" in buffer:
+                        raw, buffer = buffer.split(b"\n", 1)
+                        message = json.loads(raw)
+                        if message.get("type") == "busy":
+                            return None
+                        if message.get("type") == "log":
+                            lines.append(message["line"])
+                            if log is not None:
+                                log.write(message["line"])
+                        elif message.get("type") == "result":
+                            self.builds += 1
+                            logger.info(
+                                f"Vite build daemon built {project_dir} in {message.get('durationMs')} ms "
+                                f"({'warm' if message.get('warm') else 'cold'})"
+                            )
+                            output = "\n".join(lines)
+                            if message.get("success"):
+                                return {"success": True, "stdout": output, "stderr": "", "daemon": True}
+                            return {
+                                "success": False,
+                                "stdout": output,
+                                "stderr": message.get("error", ""),
+                                "error": (message.get("error") or "vite build failed").splitlines()[0],
+                                "daemon": True,
+                            }
+            except (OSError, ValueError) as e:
+                logger.warning(f"Vite build daemon request failed: {e}")
+                return None
+
+    def _abort(self, reason: str):
+        logger.warning(f"Vite build {reason}, restarting the build daemon")
+        with self._lock:
+            if self.process is None:
+                # Started by another registry process; its pong names the pid to stop
+                reply = self._request({"op": "ping"})
+                if reply and reply.get("pid"):
+                    logger.warning(f"Stopping Vite build daemon {reply['pid']} started by another process")
+                    terminate_process(int(reply["pid"]))
+            self.stop()
+
+    def stats(self) -> Dict[str, Any]:
+        reply = self._request({"op": "stats"}) if self.enabled else None
+        return {
+            "enabled": self.enabled,
+            "running": reply is not None,
+            "socket": str(self.socket_path),
+            "builds": self.builds,
+            "fallbacks": self.fallbacks,
+            "daemon": reply,
+        }
+
+
+build_daemon = None
+
+def get_build_daemon() -> BuildDaemon:
+    """Get the global Vite build daemon client instance"""
+    global build_daemon
+    if build_daemon is None:
+        build_daemon = BuildDaemon()
+    return build_daemon
@@ -0,0 +1,141 @@
+import os
+import time
+import threading
+import subprocess
+from pathlib import Path
+from typing import Optional, List
+
+from .logger import get_logger
+from .metrics import record_child_usage
+from .build_control import BuildControl, BuildCancelled, StepTimedOut, terminate_process_group
+
+logger = get_logger(__name__)
+
+BUILD_LOG_DIR = Path(os.environ.get("BUILD_LOG_DIR", "/tmp/plugin_build/logs"))
+
+
+def build_log_path(build_id: str) -> Path:
+    return BUILD_LOG_DIR / f"{build_id}.log"
+
+
+class BuildLog:
+    """Log of one run of a build
+
+    Lines are flushed to BUILD_LOG_DIR/<build_id>.log as they are produced so the log can
+    be tailed while the build runs; byte offsets into that file identify stream positions.
+    The file is truncated when a run starts, so a build requeued after a restart does not
+    continue the partial log of the interrupted run. Without a build_id the log is kept in
+    memory only.
+    """
+
+    def __init__(self, build_id: Optional[str] = None):
+        self.build_id = build_id
+        self._lines: List[str] = []
+        self._lock = threading.Lock()
+        self._file = None
+        if build_id:
+            BUILD_LOG_DIR.mkdir(parents=True, exist_ok=True)
+            self._file = open(build_log_path(build_id), "w", encoding="utf-8")
+
+    def write(self, line: str):
+        line = line.rstrip("\r\n")
+        with self._lock:
+            self._lines.append(line)
+            if self._file:
+                self._file.write(line + "\n")
+                self._file.flush()
+
+    def read(self) -> str:
+        with self._lock:
+            return "\n".join(self._lines)
+
+    def close(self):
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+
+    def discard(self):
+        """Close and remove the on-disk log once it has been persisted to the build record"""
+        self.close()
+        if self.build_id:
+            build_log_path(self.build_id).unlink(missing_ok=True)
+
+
+def run_logged(args: List[str],
+               cwd: Optional[Path] = None,
+               log: Optional[BuildLog] = None,
+               env: Optional[dict] = None,
+               timeout: Optional[float] = None,
+               control: Optional[BuildControl] = None) -> subprocess.CompletedProcess:
+    """Run a command, forwarding stdout/stderr to the build log line by line
+
+    Behaves like subprocess.run(..., capture_output=True, text=True, check=True): the full
+    output is returned and a non-zero exit raises CalledProcessError. The command runs in its
+    own process group, which is killed as a whole when timeout expires (StepTimedOut) or the
+    build is cancelled through control (BuildCancelled).
+    """
+    if control is not None:
+        control.checkpoint()
+    process = subprocess.Popen(
+        args,
+        cwd=cwd,
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        bufsize=1,
+        start_new_session=True,
+    )
+    stdout_lines: List[str] = []
+    stderr_lines: List[str] = []
+
+    def pump(stream, lines):
+        for line in stream:
+            lines.append(line)
+            if log is not None:
+                log.write(line)
+        stream.close()
+
+    finished = threading.Event()
+    stopped_by: List[str] = []
+
+    def watch():
+        deadline = time.monotonic() + timeout if timeout else None
+        while not finished.wait(0.1):
+            if control is not None and control.cancelled:
+                stopped_by.append("cancelled")
+            elif deadline is not None and time.monotonic() >= deadline:
+                stopped_by.append("timeout")
+            else:
+                continue
+            # npm and vite spawn their own children; take down the whole group
+            terminate_process_group(process.pid)
+            return
+
+    threads = [
+        threading.Thread(target=pump, args=(process.stdout, stdout_lines), daemon=True),
+        threading.Thread(target=pump, args=(process.stderr, stderr_lines), daemon=True),
+    ]
+    if timeout or control is not None:
+        threads.append(threading.Thread(target=watch, daemon=True))
+    for thread in threads:
+        thread.start()
+    # Reap the child ourselves so its CPU time and peak RSS can be attributed to the build step
+    _, status, rusage = os.wait4(process.pid, 0)
+    returncode = os.waitstatus_to_exitcode(status)
+    process.returncode = returncode
+    record_child_usage(rusage)
+    finished.set()
+    for thread in threads:
+        thread.join()
+
+    stdout = "".join(stdout_lines)
+    stderr = "".join(stderr_lines)
+    if stopped_by == ["cancelled"]:
+        raise BuildCancelled(f"Build was cancelled while running {' '.join(args)}")
+    if stopped_by == ["timeout"]:
+        raise StepTimedOut(f"{' '.join(args)} timed out after {timeout:g}s")
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, args, output=stdout, stderr=stderr)
+    return subprocess.CompletedProcess(args, returncode, stdout, stderr)
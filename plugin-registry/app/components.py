@@ -0,0 +1,167 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from typing import Optional, Dict, Any, Tuple
+
+from .models import Plugin, PluginBuild, RemovedComponent, BuildStatus, SessionLocal
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def parse_since(since: str) -> datetime:
+    """Parse a ?since= cursor: the last_modified value of an earlier response or epoch seconds"""
+    try:
+        return datetime.utcfromtimestamp(float(since))
+    except ValueError:
+        pass
+    parsed = datetime.fromisoformat(since.replace("Z", "+00:00"))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def http_date(value: datetime) -> str:
+    return format_datetime(value.replace(tzinfo=timezone.utc, microsecond=0), usegmt=True)
+
+
+def strong_etag(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+class ComponentIndex:
+    """In-memory component manifest built from the plugins and plugin_builds tables
+
+    Each plugin contributes the component entry of its current build (Plugin.current_build_id,
+    moved by builds and rollbacks), or else of its most recent completed build; deleted
+    plugins leave a RemovedComponent tombstone so delta queries can report them. The index is
+    rebuilt lazily after invalidate() or once it is older than COMPONENTS_CACHE_TTL seconds,
+    and the serialised full manifest and its ETag are kept so polls cost a dict lookup.
+
+    Change times are stamped before their transaction commits, so a build can become visible
+    after a poller has already been handed a later last_modified. Delta queries therefore
+    reach back COMPONENTS_SINCE_WINDOW seconds before the cursor; clients apply entries by id,
+    so the repeated ones are harmless.
+    """
+
+    def __init__(self, ttl: float = None, since_window: float = None):
+        if ttl is None:
+            ttl = float(os.environ.get("COMPONENTS_CACHE_TTL", "30"))
+        if since_window is None:
+            since_window = float(os.environ.get("COMPONENTS_SINCE_WINDOW", "30"))
+        self.ttl = ttl
+        self.since_window = timedelta(seconds=since_window)
+        self._lock = threading.Lock()
+        self._loaded_at = 0.0
+        self._version = 0
+        self._loaded_version = -1
+        self.components: Dict[str, Tuple[datetime, Dict[str, Any]]] = {}
+        self.removed: Dict[str, Tuple[datetime, Optional[str]]] = {}
+        self.last_modified = datetime.utcfromtimestamp(0)
+        self.body = b""
+        self.etag = ""
+
+    def invalidate(self):
+        """Mark the index stale after builds finish or plugins are deleted"""
+        with self._lock:
+            self._version += 1
+
+    def _load(self):
+        components = {}
+        removed = {}
+        with SessionLocal() as session:
+            builds = (
+                session.query(PluginBuild)
+                .filter(PluginBuild.status == BuildStatus.COMPLETED.value)
+                .filter(PluginBuild.component_entry.isnot(None))
+                .filter(PluginBuild.pruned_at.is_(None))
+                .order_by(PluginBuild.finished_at, PluginBuild.updated_at)
+                .all()
+            )
+            current = dict(
+                session.query(Plugin.current_build_id, Plugin.activated_at)
+                .filter(Plugin.current_build_id.isnot(None))
+                .all()
+            )
+            pinned = set()
+            for build in builds:
+                # Later builds overwrite earlier ones, leaving the latest per plugin unless one is current
+                if build.plugin_id in pinned:
+                    continue
+                changed_at = build.finished_at or build.updated_at
+                if build.build_id in current:
+                    # A rollback activates an old build; it changed when it was activated
+                    changed_at = max(changed_at, current[build.build_id] or changed_at)
+                    pinned.add(build.plugin_id)
+                components[build.plugin_id] = (changed_at, build.component_entry)
+            for tombstone in session.query(RemovedComponent).all():
+                if tombstone.plugin_id not in components:
+                    removed[tombstone.plugin_id] = (tombstone.removed_at, tombstone.name)
+
+        timestamps = [changed_at for changed_at, _ in components.values()]
+        timestamps += [removed_at for removed_at, _ in removed.values()]
+        self.components = components
+        self.removed = removed
+        self.last_modified = max(timestamps, default=datetime.utcfromtimestamp(0))
+        self.body = self._serialise({
+            "components": [entry for _, entry in sorted(components.values(), key=lambda item: item[0])],
+            "last_modified": self.last_modified.isoformat(),
+        })
+        self.etag = strong_etag(self.body)
+
+    @staticmethod
+    def _serialise(payload: Dict[str, Any]) -> bytes:
+        return json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str).encode()
+
+    def refresh(self):
+        """Rebuild the index if it was invalidated or has outlived its TTL"""
+        with self._lock:
+            now = time.monotonic()
+            if self._loaded_version == self._version and now - self._loaded_at < self.ttl:
+                return
+            version = self._version
+            self._load()
+            self._loaded_version = version
+            self._loaded_at = now
+            logger.info(f"Component index rebuilt: {len(self.components)} components, etag {self.etag}")
+
+    def manifest(self, since: Optional[datetime] = None) -> Tuple[bytes, str]:
+        """Serialised manifest and its strong ETag; with since, only what changed after it
+
+        The delta also repeats whatever changed in the since_window before the cursor.
+        """
+        self.refresh()
+        with self._lock:
+            if since is None:
+                return self.body, self.etag
+            cutoff = since - self.since_window
+            changed = [
+                entry for changed_at, entry in sorted(self.components.values(), key=lambda item: item[0])
+                if changed_at > cutoff
+            ]
+            removed = [
+                {"id": plugin_id, "name": name}
+                for plugin_id, (removed_at, name) in self.removed.items()
+                if removed_at > cutoff
+            ]
+            body = self._serialise({
+                "components": changed,
+                "removed": removed,
+                "since": since.isoformat(),
+                "last_modified": self.last_modified.isoformat(),
+            })
+        return body, strong_etag(body)
+
+
+component_index = None
+
+def get_component_index() -> ComponentIndex:
+    """Get the global component index instance"""
+    global component_index
+    if component_index is None:
+        component_index = ComponentIndex()
+    return component_index
@@ -1,8 +1,33 @@
-from .models import SessionLocal, Base, engine
+from .models import SessionLocal, engine
+from sqlalchemy import inspect
+from alembic import command
+from alembic.config import Config
+from pathlib import Path
 import os
 
-def create_tables():
-    Base.metadata.create_all(bind=engine)
+ALEMBIC_INI = Path(__file__).resolve().parent.parent / "alembic.ini"
+# Schema that Base.metadata.create_all() produced before the registry used migrations
+BASELINE_REVISION = "0001"
+
+def alembic_config():
+    config = Config(str(ALEMBIC_INI))
+    config.attributes["configure_logger"] = False
+    return config
+
+def run_migrations():
+    """Upgrade the database to the latest schema revision
+
+    Databases created before migrations were introduced have tables but no alembic_version;
+    they are stamped at the baseline revision first, and the later revisions skip columns
+    and tables such a database already has.
+    """
+    config = alembic_config()
+    with engine.begin() as connection:
+        config.attributes["connection"] = connection
+        inspector = inspect(connection)
+        if inspector.has_table("plugins") and not inspector.has_table("alembic_version"):
+            command.stamp(config, BASELINE_REVISION)
+        command.upgrade(config, "head")
 
 def ensure_data_directory():
     database_path = os.getenv("DATABASE_PATH", "./plugin_registry.db")
@@ -19,4 +44,4 @@ def get_db():
 
 def init_db():
     ensure_data_directory()
-    create_tables() 
\ No newline at end of file
+    run_migrations()
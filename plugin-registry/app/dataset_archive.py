@@ -0,0 +1,204 @@
+import zlib
+import struct
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional, Dict, Any, List, Tuple, Iterator
+
+from .artifact_store import ArtifactStore, get_artifact_store
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+STREAM_CHUNK_SIZE = 1024 * 1024
+ZIP64_LIMIT = 0xFFFFFFFF
+ZIP_VERSION = 20
+ZIP64_VERSION = 45
+MADE_BY_UNIX = 3 << 8
+UTF8_NAMES = 0x800
+FILE_ATTRIBUTES = 0o100644 << 16
+
+# CRC-32s of blobs from manifests published before they recorded one
+_crc_cache: "OrderedDict[str, int]" = OrderedDict()
+_crc_lock = threading.Lock()
+CRC_CACHE_SIZE = 100000
+
+
+def dos_timestamp(moment: datetime) -> Tuple[int, int]:
+    """MS-DOS (time, date) fields of a zip header"""
+    moment = max(moment, datetime(1980, 1, 1))
+    return (
+        (moment.hour << 11) | (moment.minute << 5) | (moment.second // 2),
+        ((moment.year - 1980) << 9) | (moment.month << 5) | moment.day,
+    )
+
+
+def parse_byte_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Parse a Range header into an inclusive (start, end) pair
+
+    Returns None when the header should be ignored (not a byte range, or several ranges,
+    which are answered with the whole body) and raises ValueError when it is unsatisfiable.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, separator, last = (part.strip() for part in spec.strip().partition("-"))
+    if not separator or not (first or last) or not all(part.isdigit() for part in (first, last) if part):
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        if int(last) == 0:
+            raise ValueError("Empty suffix range")
+        return max(size - int(last), 0), size - 1
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise ValueError(f"Range {header} starts past the end ({size} bytes)")
+    return start, min(int(last), size - 1) if last else size - 1
+
+
+class DatasetArchive:
+    """Deterministic, uncompressed zip of a published tree, streamed straight from its blobs
+
+    Entries are STORED in path order with CRC-32s and sizes taken from the manifest, so the
+    byte layout of the whole archive is known before any blob is read: its size can be
+    announced up front and any byte range is served by fetching only the blob ranges it
+    covers. Nothing is staged locally and memory use is one chunk regardless of the dataset
+    size. Zip64 records are added only when sizes, offsets or the entry count need them.
+    """
+
+    def __init__(self, name: str, entries: List[Dict[str, Any]], modified: datetime, store: ArtifactStore):
+        self.name = name
+        self.store = store
+        # (offset, length, literal bytes or None, blob key)
+        self.segments: List[Tuple[int, int, Optional[bytes], Optional[str]]] = []
+        time, date = dos_timestamp(modified)
+        central = []
+        offset = 0
+
+        for entry in sorted(entries, key=lambda entry: entry["path"]):
+            name_bytes = f"{name}/{entry['path']}".encode()
+            size = entry["size"]
+            zip64 = size >= ZIP64_LIMIT or offset >= ZIP64_LIMIT
+            version = ZIP64_VERSION if zip64 else ZIP_VERSION
+            stored_size = ZIP64_LIMIT if zip64 else size
+
+            local_extra = struct.pack("<HHQQ", 1, 16, size, size) if zip64 else b""
+            header = struct.pack(
+                "<IHHHHHIIIHH", 0x04034B50, version, UTF8_NAMES, 0, time, date,
+                entry["crc32"], stored_size, stored_size, len(name_bytes), len(local_extra),
+            ) + name_bytes + local_extra
+            self._add(header)
+            if size:
+                self._add(None, size, entry["blob"])
+
+            central_extra = struct.pack("<HHQQQ", 1, 24, size, size, offset) if zip64 else b""
+            central.append(struct.pack(
+                "<IHHHHHHIIIHHHHHII", 0x02014B50, MADE_BY_UNIX | version, version, UTF8_NAMES, 0, time, date,
+                entry["crc32"], stored_size, stored_size, len(name_bytes), len(central_extra), 0, 0, 0,
+                FILE_ATTRIBUTES, ZIP64_LIMIT if zip64 else offset,
+            ) + name_bytes + central_extra)
+            offset += len(header) + size
+
+        directory = b"".join(central)
+        count = len(central)
+        end = b""
+        if count >= 0xFFFF or len(directory) >= ZIP64_LIMIT or offset >= ZIP64_LIMIT:
+            zip64_end_offset = offset + len(directory)
+            end += struct.pack(
+                "<IQHHIIQQQQ", 0x06064B50, 44, MADE_BY_UNIX | ZIP64_VERSION, ZIP64_VERSION, 0, 0,
+                count, count, len(directory), offset,
+            )
+            end += struct.pack("<IIQI", 0x07064B50, 0, zip64_end_offset, 1)
+        end += struct.pack(
+            "<IHHHHIIH", 0x06054B50, 0, 0, min(count, 0xFFFF), min(count, 0xFFFF),
+            min(len(directory), ZIP64_LIMIT), min(offset, ZIP64_LIMIT), 0,
+        )
+        self._add(directory + end)
+
+        # The central directory holds every name, CRC and offset, so it identifies the archive
+        self.etag = f'"{hashlib.sha256(directory).hexdigest()[:32]}"'
+        self.files = count
+
+    @property
+    def size(self) -> int:
+        offset, length, _, _ = self.segments[-1]
+        return offset + length
+
+    def _add(self, data: Optional[bytes], length: int = None, key: str = None):
+        offset = self.size if self.segments else 0
+        self.segments.append((offset, len(data) if data is not None else length, data, key))
+
+    def iter_range(self, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        """Yield the archive bytes start..end (inclusive), reading blobs only where needed"""
+        end = self.size - 1 if end is None else end
+        for offset, length, data, key in self.segments:
+            if offset + length <= start:
+                continue
+            if offset > end:
+                break
+            first = max(start - offset, 0)
+            last = min(end - offset, length - 1)
+            if data is not None:
+                yield data[first:last + 1]
+            else:
+                yield from self.store.client.iter_object(key, first, last, STREAM_CHUNK_SIZE)
+
+
+def _blob_crc32(store: ArtifactStore, key: str) -> int:
+    with _crc_lock:
+        if key in _crc_cache:
+            _crc_cache.move_to_end(key)
+            return _crc_cache[key]
+    crc = 0
+    for chunk in store.client.iter_object(key, chunk_size=STREAM_CHUNK_SIZE):
+        crc = zlib.crc32(chunk, crc)
+    with _crc_lock:
+        _crc_cache[key] = crc
+        while len(_crc_cache) > CRC_CACHE_SIZE:
+            _crc_cache.popitem(last=False)
+    return crc
+
+
+def dataset_archive(s3_path: str, store: Optional[ArtifactStore] = None) -> DatasetArchive:
+    """Lay out the zip of the tree a build's s3_path points at
+
+    Raises LookupError if nothing is published there. Trees from before content-addressed
+    storage and manifests without CRC-32s still work, but their blobs are read once to
+    checksum them.
+    """
+    store = store or get_artifact_store()
+    name = store.manifest_name_from_s3_path(s3_path)
+    if name is not None:
+        manifest = store.load_manifest(name)
+        if manifest is None:
+            raise LookupError(f"Manifest {name} does not exist")
+        entries = [
+            {
+                "path": path,
+                "blob": entry["blob"],
+                "size": entry["size"],
+                "crc32": entry["crc32"] if "crc32" in entry else _blob_crc32(store, entry["blob"]),
+            }
+            for path, entry in manifest["files"].items()
+        ]
+        modified = datetime.fromisoformat(manifest["created_at"])
+    else:
+        prefix = s3_path.replace("s3://", "").split("/", 1)[1].rstrip("/")
+        name = prefix.rsplit("/", 1)[-1]
+        objects = store.client.list_object_info(f"{prefix}/")
+        if not objects:
+            raise LookupError(f"No objects under {prefix}")
+        entries = [
+            {
+                "path": obj["key"][len(prefix) + 1:],
+                "blob": obj["key"],
+                "size": obj["size"],
+                "crc32": _blob_crc32(store, obj["key"]),
+            }
+            for obj in objects
+        ]
+        modified = max(obj["last_modified"] for obj in objects).replace(tzinfo=None)
+    return DatasetArchive(name, entries, modified, store)
@@ -0,0 +1,100 @@
+import os
+import shutil
+import fcntl
+import threading
+import uuid
+from importlib import metadata
+from pathlib import Path
+from typing import Optional, Callable
+
+from sparc_me import Dataset
+from sparc_me.core.metadata import Metadata
+
+from .logger import get_logger
+from .fsutils import link_tree
+
+logger = get_logger(__name__)
+
+DESCRIPTION_FILE = "dataset_description"
+
+
+def sparc_me_version() -> str:
+    """Installed sparc-me version; sparc_me itself does not define __version__"""
+    try:
+        return metadata.version("sparc-me")
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+class DatasetSkeletonCache:
+    """Empty sparc_me dataset generated once and linked into every build's dataset
+
+    sparc_me loads and rewrites every template spreadsheet on create_empty_dataset() and
+    save(). The empty dataset is saved once on disk (per dataset and sparc_me version) and
+    the dataset_description template is kept in memory, so a build only links the skeleton
+    and writes its own dataset_description.xlsx.
+    """
+
+    def __init__(self, skeleton_dir: str = None, version: str = "2.0.0"):
+        if skeleton_dir is None:
+            skeleton_dir = os.environ.get("SPARC_SKELETON_DIR", "/tmp/plugin_build/sparc_skeletons")
+        self.version = version
+        self.root = Path(skeleton_dir)
+        self.path = self.root / f"{version}-sparc_me-{sparc_me_version()}"
+        self.enabled = os.environ.get("SPARC_SKELETON_CACHE", "true").lower() not in ("0", "false", "no")
+        self._description = None
+        self._lock = threading.Lock()
+
+    def _build(self) -> Dataset:
+        dataset = Dataset()
+        dataset.create_empty_dataset(version=self.version)
+        return dataset
+
+    def ensure(self) -> Path:
+        """Create the on-disk skeleton if missing and load the description template once"""
+        with self._lock:
+            if self._description is not None and self.path.exists():
+                return self.path
+
+            dataset = self._build()
+            self.root.mkdir(parents=True, exist_ok=True)
+            with open(f"{self.path}.lock", "w") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    if not self.path.exists():
+                        staging = self.root / f".staging-{uuid.uuid4().hex[:8]}"
+                        try:
+                            dataset.set_path(str(staging))
+                            dataset.save(save_dir=str(staging))
+                            os.rename(staging, self.path)
+                            logger.info(f"Created sparc_me {self.version} dataset skeleton in {self.path}")
+                        finally:
+                            shutil.rmtree(staging, ignore_errors=True)
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+            self._description = dataset.get_metadata(metadata_file=DESCRIPTION_FILE).data.copy(deep=True)
+            return self.path
+
+    def create(self, dataset_dir: Path, describe: Callable[[Metadata], None]) -> Path:
+        """Materialise the skeleton in dataset_dir and write a dataset_description patched by describe"""
+        skeleton = self.ensure()
+        description_path = dataset_dir / f"{DESCRIPTION_FILE}.xlsx"
+        link_tree(skeleton, dataset_dir, ignore=[description_path.name])
+
+        description = Metadata(DESCRIPTION_FILE, self._description.copy(deep=True), self.version, dataset_dir)
+        describe(description)
+        # Never write through a link into the shared skeleton
+        description_path.unlink(missing_ok=True)
+        description.data.to_excel(description_path, index=False)
+        return dataset_dir
+
+
+dataset_skeleton_cache = None
+
+def get_dataset_skeleton_cache() -> DatasetSkeletonCache:
+    """Get the global sparc_me dataset skeleton cache instance"""
+    global dataset_skeleton_cache
+    if dataset_skeleton_cache is None:
+        dataset_skeleton_cache = DatasetSkeletonCache()
+    return dataset_skeleton_cache
@@ -0,0 +1,109 @@
+import os
+import shutil
+import fcntl
+from pathlib import Path
+from typing import Iterable, Optional
+
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+# ioctl request number for FICLONE (linux/fs.h), used to reflink a whole file
+FICLONE = 0x40049409
+
+
+def reflink_file(src: Path, dst: Path) -> bool:
+    """Clone src into dst sharing extents (btrfs/xfs); return False if unsupported"""
+    try:
+        with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        shutil.copystat(src, dst)
+        return True
+    except OSError:
+        try:
+            os.unlink(dst)
+        except FileNotFoundError:
+            pass
+        return False
+
+
+def link_file(src: Path, dst: Path, allow_hardlink: bool = True) -> str:
+    """Materialise src at dst using reflink, hardlink or copy, in that order of preference"""
+    if reflink_file(src, dst):
+        return "reflink"
+    if allow_hardlink:
+        try:
+            os.link(src, dst)
+            return "hardlink"
+        except OSError:
+            pass
+    shutil.copy2(src, dst)
+    return "copy"
+
+
+def link_tree(src: Path,
+              dst: Path,
+              ignore: Optional[Iterable[str]] = None,
+              allow_hardlink: bool = True) -> dict:
+    """Recreate the directory tree src at dst without copying file data where possible
+
+    Symlinks are recreated as symlinks. Top-level entries named in ignore are skipped.
+    Returns a count of how each file was materialised.
+    """
+    src = Path(src)
+    dst = Path(dst)
+    ignore = set(ignore or [])
+    counts = {"reflink": 0, "hardlink": 0, "copy": 0, "symlink": 0}
+
+    dst.mkdir(parents=True, exist_ok=True)
+    for root, dirs, files in os.walk(src):
+        rel_root = Path(root).relative_to(src)
+        if rel_root == Path("."):
+            dirs[:] = [d for d in dirs if d not in ignore]
+            files = [f for f in files if f not in ignore]
+
+        target_root = dst / rel_root
+        for name in list(dirs):
+            src_dir = Path(root) / name
+            if src_dir.is_symlink():
+                # os.walk lists symlinked directories but does not descend into them
+                dirs.remove(name)
+                _copy_symlink(src_dir, target_root / name)
+                counts["symlink"] += 1
+            else:
+                (target_root / name).mkdir(exist_ok=True)
+
+        for name in files:
+            src_file = Path(root) / name
+            dst_file = target_root / name
+            if dst_file.exists() or dst_file.is_symlink():
+                dst_file.unlink()
+            if src_file.is_symlink():
+                _copy_symlink(src_file, dst_file)
+                counts["symlink"] += 1
+            else:
+                counts[link_file(src_file, dst_file, allow_hardlink)] += 1
+
+    return counts
+
+
+def _copy_symlink(src: Path, dst: Path):
+    if dst.exists() or dst.is_symlink():
+        if dst.is_dir() and not dst.is_symlink():
+            shutil.rmtree(dst)
+        else:
+            dst.unlink()
+    os.symlink(os.readlink(src), dst)
+
+
+def dir_size(path: Path) -> int:
+    """Total size in bytes of regular files under path (symlinks are not followed)"""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                st = os.lstat(os.path.join(root, name))
+            except FileNotFoundError:
+                continue
+            total += st.st_size
+    return total
@@ -0,0 +1,213 @@
+import os
+import time
+import fcntl
+import shutil
+import hashlib
+import threading
+import subprocess
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional, Dict, Any, Tuple
+
+from .logger import get_logger
+from .build_logs import BuildLog, run_logged
+from .build_control import BuildControl, StepTimedOut, time_left
+
+logger = get_logger(__name__)
+
+
+def normalize_repo_url(repo_url: str) -> str:
+    """Normalise a remote repository URL the way clone_repository always has"""
+    if repo_url.startswith(("http://", "https://", "git@")) and not repo_url.endswith(".git"):
+        return repo_url + ".git"
+    return repo_url
+
+
+class GitMirrorCache:
+    """Local bare mirrors of plugin repositories, one per repository URL
+
+    Mirrors are fetched incrementally, and only when ls-remote reports a branch head the
+    mirror does not have yet. Builds get a --depth 1 clone of the mirror that borrows its
+    objects through --reference, so checking out a cached commit needs no network at all.
+    Any URL git understands works, including local paths to bare repositories.
+
+    Every git command goes through run_logged, so a build's clone step can be cancelled,
+    its git helpers (git-remote-https, ssh) are killed with it, and all commands of one
+    checkout share a single deadline.
+    """
+
+    def __init__(self, mirror_dir: str = None):
+        if mirror_dir is None:
+            mirror_dir = os.environ.get("GIT_MIRROR_DIR", "/tmp/plugin_build/git_mirrors")
+        self.mirror_dir = Path(mirror_dir)
+        self.mirror_dir.mkdir(parents=True, exist_ok=True)
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.fetches = 0
+        self.clones = 0
+
+    def mirror_path(self, repo_url: str) -> Path:
+        digest = hashlib.sha256(repo_url.encode()).hexdigest()[:16]
+        return self.mirror_dir / f"{digest}.git"
+
+    @contextmanager
+    def _locked(self,
+                mirror: Path,
+                deadline: Optional[float] = None,
+                control: Optional[BuildControl] = None):
+        """Serialise updates of one mirror across threads and processes"""
+        with open(f"{mirror}.lock", "w") as lock_file:
+            # Poll rather than block so a build waiting on another one's fetch can still stop
+            while True:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if control is not None:
+                        control.checkpoint()
+                    time_left(deadline, f"Waiting for git mirror {mirror.name}")
+                    time.sleep(0.1)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _git(self,
+             args: list,
+             cwd: Path = None,
+             deadline: Optional[float] = None,
+             log: Optional[BuildLog] = None,
+             control: Optional[BuildControl] = None) -> str:
+        result = run_logged(
+            ["git"] + args,
+            cwd=cwd,
+            log=log,
+            timeout=time_left(deadline, f"git {args[0]}"),
+            control=control
+        )
+        return result.stdout
+
+    def _count(self, counter: str):
+        with self._stats_lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def ls_remote(self,
+                  repo_url: str,
+                  branch: str,
+                  timeout: Optional[float] = None,
+                  control: Optional[BuildControl] = None) -> Optional[str]:
+        """Resolve the head commit of a remote branch without transferring any objects"""
+        deadline = time.monotonic() + timeout if timeout else None
+        try:
+            output = self._git(["ls-remote", repo_url, f"refs/heads/{branch}"], deadline=deadline, control=control)
+        except subprocess.CalledProcessError as e:
+            logger.warning(f"git ls-remote {repo_url} failed: {e.stderr}")
+            return None
+        except StepTimedOut:
+            logger.warning(f"git ls-remote {repo_url} timed out after {timeout:g}s")
+            return None
+        for line in output.splitlines():
+            sha, ref = line.split("\t", 1)
+            if ref == f"refs/heads/{branch}":
+                return sha
+        return None
+
+    def has_commit(self, mirror: Path, sha: str, control: Optional[BuildControl] = None) -> bool:
+        try:
+            self._git(["cat-file", "-e", f"{sha}^{{commit}}"], cwd=mirror, control=control)
+            return True
+        except subprocess.CalledProcessError:
+            return False
+
+    def update(self,
+               repo_url: str,
+               branch: str,
+               expected_sha: Optional[str] = None,
+               deadline: Optional[float] = None,
+               log: Optional[BuildLog] = None,
+               control: Optional[BuildControl] = None) -> Tuple[Path, str]:
+        """Make sure the mirror of repo_url has branch (at expected_sha if given) and return its head"""
+        mirror = self.mirror_path(repo_url)
+        with self._locked(mirror, deadline, control):
+            return self._update(mirror, repo_url, branch, expected_sha, deadline, log, control)
+
+    def _update(self,
+                mirror: Path,
+                repo_url: str,
+                branch: str,
+                expected_sha: Optional[str],
+                deadline: Optional[float],
+                log: Optional[BuildLog],
+                control: Optional[BuildControl]) -> Tuple[Path, str]:
+        if not mirror.exists():
+            staging = self.mirror_dir / f".staging-{uuid.uuid4().hex[:8]}.git"
+            try:
+                logger.info(f"Creating git mirror of {repo_url} in {mirror}")
+                self._git(["clone", "--mirror", repo_url, str(staging)], deadline=deadline, log=log, control=control)
+                os.rename(staging, mirror)
+            finally:
+                shutil.rmtree(staging, ignore_errors=True)
+            self._count("clones")
+        elif expected_sha and self.has_commit(mirror, expected_sha, control):
+            logger.info(f"Git mirror of {repo_url} already has {expected_sha[:12]}, skipping fetch")
+            self._count("hits")
+        else:
+            logger.info(f"Fetching {repo_url} into mirror {mirror}")
+            self._git(["fetch", "--prune", "origin"], cwd=mirror, deadline=deadline, log=log, control=control)
+            self._count("fetches")
+
+        if expected_sha and self.has_commit(mirror, expected_sha, control):
+            return mirror, expected_sha
+        head = self._git(["rev-parse", f"refs/heads/{branch}"], cwd=mirror, control=control).strip()
+        return mirror, head
+
+    def checkout(self,
+                 repo_url: str,
+                 branch: str,
+                 dest: Path,
+                 expected_sha: Optional[str] = None,
+                 deadline: Optional[float] = None,
+                 log: Optional[BuildLog] = None,
+                 control: Optional[BuildControl] = None) -> str:
+        """Create a shallow working copy of branch in dest backed by the mirror; return its commit SHA
+
+        The working copy is at expected_sha whenever the mirror has it, even if the mirror's
+        branch ref still points elsewhere (the remote was force-pushed back to an older
+        commit). deadline is a time.monotonic() value covering the mirror update and the clone.
+        """
+        mirror = self.mirror_path(repo_url)
+        # Clone under the mirror lock so a concurrent fetch --prune cannot move the ref meanwhile
+        with self._locked(mirror, deadline, control):
+            mirror, sha = self._update(mirror, repo_url, branch, expected_sha, deadline, log, control)
+            # --depth needs a file:// URL for local clones; --reference shares the mirror's objects
+            self._git([
+                "clone", "--no-checkout", "--depth", "1", "--branch", branch,
+                "--reference", str(mirror),
+                f"file://{mirror}", str(dest)
+            ], deadline=deadline, log=log, control=control)
+        # The branch tip of the shallow clone may not be sha; its objects come from the mirror
+        self._git(["checkout", "--quiet", "-B", branch, sha], cwd=dest, deadline=deadline, log=log, control=control)
+        self._git(["remote", "set-url", "origin", repo_url], cwd=dest, control=control)
+        return self._git(["rev-parse", "HEAD"], cwd=dest, control=control).strip()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            lookups = self.hits + self.fetches + self.clones
+            return {
+                "mirrors": len(list(self.mirror_dir.glob("*.git"))),
+                "hits": self.hits,
+                "fetches": self.fetches,
+                "clones": self.clones,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+
+git_mirror_cache = None
+
+def get_git_mirror_cache() -> GitMirrorCache:
+    """Get the global git mirror cache instance"""
+    global git_mirror_cache
+    if git_mirror_cache is None:
+        git_mirror_cache = GitMirrorCache()
+    return git_mirror_cache
@@ -1,27 +1,45 @@
 from pathlib import Path
 import uvicorn
-from fastapi import FastAPI, Depends, HTTPException, BackgroundTasks, Request
+from fastapi import FastAPI, Depends, HTTPException, BackgroundTasks, Request, Header
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, PlainTextResponse, Response, FileResponse
 from sqlalchemy.orm import Session
+import os
 import json
+import asyncio
 from datetime import datetime
-from typing import List, Dict, Any
+from email.utils import parsedate_to_datetime
+from typing import List, Dict, Any, Optional, Tuple
 from contextlib import asynccontextmanager
 from pydantic import BaseModel
 import uuid
-import threading
 import logging
 import requests
 import httpx
 from .models import (
     Plugin, PluginCreate, PluginResponse,
     PluginBuild, PluginBuildResponse,
-    BuildStatus, SessionLocal
+    BuildStatus, PackageStatus, SessionLocal, RemovedComponent,
+    BuildBatch, BuildBatchCreate, TERMINAL_BUILD_STATUSES, ACTIVE_PACKAGE_STATUSES
 )
 from .database import get_db, init_db
 from .build import PluginBuilder
-from .minio_client import get_minio_client
+from .build_logs import build_log_path
+from .scheduler import get_build_scheduler, plugin_to_dict
+from .storage import get_storage, LocalStorage
+from .artifact_store import get_artifact_store, IMMUTABLE_CACHE_CONTROL
+from .artifact_server import resolve_artifact, iter_file, get_artifact_cache
+from .npm_cache import get_npm_cache
+from .git_mirror import get_git_mirror_cache
+from .build_daemon import get_build_daemon
+from .metadata_publisher import get_metadata_publisher
+from .retention import get_retention_manager
+from .releases import get_release_manager
+from .batches import create_batch, batch_summary
+from .dataset_archive import dataset_archive, parse_byte_range
+from .source_archives import store_source_archive, remove_sources, SourceArchiveError, SourceArchiveTooLarge
+from .components import get_component_index, parse_since, http_date
+from .metrics import registry as metrics_registry
 from .utils import call_pennsieve_api
 from .logger import get_logger, configure_logging
 
@@ -37,9 +55,14 @@ PROMPTME_BASE_URL = "http://promptme:80"
 async def lifespan(app: FastAPI):
     # Startup
     init_db()
+    get_build_scheduler().start()
+    get_retention_manager().start()
+    await asyncio.to_thread(get_build_daemon().start)
     yield
     # Shutdown
-    pass
+    get_build_daemon().stop()
+    get_retention_manager().stop(timeout=5)
+    get_build_scheduler().stop(timeout=5)
 
 app = FastAPI(title="Plugin Registry API", version="1.0.0", lifespan=lifespan)
 
@@ -53,6 +76,31 @@ app.add_middleware(
 
 builder = PluginBuilder()
 
+metrics_registry.gauge(
+    "plugin_build_queue_depth", "Builds waiting in the queue",
+    lambda: get_build_scheduler().queue_depth())
+metrics_registry.gauge(
+    "plugin_build_workers_busy", "Build workers currently running a build",
+    lambda: get_build_scheduler().status()["active"])
+metrics_registry.gauge(
+    "plugin_build_workers", "Configured build workers",
+    lambda: get_build_scheduler().workers)
+metrics_registry.gauge(
+    "plugin_npm_cache_hit_ratio", "Share of npm installs served from the node_modules cache",
+    lambda: get_npm_cache().stats()["hit_ratio"])
+metrics_registry.gauge(
+    "plugin_npm_cache_size_bytes", "Bytes held by the node_modules cache",
+    lambda: get_npm_cache().stats()["size_bytes"])
+metrics_registry.gauge(
+    "plugin_artifact_cache_hit_ratio", "Share of artifact requests served from the on-disk blob cache",
+    lambda: get_artifact_cache().stats()["hit_ratio"])
+metrics_registry.gauge(
+    "plugin_artifact_cache_size_bytes", "Bytes held by the artifact cache",
+    lambda: get_artifact_cache().stats()["size_bytes"])
+metrics_registry.gauge(
+    "plugin_git_mirror_hit_ratio", "Share of clones served from a git mirror without fetching",
+    lambda: get_git_mirror_cache().stats()["hit_ratio"])
+
 @app.get("/")
 async def root():
     return {"message": "Plugin Registry API", "version": "1.0.0"}
@@ -89,45 +137,86 @@ async def get_plugin(plugin_id: str, db: Session = Depends(get_db)):
 async def delete_plugin(plugin_id: str, db: Session = Depends(get_db)):
     db_plugin = db.query(Plugin).filter(Plugin.id == plugin_id).first()
     if db_plugin is not None :
+        # Manifests and public/dataset directories go now; their blobs in the next retention sweep
+        await asyncio.to_thread(get_retention_manager().delete_plugin_artifacts, list(db_plugin.builds))
+        await asyncio.to_thread(get_release_manager().forget, plugin_id)
+        await asyncio.to_thread(remove_sources, plugin_id)
+        # Leave a tombstone so /components?since= reports the removal
+        db.merge(RemovedComponent(plugin_id=plugin_id, name=db_plugin.name, removed_at=datetime.utcnow()))
         db.delete(db_plugin)
         db.commit()
+        get_component_index().invalidate()
     # delete the record form the metadata.json file
-    metadata_file = Path("/app/portal/public/metadata.json")
-    if metadata_file.exists():
-        with open(metadata_file, "r") as f:
-            metadata = json.load(f)
-        metadata["components"] = [component for component in metadata["components"] if component["id"] != plugin_id]
-        with open(metadata_file, "w") as f:
-            json.dump(metadata, f)
+    publisher = get_metadata_publisher()
+    if publisher.exists():
+        await asyncio.to_thread(publisher.remove, plugin_id)
     else:
         raise HTTPException(status_code=404, detail="Metadata file not found")
     return {"message": "Plugin deleted successfully"}
 
+@app.post("/plugins/{plugin_id}/rollback/{build_id}")
+async def rollback_plugin(plugin_id: str, build_id: str):
+    """Serve an earlier build of a plugin again by moving its current pointer; nothing is rebuilt"""
+    try:
+        return await asyncio.to_thread(get_release_manager().rollback, plugin_id, build_id)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@app.get("/components")
+async def get_components(
+    request: Request,
+    since: Optional[str] = None,
+):
+    """Component manifest built from the registry database, for portals to poll
+
+    Responses carry a strong ETag and Last-Modified; If-None-Match / If-Modified-Since
+    revalidate to 304. With ?since=<last_modified of an earlier response> only components
+    changed after that point are returned, together with the ids of removed components;
+    changes from COMPONENTS_SINCE_WINDOW seconds before it are repeated, so clients should
+    apply entries by id.
+    """
+    try:
+        since_time = parse_since(since) if since else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid since value, expected an ISO timestamp or epoch seconds")
+    
+    index = get_component_index()
+    body, etag = await asyncio.to_thread(index.manifest, since_time)
+    headers = {
+        "ETag": etag,
+        "Last-Modified": http_date(index.last_modified),
+        "Cache-Control": "no-cache",
+    }
+    
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+            return Response(status_code=304, headers=headers)
+    elif request.headers.get("if-modified-since"):
+        try:
+            modified_since = parsedate_to_datetime(request.headers["if-modified-since"]).replace(tzinfo=None)
+        except (TypeError, ValueError):
+            modified_since = None
+        if modified_since is not None and index.last_modified.replace(microsecond=0) <= modified_since:
+            return Response(status_code=304, headers=headers)
+    
+    return Response(content=body, media_type="application/json", headers=headers)
+
 @app.post("/plugins/{plugin_id}/build/")
 async def execute_build(
     plugin_id: str, 
-    background_tasks: BackgroundTasks = None,
     db: Session = Depends(get_db)
 ):
-    """Execute a plugin build using git CLI and npm"""
+    """Queue a plugin build; builds run on the scheduler's bounded worker pool"""
     
     plugin = db.query(Plugin).filter(Plugin.id == plugin_id).first()
     if plugin is None:
         raise HTTPException(status_code=404, detail="Plugin not found")
     
-    # Convert Plugin object to dict for JSON serialization
-    plugin_dict = {
-        "id": plugin.id,
-        "name": plugin.name,
-        "version": plugin.version,
-        "description": plugin.description,
-        "author": plugin.author,
-        "repository_url": plugin.repository_url,
-        "plugin_metadata": plugin.plugin_metadata,
-        "created_at": plugin.created_at.isoformat() if plugin.created_at else None,
-        "updated_at": plugin.updated_at.isoformat() if plugin.updated_at else None
-    }
-    logger.info(f"Building plugin: {json.dumps(plugin_dict, indent=4)}")
+    plugin_dict = plugin_to_dict(plugin)
+    logger.info(f"Queueing build for plugin: {json.dumps(plugin_dict, indent=4)}")
     
     build_id = str(uuid.uuid4())
     
@@ -140,54 +229,105 @@ async def execute_build(
     db.commit()
     db.refresh(db_build)
     
-    def run_build():
-        try:
-            with SessionLocal() as session:
-                build_record = session.query(PluginBuild).filter(PluginBuild.build_id == build_id).first()
-                if build_record:
-                    build_record.status = BuildStatus.BUILDING.value
-                    session.commit()
-            
-            builder = PluginBuilder()
-            result = builder.build_plugin(plugin_dict)
-            
-            with SessionLocal() as session:
-                build_record = session.query(PluginBuild).filter(PluginBuild.build_id == build_id).first()
-                if build_record:
-                    if result["success"]:
-                        build_record.status = BuildStatus.COMPLETED.value
-                        build_record.s3_path = result.get("s3_path")  # Store S3 path if available
-                    else:
-                        build_record.status = BuildStatus.FAILED.value
-                        build_record.error_message = result["error_message"]
-                    
-                    build_record.build_logs = result["build_logs"]
-                    build_record.updated_at = datetime.utcnow()
-                    session.commit()
-        
-        except Exception as e:
-            # Update build record with error
-            with SessionLocal() as session:
-                build_record = session.query(PluginBuild).filter(PluginBuild.build_id == build_id).first()
-                if build_record:
-                    build_record.status = BuildStatus.FAILED.value
-                    build_record.error_message = str(e)
-                    build_record.updated_at = datetime.utcnow()
-                    session.commit()
-    
-    if background_tasks:
-        background_tasks.add_task(run_build)
-    else:
-        thread = threading.Thread(target=run_build)
-        thread.start()
+    scheduler = get_build_scheduler()
+    scheduler.notify()
     
     return {
         "build_id": build_id,
         "status": "pending",
-        "message": "Build started in background",
+        "message": "Build queued",
+        "queue_position": scheduler.queue_position(build_id),
         "repo_url": plugin.repository_url
     }
 
+@app.post("/plugins/{plugin_id}/source")
+async def upload_plugin_source(plugin_id: str, request: Request, build: bool = True, db: Session = Depends(get_db)):
+    """Upload plugin sources as a streamed tar, tar.gz or zip body and queue a build of them"""
+    plugin = db.query(Plugin).filter(Plugin.id == plugin_id).first()
+    if plugin is None:
+        raise HTTPException(status_code=404, detail="Plugin not found")
+    
+    try:
+        archive = await store_source_archive(plugin_id, request.stream())
+    except SourceArchiveTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except SourceArchiveError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    response = {"plugin_id": plugin_id, "source": archive}
+    if build:
+        build_id = str(uuid.uuid4())
+        db.add(PluginBuild(
+            plugin_id=plugin_id,
+            build_id=build_id,
+            status=BuildStatus.PENDING.value,
+            source_archive=archive["sha256"]
+        ))
+        db.commit()
+        scheduler = get_build_scheduler()
+        scheduler.notify()
+        response.update({
+            "build_id": build_id,
+            "status": "pending",
+            "message": "Build queued",
+            "queue_position": scheduler.queue_position(build_id),
+        })
+    return response
+
+@app.post("/builds/batch")
+async def execute_batch_build(request: BuildBatchCreate, db: Session = Depends(get_db)):
+    """Queue builds for a list of plugins or every plugin matching a filter, most recently used first"""
+    try:
+        batch, skipped = create_batch(db, request)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    get_build_scheduler().notify()
+    
+    summary = batch_summary(db, batch)
+    summary["skipped"] = skipped
+    summary["message"] = f"{summary['total']} builds queued"
+    return summary
+
+@app.get("/builds/batch/{batch_id}")
+async def get_batch_build(batch_id: str, db: Session = Depends(get_db)):
+    """Get the aggregate progress and duration of a batch of builds"""
+    batch = db.query(BuildBatch).filter(BuildBatch.id == batch_id).first()
+    if batch is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return batch_summary(db, batch)
+
+@app.get("/queue")
+async def get_build_queue():
+    """Get the build queue depth, worker count and the builds currently running"""
+    return get_build_scheduler().status()
+
+@app.get("/builds/{build_id}/queue")
+async def get_build_queue_position(build_id: str, db: Session = Depends(get_db)):
+    """Get the queue position of a pending build"""
+    build = db.query(PluginBuild).filter(PluginBuild.build_id == build_id).first()
+    if build is None:
+        raise HTTPException(status_code=404, detail="Build not found")
+    
+    scheduler = get_build_scheduler()
+    return {
+        "build_id": build_id,
+        "status": build.status,
+        "queue_position": scheduler.queue_position(build_id) if build.status == BuildStatus.PENDING.value else None,
+        "queue_depth": scheduler.queue_depth()
+    }
+
+@app.post("/builds/{build_id}/cancel")
+async def cancel_build(build_id: str):
+    """Cancel a queued or running build, killing the processes of its current step"""
+    status = await asyncio.to_thread(get_build_scheduler().cancel, build_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Build not found")
+    if status in TERMINAL_BUILD_STATUSES and status != BuildStatus.CANCELLED.value:
+        raise HTTPException(status_code=409, detail=f"Build already finished with status {status}")
+    return {"build_id": build_id, "status": status}
+
 
 @app.get("/plugins/{plugin_id}/builds/", response_model=List[PluginBuildResponse])
 async def get_plugin_builds(plugin_id: str, skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
@@ -206,6 +346,107 @@ async def get_build(build_id: str, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Build not found")
     return build
 
+def _get_build_status(build_id: str) -> Optional[PluginBuild]:
+    with SessionLocal() as session:
+        return session.query(PluginBuild).filter(PluginBuild.build_id == build_id).first()
+
+def _open_build_log(build_id: str):
+    try:
+        return open(build_log_path(build_id), "rb")
+    except FileNotFoundError:
+        return None
+
+def _read_build_log(log_file, position: int) -> Tuple[bytes, int]:
+    """Bytes of the log from position on, and the position they start at
+
+    A file shorter than position was restarted by a new run of the build, so reading
+    starts over from its beginning.
+    """
+    if os.fstat(log_file.fileno()).st_size < position:
+        position = 0
+    log_file.seek(position)
+    return log_file.read(), position
+
+def _sse_lines(data: bytes, offset: int):
+    """Format complete log lines from data as SSE events whose id is the byte offset after the line"""
+    events = []
+    for line in data.splitlines(keepends=True):
+        offset += len(line)
+        text = line.decode("utf-8", errors="replace").rstrip("\r\n")
+        events.append(f"id: {offset}\ndata: {text}\n\n")
+    return "".join(events)
+
+def _log_finished(record: Optional[PluginBuild]) -> bool:
+    """True once nothing more is written to a build's log, including its package stage"""
+    if record is None:
+        return True
+    return record.status in TERMINAL_BUILD_STATUSES and record.package_status not in ACTIVE_PACKAGE_STATUSES
+
+@app.get("/builds/{build_id}/logs/stream")
+async def stream_build_logs(
+    build_id: str,
+    offset: int = 0,
+    last_event_id: Optional[str] = Header(default=None),
+    db: Session = Depends(get_db)
+):
+    """Stream a build's stdout/stderr as server-sent events, resuming from a byte offset
+
+    The stream stays open through the package stage that follows a published build, which
+    writes to the same log.
+    """
+    build = db.query(PluginBuild).filter(PluginBuild.build_id == build_id).first()
+    if build is None:
+        raise HTTPException(status_code=404, detail="Build not found")
+    
+    # EventSource reconnects send the id of the last event, which is a byte offset
+    if last_event_id and last_event_id.isdigit():
+        offset = int(last_event_id)
+    
+    async def event_stream():
+        position = offset
+        log_file = None
+        try:
+            while True:
+                if log_file is None:
+                    log_file = await asyncio.to_thread(_open_build_log, build_id)
+                
+                if log_file is not None:
+                    chunk, position = await asyncio.to_thread(_read_build_log, log_file, position)
+                    # Only emit complete lines; a partial line is picked up on the next pass
+                    complete = chunk[:chunk.rfind(b"\n") + 1]
+                    if complete:
+                        yield _sse_lines(complete, position)
+                        position += len(complete)
+                        continue
+                
+                record = await asyncio.to_thread(_get_build_status, build_id)
+                if _log_finished(record):
+                    if log_file is None:
+                        log_file = await asyncio.to_thread(_open_build_log, build_id)
+                    if log_file is not None:
+                        # Lines written between the last read and the status change
+                        rest, position = await asyncio.to_thread(_read_build_log, log_file, position)
+                        if rest:
+                            yield _sse_lines(rest, position)
+                    elif record is not None and record.build_logs:
+                        persisted = (record.build_logs + "\n").encode("utf-8")
+                        if position < len(persisted):
+                            yield _sse_lines(persisted[position:], position)
+                    yield f"event: end\ndata: {record.status if record else 'deleted'}\n\n"
+                    return
+                
+                yield ": keepalive\n\n"
+                await asyncio.sleep(1)
+        finally:
+            if log_file is not None:
+                log_file.close()
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.get("/builds/", response_model=List[PluginBuildResponse])
 async def get_all_builds(skip: int = 0, limit: int = 100, status: BuildStatus = None, db: Session = Depends(get_db)):
     query = db.query(PluginBuild)
@@ -216,75 +457,272 @@ async def get_all_builds(skip: int = 0, limit: int = 100, status: BuildStatus =
     return builds
 
 
-@app.get("/builds/{build_id}/download-url")
-async def get_build_download_url(build_id: str, db: Session = Depends(get_db)):
-    """Get a presigned download URL for a build's artifacts"""
+def _resolve_build_urls(s3_path: str, path: Optional[str] = None):
+    """Resolve a build's s3_path (and optionally one file in it) to public URLs via its manifest"""
+    store = get_artifact_store()
+    manifest_name = store.manifest_name_from_s3_path(s3_path)
+    object_key = s3_path.replace("s3://", "").split("/", 1)[1]
+    
+    if manifest_name is None:
+        # Builds published before content-addressed storage live under a plain prefix
+        if path:
+            object_key = f"{object_key}/{path}"
+        return get_storage().get_public_url(object_key), None
     
+    files = store.public_urls(manifest_name)
+    if path:
+        if path not in files:
+            raise HTTPException(status_code=404, detail=f"File not found in build artifacts: {path}")
+        return files[path], None
+    return get_storage().get_public_url(object_key), files
+
+def _build_with_artifacts(db: Session, build_id: str) -> PluginBuild:
+    """Load a completed build whose packaged artifacts can still be downloaded"""
     build_record = db.query(PluginBuild).filter(PluginBuild.build_id == build_id).first()
     if build_record is None:
         raise HTTPException(status_code=404, detail="Build not found")
     
+    if build_record.pruned_at is not None:
+        raise HTTPException(status_code=410, detail="Build artifacts were removed by retention")
+    
     if not build_record.s3_path:
+        if build_record.package_status in ACTIVE_PACKAGE_STATUSES:
+            raise HTTPException(status_code=409, detail="Build dataset is still being packaged")
         raise HTTPException(status_code=404, detail="No artifacts available for this build")
     
     if build_record.status != BuildStatus.COMPLETED.value:
         raise HTTPException(status_code=400, detail="Build is not completed")
+    return build_record
+
+@app.get("/builds/{build_id}/download-url")
+async def get_build_download_url(build_id: str, path: Optional[str] = None, db: Session = Depends(get_db)):
+    """Get a presigned download URL for a build's artifacts"""
+    
+    build_record = _build_with_artifacts(db, build_id)
     
     try:
         s3_path = build_record.s3_path
         if not s3_path.startswith("s3://"):
             raise HTTPException(status_code=500, detail="Invalid S3 path format")
         
-        object_key = s3_path.replace("s3://", "").split("/", 1)[1]
-        
-        minio_client = get_minio_client()
-        download_url = minio_client.get_public_url(object_key)
+        download_url, files = _resolve_build_urls(s3_path, path)
         
         return {
             "build_id": build_id,
             "download_url": download_url,
             "expires_in": None,  # No expiration for public URLs
-            "s3_path": s3_path
+            "s3_path": s3_path,
+            "files": files
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate download URL: {str(e)}")
 
 @app.get("/builds/{build_id}/direct-url")
-async def get_build_direct_url(build_id: str, db: Session = Depends(get_db)):
+async def get_build_direct_url(build_id: str, path: Optional[str] = None, db: Session = Depends(get_db)):
     """Get a direct public URL for a build's artifacts (no expiration)"""
     
-    # Get build record
-    build_record = db.query(PluginBuild).filter(PluginBuild.build_id == build_id).first()
-    if build_record is None:
-        raise HTTPException(status_code=404, detail="Build not found")
-    
-    if not build_record.s3_path:
-        raise HTTPException(status_code=404, detail="No artifacts available for this build")
-    
-    if build_record.status != BuildStatus.COMPLETED.value:
-        raise HTTPException(status_code=400, detail="Build is not completed")
+    build_record = _build_with_artifacts(db, build_id)
     
     try:
         s3_path = build_record.s3_path
         if not s3_path.startswith("s3://"):
             raise HTTPException(status_code=500, detail="Invalid S3 path format")
         
-        object_key = s3_path.replace("s3://", "").split("/", 1)[1]
-        
-        minio_client = get_minio_client()
-        direct_url = minio_client.get_public_url(object_key)
+        direct_url, files = _resolve_build_urls(s3_path, path)
         
         return {
             "build_id": build_id,
             "direct_url": direct_url,
             "s3_path": s3_path,
+            "files": files,
             "note": "This URL has no expiration and is publicly accessible"
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate direct URL: {str(e)}")
 
+def _etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    return bool(if_none_match) and (
+        etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*"
+    )
+
+def _ranged_response(request: Request, size: int, headers: Dict[str, str], iter_range, media_type: str) -> Response:
+    """Answer GET/HEAD for a body of known size from iter_range(start, end), honouring Range and If-Range"""
+    etag = headers["ETag"]
+    headers = {"Accept-Ranges": "bytes", **headers}
+    start, end = 0, size - 1
+    status_code = 200
+    range_header = request.headers.get("range")
+    # A resumed download whose content changed in the meantime gets the whole new body
+    if range_header and request.headers.get("if-range", etag) == etag:
+        try:
+            byte_range = parse_byte_range(range_header, size)
+        except ValueError as e:
+            raise HTTPException(status_code=416, detail=str(e), headers={"Content-Range": f"bytes */{size}"})
+        if byte_range is not None:
+            start, end = byte_range
+            status_code = 206
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+
+    if request.method == "HEAD":
+        return Response(status_code=status_code, headers=headers, media_type=media_type)
+    return StreamingResponse(iter_range(start, end), status_code=status_code, headers=headers, media_type=media_type)
+
+@app.api_route("/builds/{build_id}/dataset.zip", methods=["GET", "HEAD"])
+async def download_build_dataset(build_id: str, request: Request, db: Session = Depends(get_db)):
+    """Stream a build's SPARC dataset as a zip; supports Range requests to resume downloads"""
+    build_record = _build_with_artifacts(db, build_id)
+
+    try:
+        archive = await asyncio.to_thread(dataset_archive, build_record.s3_path)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    headers = {
+        "ETag": archive.etag,
+        "Content-Disposition": f'attachment; filename="{archive.name}.zip"',
+    }
+    if _etag_matches(request, archive.etag):
+        return Response(status_code=304, headers=headers)
+    return _ranged_response(request, archive.size, headers, archive.iter_range, "application/zip")
+
+@app.api_route("/artifacts/{build_id}/{path:path}", methods=["GET", "HEAD"])
+async def serve_build_artifact(build_id: str, path: str, request: Request, db: Session = Depends(get_db)):
+    """Serve one file of a build's output from the public directory or MinIO through the artifact cache
+
+    Precompressed gzip/br variants are chosen from Accept-Encoding. Responses carry a strong
+    ETag and long-lived caching headers (build outputs never change), revalidate with
+    If-None-Match and support Range requests.
+    """
+    build_record = db.query(PluginBuild).filter(PluginBuild.build_id == build_id).first()
+    if build_record is None:
+        raise HTTPException(status_code=404, detail="Build not found")
+
+    try:
+        artifact = await asyncio.to_thread(
+            resolve_artifact, build_record, path, request.headers.get("accept-encoding", "")
+        )
+    except LookupError as e:
+        # Outputs of pruned builds stay reachable while a newer build still shares them
+        if build_record.pruned_at is not None:
+            raise HTTPException(status_code=410, detail="Build artifacts were removed by retention")
+        raise HTTPException(status_code=404, detail=str(e))
+
+    headers = {
+        "ETag": artifact["etag"],
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL,
+        "Vary": "Accept-Encoding",
+    }
+    if artifact["encoding"]:
+        headers["Content-Encoding"] = artifact["encoding"]
+    handle = artifact.get("handle")
+    if _etag_matches(request, artifact["etag"]):
+        if handle is not None:
+            handle.close()
+        return Response(status_code=304, headers=headers)
+
+    if handle is not None:
+        # A cached copy, read from the descriptor opened by the cache so eviction cannot remove it mid-response
+        try:
+            response = _ranged_response(
+                request, artifact["size"], headers,
+                lambda start, end: iter_file(handle, start, end),
+                artifact["content_type"],
+            )
+        except HTTPException:
+            handle.close()
+            raise
+        if request.method == "HEAD":
+            handle.close()
+        return response
+    if artifact["file"] is not None:
+        # Served with sendfile when the server supports it; FileResponse handles Range and If-Range
+        return FileResponse(
+            artifact["file"], headers=headers, media_type=artifact["content_type"], stat_result=artifact["stat"]
+        )
+    client = get_storage()
+    return _ranged_response(
+        request, artifact["size"], headers,
+        lambda start, end: client.iter_object(artifact["blob"], start, end),
+        artifact["content_type"],
+    )
+
+@app.get("/storage/{object_name:path}")
+async def serve_storage_object(object_name: str, request: Request):
+    """Serve an object of the local storage backend; this is what its public URLs point at"""
+    storage = get_storage()
+    if not isinstance(storage, LocalStorage):
+        raise HTTPException(status_code=404, detail="Objects are served by the storage server")
+    file_path = storage.local_path(object_name)
+    if file_path is None:
+        raise HTTPException(status_code=404, detail="Object not found")
+
+    stored = storage.headers(object_name)
+    headers = {}
+    if stored.get("ContentEncoding"):
+        headers["Content-Encoding"] = stored["ContentEncoding"]
+    if stored.get("CacheControl"):
+        headers["Cache-Control"] = stored["CacheControl"]
+    try:
+        stat = file_path.stat()
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Object not found")
+    response = FileResponse(file_path, headers=headers, media_type=stored["ContentType"], stat_result=stat)
+    if _etag_matches(request, response.headers["etag"]):
+        return Response(status_code=304, headers={"ETag": response.headers["etag"], **headers})
+    return response
+
+@app.post("/maintenance/gc")
+async def run_garbage_collection(dry_run: bool = False):
+    """Prune old builds and sweep unreferenced artifacts now; dry_run only reports what would go"""
+    return await asyncio.to_thread(get_retention_manager().run, dry_run)
+
+@app.get("/maintenance/gc")
+async def get_garbage_collection_report():
+    """Report of the last retention run"""
+    manager = get_retention_manager()
+    return {
+        "keep_builds": manager.keep,
+        "interval_seconds": manager.interval,
+        "grace_seconds": manager.grace,
+        "last_report": manager.last_report,
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus metrics: per-step build timings, queue depth and cache hit ratios"""
+    return PlainTextResponse(
+        await asyncio.to_thread(metrics_registry.render),
+        media_type="text/plain; version=0.0.4"
+    )
+
+@app.get("/cache/npm")
+async def get_npm_cache_stats():
+    """Get hit/miss statistics and occupancy of the node_modules cache"""
+    return get_npm_cache().stats()
+
+@app.get("/cache/git")
+async def get_git_mirror_stats():
+    """Get hit/fetch statistics of the local git mirror cache"""
+    return get_git_mirror_cache().stats()
+
+@app.get("/cache/artifacts")
+async def get_artifact_cache_stats():
+    """Get hit/miss statistics and occupancy of the artifact blob cache"""
+    return get_artifact_cache().stats()
+
+@app.get("/build-daemon")
+async def get_build_daemon_status():
+    """Vite build daemon state: whether it is running and how many builds it has served"""
+    return await asyncio.to_thread(get_build_daemon().stats)
+
 @app.post("/generate-plugin")
 async def generate_plugin_with_prompt(request: PromptRequest, background_tasks: BackgroundTasks):
     """Forward prompt to promptme service and handle the response"""
@@ -0,0 +1,206 @@
+import os
+import json
+import fcntl
+import tempfile
+import threading
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Callable
+
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+PUBLIC_DIR = Path(os.environ.get("PORTAL_PUBLIC_DIR", "/app/portal/public"))
+
+
+class _Update:
+    """A pending change to the component index and the callers waiting for it"""
+
+    def __init__(self, apply: Callable[[List[Dict[str, Any]]], Any]):
+        self.apply = apply
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.done = threading.Event()
+
+    def wait(self):
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class MetadataPublisher:
+    """Single writer for the portal's metadata.json
+
+    The component index is kept in memory and every change goes through one writer thread.
+    Updates arriving within batch_window seconds of each other are applied together and
+    written once. Writes hold an exclusive lock on metadata.json.lock, so other processes
+    sharing the file are serialised too, and go through a temp file that is fsynced and
+    renamed over metadata.json, so the portal never sees a partially written file. The
+    file is re-read under the lock whenever it changed on disk since our last write.
+    """
+
+    def __init__(self, metadata_file: Optional[Path] = None, batch_window: Optional[float] = None):
+        self.metadata_file = Path(metadata_file or PUBLIC_DIR / "metadata.json")
+        self.lock_file = self.metadata_file.with_name(self.metadata_file.name + ".lock")
+        if batch_window is None:
+            batch_window = float(os.environ.get("METADATA_BATCH_WINDOW", "0.05"))
+        self.batch_window = batch_window
+        self._metadata: Optional[Dict[str, Any]] = None
+        self._file_state = None
+        self._pending: List[_Update] = []
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self.writes = 0
+        self.updates = 0
+
+    def exists(self) -> bool:
+        return self.metadata_file.exists()
+
+    def _stat(self):
+        try:
+            st = os.stat(self.metadata_file)
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _load(self):
+        """Reload the index if metadata.json changed since we last wrote it (call with the file lock held)"""
+        state = self._stat()
+        if self._metadata is not None and state == self._file_state:
+            return
+        metadata = {}
+        if state is not None:
+            logger.info(f"Reading existing metadata from {self.metadata_file}")
+            try:
+                with open(self.metadata_file, "r") as f:
+                    metadata = json.load(f)
+            except (json.JSONDecodeError, Exception) as e:
+                logger.warning(f"Failed to read existing metadata, starting fresh: {e}")
+                metadata = {}
+        if not isinstance(metadata.get("components"), list):
+            metadata["components"] = []
+        self._metadata = metadata
+        self._file_state = state
+
+    def _write(self):
+        """Atomically replace metadata.json with the in-memory index (call with the file lock held)"""
+        directory = self.metadata_file.parent
+        fd, tmp_path = tempfile.mkstemp(prefix=".metadata-", suffix=".json", dir=directory)
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(json.dumps(self._metadata, indent=4))
+                f.flush()
+                os.fsync(f.fileno())
+            # mkstemp creates 0600 files; the portal serves this one to everybody
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, self.metadata_file)
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+        dir_fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+        self._file_state = self._stat()
+        self.writes += 1
+
+    def _apply_batch(self, batch: List[_Update]):
+        self.metadata_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.lock_file, "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                self._load()
+                changed = False
+                for update in batch:
+                    try:
+                        update.result = update.apply(self._metadata["components"])
+                        changed = changed or bool(update.result)
+                    except Exception as e:
+                        update.error = e
+                if changed:
+                    logger.info(f"Writing metadata to {self.metadata_file} ({len(batch)} updates)")
+                    self._write()
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _writer_loop(self):
+        while True:
+            with self._condition:
+                while not self._pending:
+                    self._condition.wait()
+            # Give the rest of a burst the chance to join this write
+            if self.batch_window > 0:
+                threading.Event().wait(self.batch_window)
+            with self._condition:
+                batch, self._pending = self._pending, []
+            try:
+                self._apply_batch(batch)
+            except BaseException as e:
+                logger.error(f"Failed to write {self.metadata_file}: {e}")
+                for update in batch:
+                    if update.error is None:
+                        update.error = e
+                # Force a reload next time; the in-memory index may be ahead of the file
+                self._metadata = None
+            for update in batch:
+                update.done.set()
+
+    def _submit(self, apply: Callable[[List[Dict[str, Any]]], Any], wait: bool = True):
+        update = _Update(apply)
+        with self._condition:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._writer_loop, name="metadata-publisher", daemon=True)
+                self._thread.start()
+            self._pending.append(update)
+            self.updates += 1
+            self._condition.notify()
+        if wait:
+            return update.wait()
+        return update
+
+    def upsert(self, component_entry: Dict[str, Any], wait: bool = True):
+        """Insert or replace the component with the same name"""
+        def apply(components: List[Dict[str, Any]]) -> bool:
+            for i, component in enumerate(components):
+                if component.get("name") == component_entry["name"]:
+                    components[i] = component_entry
+                    logger.info(f"Updated existing component: {component_entry['name']}")
+                    return True
+            components.append(component_entry)
+            logger.info(f"Added new component: {component_entry['name']}")
+            return True
+        return self._submit(apply, wait)
+
+    def remove(self, component_id: str, wait: bool = True):
+        """Remove every component with the given id; returns whether anything was removed"""
+        def apply(components: List[Dict[str, Any]]) -> bool:
+            kept = [component for component in components if component.get("id") != component_id]
+            removed = len(kept) != len(components)
+            components[:] = kept
+            return removed
+        return self._submit(apply, wait)
+
+    def components(self) -> List[Dict[str, Any]]:
+        """Snapshot of the current component index"""
+        with open(self.lock_file, "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_SH)
+            try:
+                self._load()
+                return [dict(component) for component in self._metadata["components"]]
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"updates": self.updates, "writes": self.writes, "batch_window": self.batch_window}
+
+
+metadata_publisher = None
+
+def get_metadata_publisher() -> MetadataPublisher:
+    """Get the global metadata.json publisher instance"""
+    global metadata_publisher
+    if metadata_publisher is None:
+        metadata_publisher = MetadataPublisher()
+    return metadata_publisher
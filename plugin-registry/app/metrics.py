@@ -0,0 +1,211 @@
+import time
+import math
+import threading
+from typing import Optional, Dict, Any, List, Tuple, Callable
+
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+DURATION_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+BYTES_BUCKETS = tuple(2 ** n * 1024 * 1024 for n in range(4, 14))  # 16 MiB .. 8 GiB
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    escaped = []
+    for key, value in sorted(labels.items()):
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        escaped.append(f'{key}="{value}"')
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(dict(key))} {_format_value(value)}")
+        return lines
+
+
+class Gauge:
+    """Gauge whose value is read from a callback at scrape time"""
+
+    def __init__(self, name: str, documentation: str, callback: Callable[[], float]):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        try:
+            lines.append(f"{self.name} {_format_value(self.callback())}")
+        except Exception as e:
+            logger.warning(f"Failed to collect gauge {self.name}: {e}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, buckets: Tuple[float, ...] = DURATION_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._series: Dict[Tuple, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.setdefault(key, {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0})
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                labels = dict(key)
+                for bound, count in zip(self.buckets, series["counts"]):
+                    bucket_labels = dict(labels, le=_format_value(bound))
+                    lines.append(f"{self.name}_bucket{_format_labels(bucket_labels)} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(series['sum'])}")
+                lines.append(f"{self.name}_count{_format_labels(labels)} {series['count']}")
+        return lines
+
+
+class MetricsRegistry:
+    """Minimal Prometheus text-format registry for the plugin registry"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.setdefault(metric.name, metric)
+        return self._metrics[metric.name]
+
+    def counter(self, name: str, documentation: str) -> Counter:
+        return self.register(Counter(name, documentation))
+
+    def histogram(self, name: str, documentation: str, buckets: Tuple[float, ...] = DURATION_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, buckets))
+
+    def gauge(self, name: str, documentation: str, callback: Callable[[], float]) -> Gauge:
+        return self.register(Gauge(name, documentation, callback))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+STEP_DURATION = registry.histogram(
+    "plugin_build_step_duration_seconds", "Wall time of each build step")
+STEP_CPU = registry.histogram(
+    "plugin_build_step_cpu_seconds", "CPU time (user+system) of each build step, including child processes")
+STEP_PEAK_RSS = registry.histogram(
+    "plugin_build_step_peak_rss_bytes", "Peak resident set size of the child processes of each build step",
+    BYTES_BUCKETS)
+BUILD_DURATION = registry.histogram(
+    "plugin_build_duration_seconds", "Wall time of complete builds")
+PACKAGE_DURATION = registry.histogram(
+    "plugin_build_package_duration_seconds", "Time from a build being published until its SPARC dataset is uploaded")
+BUILDS_TOTAL = registry.counter(
+    "plugin_builds_total", "Finished builds by status")
+BUILDS_REUSED = registry.counter(
+    "plugin_builds_reused_total", "Builds satisfied by reusing an earlier build with the same fingerprint")
+GC_RECLAIMED_BYTES = registry.counter(
+    "plugin_gc_reclaimed_bytes_total", "Bytes reclaimed by retention runs, by location")
+GC_RUNS = registry.counter(
+    "plugin_gc_runs_total", "Retention runs by outcome")
+ARTIFACT_CACHE_REQUESTS = registry.counter(
+    "plugin_artifact_cache_requests_total", "Artifact cache lookups by outcome (hit, miss, bypass)")
+
+
+_current = threading.local()
+
+
+def record_child_usage(rusage):
+    """Attribute the resource usage of a finished child process to the running step on this thread"""
+    timer: Optional[StepTimer] = getattr(_current, "timer", None)
+    if timer is not None:
+        timer.add_child_usage(rusage)
+
+
+class StepTimer:
+    """Records wall time, CPU time and child peak RSS for consecutive build steps
+
+    Steps run back to back: starting a step ends the previous one. CPU time covers this
+    thread plus every child process reaped through record_child_usage while the step ran.
+    """
+
+    def __init__(self):
+        self.steps: Dict[str, Dict[str, float]] = {}
+        self._step: Optional[str] = None
+        self._wall_start = 0.0
+        self._cpu_start = 0.0
+        self._child_cpu = 0.0
+        self._child_rss = 0
+        _current.timer = self
+
+    def start(self, step: str):
+        self.stop()
+        self._step = step
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.thread_time()
+        self._child_cpu = 0.0
+        self._child_rss = 0
+
+    def add_child_usage(self, rusage):
+        self._child_cpu += rusage.ru_utime + rusage.ru_stime
+        # ru_maxrss is reported in kilobytes on Linux
+        self._child_rss = max(self._child_rss, rusage.ru_maxrss * 1024)
+
+    def stop(self):
+        if self._step is None:
+            return
+        record = self.steps.setdefault(self._step, {"wall_seconds": 0.0, "cpu_seconds": 0.0, "peak_rss_bytes": 0})
+        wall = time.perf_counter() - self._wall_start
+        cpu = time.thread_time() - self._cpu_start + self._child_cpu
+        record["wall_seconds"] = round(record["wall_seconds"] + wall, 3)
+        record["cpu_seconds"] = round(record["cpu_seconds"] + cpu, 3)
+        record["peak_rss_bytes"] = max(record["peak_rss_bytes"], self._child_rss)
+
+        STEP_DURATION.observe(wall, step=self._step)
+        STEP_CPU.observe(cpu, step=self._step)
+        if self._child_rss:
+            STEP_PEAK_RSS.observe(self._child_rss, step=self._step)
+        self._step = None
+
+    def close(self):
+        self.stop()
+        if getattr(_current, "timer", None) is self:
+            _current.timer = None
@@ -1,14 +1,21 @@
 import os
+import time
+import random
 import logging
 import json
-import mimetypes
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 from botocore.exceptions import ClientError
 from pathlib import Path
+from typing import Dict, Any, List, Iterator, Optional
+
+from .storage import StorageBackend, ObjectNotFound, guess_content_type, UPLOADED_BYTES, UPLOADED_OBJECTS
 
 logger = logging.getLogger(__name__)
 
-class MinioClient:
+
+class MinioClient(StorageBackend):
     """MinIO client for storing plugin build artifacts using boto3"""
     
     def __init__(self):
@@ -17,6 +24,19 @@ class MinioClient:
         self.secret_key = os.getenv("MINIO_SECRET_KEY", "minioadmin")
         self.bucket_name = os.getenv("MINIO_BUCKET_NAME", "plugin-builds")
         self.use_ssl = os.getenv("MINIO_USE_SSL", "false").lower() == "true"
+        # Host:port browsers use to reach MinIO; the internal endpoint is usually not resolvable outside docker
+        self.public_endpoint = os.getenv("MINIO_PUBLIC_ENDPOINT", f"{os.getenv('HOST', 'localhost')}:9000")
+        
+        # Upload tuning: files are uploaded upload_workers at a time, and files above
+        # the multipart threshold are split into parts uploaded max_concurrency at a time
+        self.upload_workers = int(os.getenv("MINIO_UPLOAD_WORKERS", "8"))
+        self.upload_retries = int(os.getenv("MINIO_UPLOAD_RETRIES", "3"))
+        self.transfer_config = TransferConfig(
+            multipart_threshold=int(os.getenv("MINIO_MULTIPART_THRESHOLD", str(16 * 1024 * 1024))),
+            multipart_chunksize=int(os.getenv("MINIO_MULTIPART_CHUNKSIZE", str(8 * 1024 * 1024))),
+            max_concurrency=int(os.getenv("MINIO_MULTIPART_CONCURRENCY", "4")),
+            use_threads=True
+        )
         
         # Configure boto3 client for MinIO
         self.client = boto3.client(
@@ -24,7 +44,8 @@ class MinioClient:
             endpoint_url=f"http{'s' if self.use_ssl else ''}://{self.endpoint}",
             aws_access_key_id=self.access_key,
             aws_secret_access_key=self.secret_key,
-            region_name='us-east-1'  # MinIO doesn't require specific region
+            region_name='us-east-1',  # MinIO doesn't require specific region
+            config=Config(max_pool_connections=self.upload_workers * self.transfer_config.max_request_concurrency)
         )
         
         self._ensure_bucket_exists()
@@ -71,95 +92,126 @@ class MinioClient:
             logger.error(f"Failed to set public read policy for bucket {self.bucket_name}: {e}")
             raise
     
-    def upload_directory(self, local_path: str, remote_prefix: str) -> str:
-        """Upload a directory to MinIO"""
+    def _store_file(self, file_path: Path, object_name: str, extra_args: Dict[str, str]) -> int:
+        """Upload one file, retrying with exponential backoff; return the bytes sent"""
+        size = file_path.stat().st_size
+        for attempt in range(self.upload_retries + 1):
+            try:
+                self.client.upload_file(
+                    str(file_path), self.bucket_name, object_name,
+                    ExtraArgs=extra_args, Config=self.transfer_config
+                )
+                return size
+            except Exception as e:
+                if attempt == self.upload_retries:
+                    raise
+                delay = 0.5 * (2 ** attempt) * (1 + random.random())
+                logger.warning(f"Upload of {object_name} failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+    
+    def download_file(self, remote_name: str, local_path: str):
+        """Download a file from MinIO"""
         try:
-            local_path = Path(local_path)
-            if not local_path.exists():
-                raise FileNotFoundError(f"Local path does not exist: {local_path}")
-            
-            uploaded_files = []
-            
-            # Walk through the directory
-            for root, dirs, files in os.walk(local_path):
-                for file in files:
-                    file_path = Path(root) / file
-                    relative_path = file_path.relative_to(local_path)
-                    object_name = f"{remote_prefix}/{relative_path}"
-                    
-                    # Determine MIME type
-                    content_type, _ = mimetypes.guess_type(str(file_path))
-                    if content_type is None:
-                        if file_path.suffix.lower() in ['.js', '.mjs']:
-                            content_type = 'application/javascript'
-                        elif file_path.suffix.lower() == '.css':
-                            content_type = 'text/css'
-                        else:
-                            content_type = 'application/octet-stream'
-                    
-                    extra_args = {'ContentType': content_type}
-                    with open(file_path, 'rb') as f:
-                        self.client.upload_fileobj(f, self.bucket_name, object_name, ExtraArgs=extra_args)
-                    
-                    uploaded_files.append(object_name)
-                    logger.info(f"Uploaded: {object_name}")
-            
-            return f"s3://{self.bucket_name}/{remote_prefix}"
+            self.client.download_file(self.bucket_name, remote_name, local_path)
+            logger.info(f"Downloaded: {remote_name} -> {local_path}")
             
         except Exception as e:
-            logger.error(f"Failed to upload directory {local_path}: {e}")
+            logger.error(f"Failed to download file {remote_name}: {e}")
             raise
     
-    def upload_file(self, local_path: str, remote_name: str) -> str:
-        """Upload a single file to MinIO"""
+    def put_object(self, object_name: str, data: bytes, content_type: str = 'application/octet-stream', **extra_args) -> str:
+        """Upload an in-memory object to MinIO"""
         try:
-            if not os.path.exists(local_path):
-                raise FileNotFoundError(f"Local file does not exist: {local_path}")
-            
-            # Determine MIME type
-            content_type, _ = mimetypes.guess_type(local_path)
-            if content_type is None:
-                file_path = Path(local_path)
-                if file_path.suffix.lower() in ['.js', '.mjs']:
-                    content_type = 'application/javascript'
-                elif file_path.suffix.lower() == '.css':
-                    content_type = 'text/css'
-                else:
-                    content_type = 'application/octet-stream'
-            
-            # Upload file with correct MIME type
-            extra_args = {'ContentType': content_type}
-            self.client.upload_file(local_path, self.bucket_name, remote_name, ExtraArgs=extra_args)
-            
-            s3_path = f"s3://{self.bucket_name}/{remote_name}"
-            logger.info(f"Uploaded file: {s3_path}")
-            return s3_path
-            
+            self.client.put_object(
+                Bucket=self.bucket_name, Key=object_name, Body=data, ContentType=content_type, **extra_args
+            )
+            UPLOADED_BYTES.inc(len(data))
+            UPLOADED_OBJECTS.inc(outcome="uploaded")
+            return self.s3_path(object_name)
         except Exception as e:
-            logger.error(f"Failed to upload file {local_path}: {e}")
+            logger.error(f"Failed to put object {object_name}: {e}")
             raise
     
-    def download_file(self, remote_name: str, local_path: str):
-        """Download a file from MinIO"""
+    def get_object_bytes(self, object_name: str) -> bytes:
+        """Read a whole object from MinIO into memory"""
         try:
-            self.client.download_file(self.bucket_name, remote_name, local_path)
-            logger.info(f"Downloaded: {remote_name} -> {local_path}")
-            
+            response = self.client.get_object(Bucket=self.bucket_name, Key=object_name)
+            return response['Body'].read()
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('404', 'NoSuchKey'):
+                raise ObjectNotFound(object_name)
+            logger.error(f"Failed to read object {object_name}: {e}")
+            raise
         except Exception as e:
-            logger.error(f"Failed to download file {remote_name}: {e}")
+            logger.error(f"Failed to read object {object_name}: {e}")
+            raise
+    
+    def iter_object(self, object_name: str, start: int = 0, end: Optional[int] = None,
+                    chunk_size: int = 1024 * 1024) -> Iterator[bytes]:
+        """Stream an object, or its bytes start..end (inclusive), in chunks"""
+        extra_args = {}
+        if start or end is not None:
+            extra_args["Range"] = f"bytes={start}-{'' if end is None else end}"
+        try:
+            response = self.client.get_object(Bucket=self.bucket_name, Key=object_name, **extra_args)
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('404', 'NoSuchKey'):
+                raise ObjectNotFound(object_name)
             raise
+        body = response['Body']
+        try:
+            yield from body.iter_chunks(chunk_size)
+        finally:
+            body.close()
     
     def list_objects(self, prefix: str = "") -> list:
         """List objects in the bucket with optional prefix"""
         try:
-            response = self.client.list_objects_v2(Bucket=self.bucket_name, Prefix=prefix)
-            if 'Contents' in response:
-                return [obj['Key'] for obj in response['Contents']]
-            return []
+            keys = []
+            paginator = self.client.get_paginator('list_objects_v2')
+            for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix):
+                keys.extend(obj['Key'] for obj in page.get('Contents', []))
+            return keys
         except Exception as e:
             logger.error(f"Failed to list objects with prefix {prefix}: {e}")
             raise
     
+    def list_object_info(self, prefix: str = "") -> List[Dict[str, Any]]:
+        """List objects with their size and last-modified time"""
+        try:
+            objects = []
+            paginator = self.client.get_paginator('list_objects_v2')
+            for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix):
+                for obj in page.get('Contents', []):
+                    objects.append({
+                        "key": obj['Key'],
+                        "size": obj['Size'],
+                        "last_modified": obj['LastModified'],
+                    })
+            return objects
+        except Exception as e:
+            logger.error(f"Failed to list objects with prefix {prefix}: {e}")
+            raise
+    
+    def delete_objects(self, object_names: List[str]) -> int:
+        """Delete objects in batches of up to 1000 keys; return how many were deleted"""
+        deleted = 0
+        for i in range(0, len(object_names), 1000):
+            batch = object_names[i:i + 1000]
+            try:
+                response = self.client.delete_objects(
+                    Bucket=self.bucket_name,
+                    Delete={'Objects': [{'Key': key} for key in batch], 'Quiet': True}
+                )
+            except Exception as e:
+                logger.error(f"Failed to delete {len(batch)} objects: {e}")
+                raise
+            errors = response.get('Errors', [])
+            for error in errors:
+                logger.error(f"Failed to delete object {error.get('Key')}: {error.get('Message')}")
+            deleted += len(batch) - len(errors)
+        return deleted
+    
     def delete_object(self, object_name: str):
         """Delete an object from MinIO"""
         try:
@@ -196,7 +248,7 @@ class MinioClient:
     def get_public_url(self, object_name: str) -> str:
         """Get a public URL for an object (no expiration)"""
         protocol = "https" if self.use_ssl else "http"
-        return f"{protocol}://{self.endpoint}/{self.bucket_name}/{object_name}"
+        return f"{protocol}://{self.public_endpoint}/{self.bucket_name}/{object_name}"
     
     def object_exists(self, object_name: str) -> bool:
         """Check if an object exists"""
@@ -3,7 +3,7 @@ from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 from datetime import datetime
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, List
 from enum import Enum
 import os
 import uuid
@@ -20,6 +20,24 @@ class BuildStatus(Enum):
     BUILDING = "building"
     COMPLETED = "completed"
     FAILED = "failed"
+    CANCELLED = "cancelled"
+    TIMED_OUT = "timed_out"
+
+TERMINAL_BUILD_STATUSES = {
+    BuildStatus.COMPLETED.value, BuildStatus.FAILED.value,
+    BuildStatus.CANCELLED.value, BuildStatus.TIMED_OUT.value,
+}
+
+class PackageStatus(Enum):
+    """State of the deferred SPARC dataset packaging that follows a published build"""
+    PENDING = "pending"
+    PACKAGING = "packaging"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    SKIPPED = "skipped"
+
+# Package stages that will still write to the build log and record
+ACTIVE_PACKAGE_STATUSES = {PackageStatus.PENDING.value, PackageStatus.PACKAGING.value}
 
 class Plugin(Base):
     __tablename__ = "plugins"
@@ -31,6 +49,8 @@ class Plugin(Base):
     author = Column(String, nullable=True)
     repository_url = Column(String, nullable=True)
     plugin_metadata = Column(JSON, nullable=True)
+    current_build_id = Column(String, nullable=True)
+    activated_at = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -46,11 +66,39 @@ class PluginBuild(Base):
     build_logs = Column(Text, nullable=True)
     error_message = Column(Text, nullable=True)
     s3_path = Column(String, nullable=True)
+    fingerprint = Column(String, nullable=True, index=True)
+    component_entry = Column(JSON, nullable=True)
+    reused_build_id = Column(String, nullable=True)
+    step_metrics = Column(JSON, nullable=True)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    package_status = Column(String, nullable=True)
+    package_error = Column(Text, nullable=True)
+    packaged_at = Column(DateTime, nullable=True)
+    pruned_at = Column(DateTime, nullable=True)
+    batch_id = Column(String, ForeignKey("build_batches.id"), nullable=True, index=True)
+    source_archive = Column(String, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     plugin = relationship("Plugin", back_populates="builds")
 
+class BuildBatch(Base):
+    """A group of builds queued together by POST /builds/batch"""
+    __tablename__ = "build_batches"
+    
+    id = Column(String, primary_key=True, index=True, default=lambda: str(uuid.uuid4()))
+    selection = Column(JSON, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class RemovedComponent(Base):
+    """Tombstone for a deleted plugin so /components?since= can report the removal"""
+    __tablename__ = "removed_components"
+    
+    plugin_id = Column(String, primary_key=True)
+    name = Column(String, nullable=True)
+    removed_at = Column(DateTime, default=datetime.utcnow, index=True)
+
 class PluginBase(BaseModel):
     name: str
     version: str
@@ -70,6 +118,8 @@ class PluginUpdate(PluginBase):
 class PluginResponse(PluginBase):
     id: str
     plugin_metadata: Optional[dict] = None
+    current_build_id: Optional[str] = None
+    activated_at: Optional[datetime] = None
     created_at: datetime
     updated_at: datetime
     
@@ -82,6 +132,13 @@ class PluginBuildBase(BaseModel):
     build_logs: Optional[str] = None
     error_message: Optional[str] = None
     s3_path: Optional[str] = None
+    fingerprint: Optional[str] = None
+    reused_build_id: Optional[str] = None
+    step_metrics: Optional[dict] = None
+    package_status: Optional[str] = None
+    package_error: Optional[str] = None
+    batch_id: Optional[str] = None
+    source_archive: Optional[str] = None
 
 class PluginBuildCreate(PluginBuildBase):
     pass
@@ -97,8 +154,22 @@ class PluginBuildResponse(PluginBuildBase):
     plugin_id: str
     build_id: str
     status: str
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    packaged_at: Optional[datetime] = None
+    pruned_at: Optional[datetime] = None
     created_at: datetime
     updated_at: datetime
     
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True 
+
+class BuildBatchFilter(BaseModel):
+    """Selects plugins for a batch rebuild; an empty filter selects every plugin"""
+    name_contains: Optional[str] = None
+    is_local: Optional[bool] = None
+    last_status: Optional[str] = None
+
+class BuildBatchCreate(BaseModel):
+    plugin_ids: Optional[List[str]] = None
+    filter: Optional[BuildBatchFilter] = None
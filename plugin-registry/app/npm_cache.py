@@ -0,0 +1,250 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import hashlib
+import threading
+import subprocess
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional, Dict, Any
+
+from .logger import get_logger
+from .fsutils import link_tree, dir_size
+
+logger = get_logger(__name__)
+
+LOCKFILES = ["package-lock.json", "npm-shrinkwrap.json", "yarn.lock", "pnpm-lock.yaml"]
+MARKER_FILE = ".registry-cache-key"
+ENTRY_FILE = "entry.json"
+
+
+@lru_cache(maxsize=1)
+def get_node_version() -> Optional[str]:
+    """Return the version string of the node binary used for builds"""
+    try:
+        result = subprocess.run(["node", "--version"], capture_output=True, text=True, check=True)
+        return result.stdout.strip()
+    except (OSError, subprocess.CalledProcessError) as e:
+        logger.warning(f"Could not determine node version: {e}")
+        return None
+
+
+@lru_cache(maxsize=1)
+def get_npm_version() -> Optional[str]:
+    """Return the version string of the npm binary used for builds"""
+    try:
+        result = subprocess.run(["npm", "--version"], capture_output=True, text=True, check=True)
+        return result.stdout.strip()
+    except (OSError, subprocess.CalledProcessError) as e:
+        logger.warning(f"Could not determine npm version: {e}")
+        return None
+
+
+class NodeModulesCache:
+    """Content-addressed cache of node_modules trees keyed on package.json, lockfile and Node version
+
+    Entries are stored as cache_dir/<key>/node_modules and restored into projects with
+    reflinks where the filesystem supports them, so a hit costs a directory walk instead of
+    an npm install. Both directions use reflink/copy only and never hardlinks: a build tool
+    rewriting a file in place must not reach back into the shared entry.
+    """
+
+    def __init__(self, cache_dir: str = None, max_bytes: int = None):
+        if cache_dir is None:
+            cache_dir = os.environ.get("NPM_CACHE_DIR", "/tmp/plugin_build/npm_cache")
+        if max_bytes is None:
+            max_bytes = int(os.environ.get("NPM_CACHE_MAX_BYTES", str(5 * 1024 ** 3)))
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.enabled = os.environ.get("NPM_CACHE_ENABLED", "true").lower() == "true"
+
+        self._lock = threading.Lock()
+        self._pins: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    def compute_key(self, project_dir: Path) -> Optional[str]:
+        """Hash package.json, any lockfile and the Node version into a cache key"""
+        package_json = project_dir / "package.json"
+        node_version = get_node_version()
+        if not package_json.exists() or node_version is None:
+            return None
+
+        digest = hashlib.sha256()
+        digest.update(f"node:{node_version}\n".encode())
+        for name in ["package.json"] + LOCKFILES:
+            path = project_dir / name
+            if path.exists():
+                digest.update(f"{name}:".encode())
+                digest.update(path.read_bytes())
+                digest.update(b"\n")
+        return digest.hexdigest()
+
+    def _entry_dir(self, key: str) -> Path:
+        return self.cache_dir / key
+
+    def modules_dir(self, project_dir: Path) -> Optional[Path]:
+        """Cached node_modules that project_dir/node_modules was restored from or stored as"""
+        marker = project_dir / "node_modules" / MARKER_FILE
+        try:
+            key = marker.read_text().strip()
+        except OSError:
+            return None
+        modules_dir = self._entry_dir(key) / "node_modules"
+        return modules_dir if key and modules_dir.is_dir() else None
+
+    def _read_entry(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._entry_dir(key) / ENTRY_FILE, "r") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def _write_entry(self, entry_dir: Path, entry: Dict[str, Any]):
+        tmp_file = entry_dir / f".{ENTRY_FILE}.{uuid.uuid4().hex[:8]}"
+        with open(tmp_file, "w") as f:
+            json.dump(entry, f)
+        os.replace(tmp_file, entry_dir / ENTRY_FILE)
+
+    def restore(self, key: Optional[str], project_dir: Path) -> bool:
+        """Restore a cached node_modules into project_dir; return True on a cache hit"""
+        if not self.enabled or key is None:
+            return False
+
+        with self._lock:
+            entry = self._read_entry(key)
+            if entry is None:
+                self.misses += 1
+                return False
+            entry["last_used"] = time.time()
+            self._write_entry(self._entry_dir(key), entry)
+            self._pins[key] = self._pins.get(key, 0) + 1
+            self.hits += 1
+
+        try:
+            node_modules = project_dir / "node_modules"
+            marker = node_modules / MARKER_FILE
+            if marker.exists() and marker.read_text().strip() == key:
+                logger.info(f"node_modules in {project_dir} already matches cache key {key[:12]}")
+                return True
+            if node_modules.exists() or node_modules.is_symlink():
+                if node_modules.is_symlink():
+                    node_modules.unlink()
+                else:
+                    shutil.rmtree(node_modules)
+
+            start = time.perf_counter()
+            counts = link_tree(self._entry_dir(key) / "node_modules", node_modules, allow_hardlink=False)
+            marker.write_text(key)
+            logger.info(
+                f"Restored node_modules from cache {key[:12]} in {time.perf_counter() - start:.2f}s "
+                f"({counts})"
+            )
+            return True
+        except Exception as e:
+            logger.warning(f"Failed to restore node_modules from cache {key[:12]}: {e}")
+            with self._lock:
+                self.hits -= 1
+                self.misses += 1
+            shutil.rmtree(project_dir / "node_modules", ignore_errors=True)
+            return False
+        finally:
+            with self._lock:
+                self._pins[key] -= 1
+                if self._pins[key] == 0:
+                    del self._pins[key]
+
+    def store(self, key: Optional[str], project_dir: Path):
+        """Populate the cache from a freshly installed project_dir/node_modules"""
+        if not self.enabled or key is None:
+            return
+        node_modules = project_dir / "node_modules"
+        if not node_modules.is_dir() or self._entry_dir(key).exists():
+            return
+
+        staging_dir = self.cache_dir / f".staging-{uuid.uuid4().hex[:8]}"
+        try:
+            start = time.perf_counter()
+            link_tree(node_modules, staging_dir / "node_modules", ignore=[MARKER_FILE], allow_hardlink=False)
+            size = dir_size(staging_dir)
+            if size > self.max_bytes:
+                logger.warning(f"node_modules for {key[:12]} ({size} bytes) exceeds the cache size cap, not caching")
+                return
+            now = time.time()
+            self._write_entry(staging_dir, {"key": key, "size": size, "created_at": now, "last_used": now})
+
+            with self._lock:
+                if self._entry_dir(key).exists():
+                    return
+                os.rename(staging_dir, self._entry_dir(key))
+                self.stores += 1
+            (node_modules / MARKER_FILE).write_text(key)
+            logger.info(f"Cached node_modules as {key[:12]} ({size} bytes) in {time.perf_counter() - start:.2f}s")
+            self.evict()
+        except Exception as e:
+            logger.warning(f"Failed to populate node_modules cache for {key[:12]}: {e}")
+        finally:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+
+    def _entries(self) -> list:
+        entries = []
+        for entry_dir in self.cache_dir.iterdir():
+            if entry_dir.name.startswith("."):
+                continue
+            entry = self._read_entry(entry_dir.name)
+            if entry is not None:
+                entries.append(entry)
+        return entries
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits under max_bytes"""
+        with self._lock:
+            entries = sorted(self._entries(), key=lambda e: e["last_used"])
+            total = sum(e["size"] for e in entries)
+            doomed = []
+            for entry in entries:
+                if total <= self.max_bytes:
+                    break
+                if entry["key"] in self._pins:
+                    continue
+                trash_dir = self.cache_dir / f".evicted-{uuid.uuid4().hex[:8]}"
+                os.rename(self._entry_dir(entry["key"]), trash_dir)
+                doomed.append(trash_dir)
+                total -= entry["size"]
+                self.evictions += 1
+                logger.info(f"Evicted node_modules cache entry {entry['key'][:12]} ({entry['size']} bytes)")
+
+        for trash_dir in doomed:
+            shutil.rmtree(trash_dir, ignore_errors=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and current cache occupancy"""
+        with self._lock:
+            entries = self._entries()
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "entries": len(entries),
+                "size_bytes": sum(e["size"] for e in entries),
+                "max_bytes": self.max_bytes,
+            }
+
+
+npm_cache = None
+
+def get_npm_cache() -> NodeModulesCache:
+    """Get the global node_modules cache instance"""
+    global npm_cache
+    if npm_cache is None:
+        npm_cache = NodeModulesCache()
+    return npm_cache
@@ -0,0 +1,155 @@
+import os
+import json
+import time
+import uuid
+import threading
+from collections import defaultdict
+from datetime import datetime
+from typing import Optional, Dict, Any
+
+from .models import Plugin, PluginBuild, BuildStatus, SessionLocal
+from .metadata_publisher import get_metadata_publisher, PUBLIC_DIR
+from .components import get_component_index
+from .storage import get_storage
+from .artifact_store import get_artifact_store
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+CURRENT_DIR = PUBLIC_DIR / "current"
+CURRENT_PREFIX = "current"
+
+# Component entry fields that follow the plugin record rather than the build
+PLUGIN_FIELDS = ("name", "description", "version", "author", "repository_url")
+
+
+class ReleaseManager:
+    """Per-plugin "current" pointer over immutable build outputs
+
+    Every build publishes into its own location (PUBLIC_DIR/<unique name> for local plugins,
+    the <unique name>.bundle manifest in MinIO otherwise) that is never modified afterwards.
+    Which build a plugin serves is a pointer kept in three places and switched together:
+    Plugin.current_build_id, the plugin's metadata.json entry, and a stable alias, which is
+    the PUBLIC_DIR/current/<plugin id> symlink for local plugins and the
+    current/<plugin id>.json object for remote ones. Each is replaced atomically (symlink
+    rename, single PUT, row update), so activating an older build takes milliseconds.
+    """
+
+    def __init__(self):
+        self._locks = defaultdict(threading.Lock)
+        self._locks_guard = threading.Lock()
+
+    def _lock(self, plugin_id: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks[plugin_id]
+
+    def _link_current(self, plugin_id: str, name: str):
+        CURRENT_DIR.mkdir(parents=True, exist_ok=True)
+        link = CURRENT_DIR / plugin_id
+        tmp_link = CURRENT_DIR / f".{plugin_id}.{uuid.uuid4().hex[:8]}"
+        os.symlink(os.path.join("..", name), tmp_link)
+        try:
+            os.replace(tmp_link, link)
+        except BaseException:
+            tmp_link.unlink(missing_ok=True)
+            raise
+
+    def _put_pointer(self, plugin_id: str, build_id: Optional[str], component_entry: Dict[str, Any]):
+        pointer = {
+            "plugin_id": plugin_id,
+            "build_id": build_id,
+            "bundle": f"{component_entry['expose']}.bundle",
+            "component": component_entry,
+            "activated_at": datetime.utcnow().isoformat(),
+        }
+        get_storage().put_object(
+            f"{CURRENT_PREFIX}/{plugin_id}.json",
+            json.dumps(pointer, sort_keys=True).encode(),
+            content_type="application/json",
+            CacheControl="no-cache",
+        )
+
+    def activate(self, plugin_id: str, build_id: Optional[str], component_entry: Dict[str, Any]) -> Dict[str, Any]:
+        """Make a published build the one the plugin serves"""
+        start = time.perf_counter()
+        with self._lock(plugin_id):
+            if component_entry.get("is_local"):
+                self._link_current(plugin_id, component_entry["expose"])
+            else:
+                self._put_pointer(plugin_id, build_id, component_entry)
+            # metadata.json lives in the portal public dir mounted in this docker container (/app/portal/public);
+            # all writers go through the publisher so concurrent builds cannot lose each other's entries
+            get_metadata_publisher().upsert(component_entry)
+
+            previous_build_id = None
+            if build_id:
+                with SessionLocal() as session:
+                    plugin = session.query(Plugin).filter(Plugin.id == plugin_id).first()
+                    if plugin is not None:
+                        previous_build_id = plugin.current_build_id
+                        plugin.current_build_id = build_id
+                        plugin.activated_at = datetime.utcnow()
+                        session.commit()
+                get_component_index().invalidate()
+
+        seconds = time.perf_counter() - start
+        logger.info(f"Plugin {plugin_id} now serves build {build_id} ({component_entry['expose']}) after {seconds * 1000:.1f} ms")
+        return {
+            "plugin_id": plugin_id,
+            "build_id": build_id,
+            "previous_build_id": previous_build_id,
+            "component": component_entry,
+            "seconds": round(seconds, 4),
+        }
+
+    def rollback(self, plugin_id: str, build_id: str) -> Dict[str, Any]:
+        """Point a plugin back at one of its earlier builds without rebuilding or uploading
+
+        Raises LookupError if the plugin or build does not exist and ValueError if the build
+        cannot be served (not completed, pruned by retention or its files are gone).
+        """
+        with SessionLocal() as session:
+            plugin = session.query(Plugin).filter(Plugin.id == plugin_id).first()
+            if plugin is None:
+                raise LookupError("Plugin not found")
+            build = (
+                session.query(PluginBuild)
+                .filter(PluginBuild.build_id == build_id, PluginBuild.plugin_id == plugin_id)
+                .first()
+            )
+            if build is None:
+                raise LookupError("Build not found for this plugin")
+            if build.status != BuildStatus.COMPLETED.value or not build.component_entry:
+                raise ValueError(f"Build {build_id} did not complete and cannot be activated")
+            if build.pruned_at is not None:
+                raise ValueError(f"Build {build_id} was removed by retention")
+
+            component_entry = dict(build.component_entry)
+            component_entry.update({field: getattr(plugin, field) for field in PLUGIN_FIELDS})
+            component_entry["id"] = plugin_id
+
+        if component_entry.get("is_local"):
+            if not (PUBLIC_DIR / component_entry["expose"]).is_dir():
+                raise ValueError(f"Files of build {build_id} are no longer in the public directory")
+        elif not get_artifact_store().bundle_exists(component_entry["expose"]):
+            raise ValueError(f"Bundle of build {build_id} is no longer in object storage")
+        return self.activate(plugin_id, build_id, component_entry)
+
+    def forget(self, plugin_id: str):
+        """Remove the aliases of a deleted plugin"""
+        with self._lock(plugin_id):
+            (CURRENT_DIR / plugin_id).unlink(missing_ok=True)
+            try:
+                get_storage().delete_object(f"{CURRENT_PREFIX}/{plugin_id}.json")
+            except Exception as e:
+                logger.warning(f"Could not delete the current pointer of plugin {plugin_id}: {e}")
+
+
+release_manager = None
+
+def get_release_manager() -> ReleaseManager:
+    """Get the global release manager instance"""
+    global release_manager
+    if release_manager is None:
+        release_manager = ReleaseManager()
+    return release_manager
@@ -0,0 +1,356 @@
+import os
+import re
+import time
+import shutil
+import threading
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Iterable
+
+from .models import Plugin, PluginBuild, BuildStatus, SessionLocal, ACTIVE_PACKAGE_STATUSES
+from .artifact_store import get_artifact_store, manifest_blob_keys, BLOB_PREFIX, MANIFEST_PREFIX, BUNDLE_SUFFIX
+from .metadata_publisher import get_metadata_publisher, PUBLIC_DIR
+from .workspaces import WORKSPACE_LOCK_DIR, WORKSPACE_ROOT, workspace_in_use
+from .build_logs import BUILD_LOG_DIR
+from .source_archives import SOURCE_DIR
+from .fsutils import dir_size
+from .metrics import GC_RECLAIMED_BYTES, GC_RUNS
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+# Artifact names are unique_name() values; anything else is never deleted from disk
+ARTIFACT_NAME_PATTERN = re.compile(r"^[A-Za-z0-9_]+$")
+ACTIVE_BUILD_STATUSES = {BuildStatus.PENDING.value, BuildStatus.BUILDING.value}
+
+
+def artifact_name(build: PluginBuild) -> Optional[str]:
+    """Name a build's artifacts are stored under (its unique plugin path)"""
+    if build.component_entry and build.component_entry.get("expose"):
+        return build.component_entry["expose"]
+    if build.s3_path:
+        key = build.s3_path.replace("s3://", "").split("/", 1)[-1]
+        name = key[len(MANIFEST_PREFIX) + 1:-len(".json")] if key.startswith(f"{MANIFEST_PREFIX}/") else key
+        return name.strip("/") or None
+    return None
+
+
+def _path_size(path: Path) -> int:
+    if path.is_symlink() or path.is_file():
+        return path.lstat().st_size
+    return dir_size(path)
+
+
+def _remove_path(path: Path):
+    if path.is_dir() and not path.is_symlink():
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        path.unlink(missing_ok=True)
+
+
+class RetentionManager:
+    """Bounds disk and bucket usage of the build pipeline
+
+    Each run keeps the last RETENTION_KEEP_BUILDS completed builds per plugin (plus each
+    plugin's current build and anything still building or packaging) and prunes the rest: their manifests, legacy bucket prefixes,
+    local public directories and dataset directories are deleted and the build rows are marked
+    pruned. Blobs no longer referenced by any manifest are then swept (mark & sweep), and
+    orphaned clones, temp and staging directories and stale logs are removed. Workspaces a
+    registry process has claimed (see workspaces.py) are never removed, and anything younger
+    than GC_GRACE_SECONDS is left alone so in-flight work is never touched.
+    """
+
+    def __init__(self, keep: int = None, interval: float = None, grace: float = None):
+        if keep is None:
+            keep = int(os.environ.get("RETENTION_KEEP_BUILDS", "5"))
+        if interval is None:
+            interval = float(os.environ.get("GC_INTERVAL_SECONDS", str(6 * 3600)))
+        if grace is None:
+            grace = float(os.environ.get("GC_GRACE_SECONDS", "3600"))
+        self.keep = max(1, keep)
+        self.interval = interval
+        self.grace = grace
+        self.dataset_dir = Path(os.environ.get("DATASET_DIR", "./datasets"))
+        self.staging_roots = [
+            Path(os.environ.get("GIT_MIRROR_DIR", "/tmp/plugin_build/git_mirrors")),
+            Path(os.environ.get("NPM_CACHE_DIR", "/tmp/plugin_build/npm_cache")),
+            Path(os.environ.get("SPARC_SKELETON_DIR", "/tmp/plugin_build/sparc_skeletons")),
+            Path(os.environ.get("STORAGE_LOCAL_DIR", "/tmp/plugin_build/storage")),
+        ]
+        self.last_report: Optional[Dict[str, Any]] = None
+        self._run_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Run retention every GC_INTERVAL_SECONDS in a background thread (0 disables it)"""
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="retention", daemon=True)
+        self._thread.start()
+        logger.info(f"Retention scheduled every {self.interval:g}s, keeping {self.keep} builds per plugin")
+
+    def stop(self, timeout: float = None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run()
+            except Exception as e:
+                logger.error(f"Scheduled retention run failed: {e}")
+
+    def _new_report(self, dry_run: bool) -> Dict[str, Any]:
+        return {
+            "dry_run": dry_run,
+            "started_at": datetime.utcnow().isoformat(),
+            "builds_pruned": 0,
+            "objects_deleted": 0,
+            "blobs_deleted": 0,
+            "paths_deleted": 0,
+            "bucket_bytes": 0,
+            "disk_bytes": 0,
+            "errors": [],
+            "_removed": set(),
+        }
+
+    def _is_old(self, mtime: float) -> bool:
+        return time.time() - mtime > self.grace
+
+    def run(self, dry_run: bool = False) -> Dict[str, Any]:
+        """Prune old builds, sweep unreferenced blobs and remove orphaned files; return a report"""
+        with self._run_lock:
+            start = time.perf_counter()
+            report = self._new_report(dry_run)
+            live_names, prunable = self._plan()
+
+            pruned_names = {artifact_name(build) for build in prunable} - live_names - {None}
+            self._delete_artifacts(pruned_names, report, dry_run)
+            if not dry_run and prunable:
+                with SessionLocal() as session:
+                    session.query(PluginBuild).filter(
+                        PluginBuild.id.in_([build.id for build in prunable])
+                    ).update({PluginBuild.pruned_at: datetime.utcnow()}, synchronize_session=False)
+                    session.commit()
+            report["builds_pruned"] = len(prunable)
+
+            for phase in (self._sweep_bucket, self._sweep_disk):
+                try:
+                    phase(live_names, report, dry_run)
+                except Exception as e:
+                    logger.error(f"Retention phase {phase.__name__} failed: {e}")
+                    report["errors"].append(f"{phase.__name__}: {e}")
+
+            report["seconds"] = round(time.perf_counter() - start, 3)
+            report["reclaimed_bytes"] = report["bucket_bytes"] + report["disk_bytes"]
+            if not dry_run:
+                GC_RECLAIMED_BYTES.inc(report["bucket_bytes"], location="bucket")
+                GC_RECLAIMED_BYTES.inc(report["disk_bytes"], location="disk")
+            GC_RUNS.inc(outcome="error" if report["errors"] else "ok")
+            report.pop("_removed")
+            logger.info(
+                f"Retention {'dry run' if dry_run else 'run'}: pruned {report['builds_pruned']} builds, "
+                f"deleted {report['objects_deleted']} objects ({report['blobs_deleted']} blobs) and "
+                f"{report['paths_deleted']} paths, reclaimed {report['reclaimed_bytes']} bytes in {report['seconds']}s"
+            )
+            self.last_report = report
+            return report
+
+    def _plan(self):
+        """Split builds into the artifact names still in use and the builds that can be pruned"""
+        live_names = set()
+        prunable: List[PluginBuild] = []
+        with SessionLocal() as session:
+            builds = (
+                session.query(PluginBuild)
+                .filter(PluginBuild.pruned_at.is_(None))
+                .order_by(PluginBuild.plugin_id, PluginBuild.finished_at.desc(), PluginBuild.created_at.desc())
+                .all()
+            )
+            current = {
+                build_id for (build_id,) in session.query(Plugin.current_build_id)
+                .filter(Plugin.current_build_id.isnot(None))
+            }
+            kept: Dict[str, int] = {}
+            for build in builds:
+                if build.status in ACTIVE_BUILD_STATUSES or build.package_status in ACTIVE_PACKAGE_STATUSES:
+                    keep = True
+                elif build.build_id in current:
+                    # Whatever a plugin serves stays, even after a rollback past the last N builds
+                    keep = True
+                elif build.status == BuildStatus.COMPLETED.value and kept.get(build.plugin_id, 0) < self.keep:
+                    kept[build.plugin_id] = kept.get(build.plugin_id, 0) + 1
+                    keep = True
+                else:
+                    keep = False
+
+                if keep:
+                    live_names.add(artifact_name(build))
+                else:
+                    prunable.append(build)
+            session.expunge_all()
+
+        # Whatever the portal currently serves stays, even if no retained build points at it
+        try:
+            live_names.update(component.get("expose") for component in get_metadata_publisher().components())
+        except Exception as e:
+            logger.warning(f"Could not read metadata.json for retention: {e}")
+        live_names.discard(None)
+        return live_names, prunable
+
+    def _delete_artifacts(self, names: Iterable[str], report: Dict[str, Any], dry_run: bool):
+        """Delete the manifests, legacy prefixes, public directories and datasets of artifact names"""
+        names = sorted(name for name in names if name and ARTIFACT_NAME_PATTERN.match(name))
+        if not names:
+            return
+        store = get_artifact_store()
+        try:
+            objects = []
+            for name in names:
+                for manifest in (name, name + BUNDLE_SUFFIX):
+                    objects += store.client.list_object_info(store.manifest_key(manifest))
+                objects += store.client.list_object_info(f"{name}/")
+            self._delete_objects(objects, report, dry_run)
+        except Exception as e:
+            logger.error(f"Failed to delete bucket artifacts: {e}")
+            report["errors"].append(f"bucket artifacts: {e}")
+
+        for name in names:
+            paths = [PUBLIC_DIR / name]
+            if self.dataset_dir.exists():
+                paths += list(self.dataset_dir.glob(f"{name}_*"))
+            for path in paths:
+                if path.exists() or path.is_symlink():
+                    self._delete_path(path, report, dry_run)
+
+    def delete_plugin_artifacts(self, builds: Iterable[PluginBuild], dry_run: bool = False) -> Dict[str, Any]:
+        """Delete the artifacts of a plugin's builds; its blobs go in the next sweep"""
+        report = self._new_report(dry_run)
+        self._delete_artifacts({artifact_name(build) for build in builds}, report, dry_run)
+        report["reclaimed_bytes"] = report["bucket_bytes"] + report["disk_bytes"]
+        report.pop("_removed")
+        return report
+
+    def _delete_objects(self, objects: List[Dict[str, Any]], report: Dict[str, Any], dry_run: bool) -> List[str]:
+        # A dry run deletes nothing, so later phases would see the same objects again
+        objects = [obj for obj in objects if obj["key"] not in report["_removed"]]
+        keys = [obj["key"] for obj in objects]
+        report["_removed"].update(keys)
+        if not keys:
+            return keys
+        if not dry_run:
+            store = get_artifact_store()
+            store.client.delete_objects(keys)
+            store.forget(keys)
+        report["objects_deleted"] += len(keys)
+        report["bucket_bytes"] += sum(obj["size"] for obj in objects)
+        return keys
+
+    def _delete_path(self, path: Path, report: Dict[str, Any], dry_run: bool):
+        if str(path) in report["_removed"]:
+            return
+        report["_removed"].add(str(path))
+        size = _path_size(path)
+        if not dry_run:
+            _remove_path(path)
+        logger.info(f"Retention {'would remove' if dry_run else 'removed'} {path} ({size} bytes)")
+        report["paths_deleted"] += 1
+        report["disk_bytes"] += size
+
+    def _sweep_bucket(self, live_names: set, report: Dict[str, Any], dry_run: bool):
+        """Delete orphaned manifests, then every blob no remaining manifest references"""
+        store = get_artifact_store()
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.grace)
+        with store.exclusive():
+            manifests = store.client.list_object_info(f"{MANIFEST_PREFIX}/")
+            orphans, remaining = [], []
+            for obj in manifests:
+                name = obj["key"][len(MANIFEST_PREFIX) + 1:-len(".json")]
+                if name.endswith(BUNDLE_SUFFIX):
+                    name = name[:-len(BUNDLE_SUFFIX)]
+                if name not in live_names and obj["last_modified"] < cutoff:
+                    orphans.append(obj)
+                else:
+                    remaining.append(obj)
+            self._delete_objects(orphans, report, dry_run)
+
+            # Mark: everything the remaining manifests reference
+            referenced = set()
+            for obj in remaining:
+                manifest = store.load_manifest(obj["key"][len(MANIFEST_PREFIX) + 1:-len(".json")])
+                if manifest is not None:
+                    referenced |= manifest_blob_keys(manifest)
+
+            # Sweep: unreferenced blobs past the grace period
+            garbage = [
+                obj for obj in store.client.list_object_info(f"{BLOB_PREFIX}/")
+                if obj["key"] not in referenced and obj["last_modified"] < cutoff
+            ]
+            report["blobs_deleted"] += len(self._delete_objects(garbage, report, dry_run))
+
+    def _sweep_disk(self, live_names: set, report: Dict[str, Any], dry_run: bool):
+        """Remove orphaned clones, temp and staging directories, datasets, uploaded sources and build logs"""
+        # Build workspaces and variant dirs are claimed, in this or another registry process,
+        # for as long as they are in use; only unclaimed ones fall back to the age check
+        candidates = [
+            path for pattern in ("plugin_build_*", "artifact_variants_*")
+            for path in WORKSPACE_ROOT.glob(pattern)
+            if not workspace_in_use(path)
+        ]
+        if WORKSPACE_LOCK_DIR.exists():
+            # Lock files of workspaces a crashed process never released
+            candidates += [
+                path for path in WORKSPACE_LOCK_DIR.glob("*.lock")
+                if not (WORKSPACE_ROOT / path.stem).exists() and not workspace_in_use(WORKSPACE_ROOT / path.stem)
+            ]
+        for root in self.staging_roots:
+            if root.exists():
+                candidates += list(root.glob(".staging-*"))
+        if self.dataset_dir.exists():
+            candidates += [
+                path for path in self.dataset_dir.iterdir()
+                if not any(path.name.startswith(f"{name}_") for name in live_names)
+            ]
+        if BUILD_LOG_DIR.exists():
+            with SessionLocal() as session:
+                running = {
+                    row.build_id for row in session.query(PluginBuild.build_id).filter(
+                        (PluginBuild.status.in_(ACTIVE_BUILD_STATUSES))
+                        | (PluginBuild.package_status.in_(ACTIVE_PACKAGE_STATUSES))
+                    )
+                }
+            candidates += [path for path in BUILD_LOG_DIR.glob("*.log") if path.stem not in running]
+        if SOURCE_DIR.exists():
+            with SessionLocal() as session:
+                referenced = {
+                    (row.plugin_id, row.source_archive) for row in session.query(PluginBuild.plugin_id, PluginBuild.source_archive)
+                    .filter(PluginBuild.source_archive.isnot(None), PluginBuild.pruned_at.is_(None))
+                }
+            for plugin_dir in SOURCE_DIR.iterdir():
+                if plugin_dir.is_dir():
+                    # Unpacked uploads no kept build refers to, plus leftovers of interrupted uploads
+                    candidates += [
+                        path for path in plugin_dir.iterdir()
+                        if (plugin_dir.name, path.name) not in referenced
+                    ]
+
+        for path in candidates:
+            try:
+                if self._is_old(path.lstat().st_mtime):
+                    self._delete_path(path, report, dry_run)
+            except FileNotFoundError:
+                continue
+
+
+retention_manager = None
+
+def get_retention_manager() -> RetentionManager:
+    """Get the global retention manager instance"""
+    global retention_manager
+    if retention_manager is None:
+        retention_manager = RetentionManager()
+    return retention_manager
@@ -0,0 +1,84 @@
+import os
+import re
+import mmap
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Dict, Any
+
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+# Build outputs that may reference asset paths; everything else (images, fonts, wasm) is left alone
+TEXT_SUFFIXES = {".js", ".mjs", ".cjs", ".css", ".html", ".htm", ".json", ".map", ".svg", ".txt", ".xml"}
+
+
+class BundleRewriter:
+    """Replaces several literal byte patterns in build outputs in one pass per file
+
+    The patterns are compiled into a single regex alternation, longest first, so each file is
+    scanned once and overlapping patterns resolve to the longest match. Files are mapped with
+    mmap and the result is streamed to a temp file next to the original, then renamed over it;
+    files without a match are not rewritten at all.
+    """
+
+    def __init__(self, replacements: Dict[str, str]):
+        self.replacements = {
+            pattern.encode(): replacement.encode()
+            for pattern, replacement in replacements.items()
+            if pattern
+        }
+        patterns = sorted(self.replacements, key=len, reverse=True)
+        self.regex = re.compile(b"|".join(re.escape(pattern) for pattern in patterns)) if patterns else None
+
+    def rewrite_file(self, file_path: Path) -> int:
+        """Rewrite file_path in place atomically; return the number of substitutions"""
+        file_path = Path(file_path)
+        if self.regex is None or file_path.stat().st_size == 0:
+            return 0
+
+        with open(file_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            first = self.regex.search(buffer)
+            if first is None:
+                return 0
+
+            view = memoryview(buffer)
+            fd, tmp_path = tempfile.mkstemp(prefix=f".{file_path.name}.", dir=file_path.parent)
+            substitutions = 0
+            try:
+                with os.fdopen(fd, "wb") as out:
+                    position = 0
+                    for match in self.regex.finditer(buffer, first.start()):
+                        out.write(view[position:match.start()])
+                        out.write(self.replacements[match.group()])
+                        position = match.end()
+                        substitutions += 1
+                    out.write(view[position:])
+                    out.flush()
+                    os.fsync(out.fileno())
+                shutil.copymode(file_path, tmp_path)
+                os.replace(tmp_path, file_path)
+            except BaseException:
+                Path(tmp_path).unlink(missing_ok=True)
+                raise
+            finally:
+                view.release()
+        return substitutions
+
+    def rewrite_tree(self, root: Path) -> Dict[str, Any]:
+        """Rewrite every text output under root and report files scanned, rewritten and substitutions"""
+        report = {"files": 0, "rewritten": 0, "substitutions": 0, "bytes": 0}
+        for dirpath, _, filenames in os.walk(root):
+            for filename in filenames:
+                file_path = Path(dirpath) / filename
+                if file_path.suffix.lower() not in TEXT_SUFFIXES or file_path.is_symlink():
+                    continue
+                report["files"] += 1
+                report["bytes"] += file_path.stat().st_size
+                substitutions = self.rewrite_file(file_path)
+                if substitutions:
+                    report["rewritten"] += 1
+                    report["substitutions"] += substitutions
+                    logger.info(f"Rewrote {substitutions} references in {file_path}")
+        return report
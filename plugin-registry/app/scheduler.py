@@ -0,0 +1,359 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Optional, Dict, Any, List
+
+from sqlalchemy import update
+
+from .models import Plugin, PluginBuild, BuildStatus, PackageStatus, SessionLocal
+from .build import PluginBuilder
+from .build_control import BuildControl
+from .components import get_component_index
+from .logger import get_logger
+from .metrics import BUILD_DURATION, BUILDS_TOTAL, BUILDS_REUSED, PACKAGE_DURATION
+
+logger = get_logger(__name__)
+
+
+def plugin_to_dict(plugin: Plugin) -> Dict[str, Any]:
+    """Convert a Plugin row into the dict consumed by PluginBuilder.build_plugin"""
+    return {
+        "id": plugin.id,
+        "name": plugin.name,
+        "version": plugin.version,
+        "description": plugin.description,
+        "author": plugin.author,
+        "repository_url": plugin.repository_url,
+        "plugin_metadata": plugin.plugin_metadata,
+        "created_at": plugin.created_at.isoformat() if plugin.created_at else None,
+        "updated_at": plugin.updated_at.isoformat() if plugin.updated_at else None
+    }
+
+
+class BuildScheduler:
+    """Runs queued plugin builds on a bounded pool of worker threads
+
+    The queue is the plugin_builds table itself: PENDING rows are waiting in created_at
+    order and a worker claims one by flipping it to BUILDING. Because the queue lives in
+    SQLite it survives restarts; builds left BUILDING by a dead process are requeued on start.
+    """
+
+    def __init__(self, workers: int = None, poll_interval: float = None):
+        if workers is None:
+            workers = int(os.environ.get("BUILD_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+        if poll_interval is None:
+            poll_interval = float(os.environ.get("BUILD_QUEUE_POLL_INTERVAL", "5"))
+        self.workers = max(1, workers)
+        self.poll_interval = poll_interval
+        self._threads: List[threading.Thread] = []
+        self._stop = threading.Event()
+        self._wakeup = threading.Condition()
+        self._claim_lock = threading.Lock()
+        self._active: Dict[str, str] = {}
+        self._controls: Dict[str, BuildControl] = {}
+        self._controls_lock = threading.Lock()
+        # SPARC dataset packaging runs off the build workers so they can take the next build
+        self.package_workers = max(1, int(os.environ.get("PACKAGE_WORKERS", "1")))
+        self._packager: Optional[ThreadPoolExecutor] = None
+
+    def start(self):
+        """Requeue orphaned builds and start the worker threads"""
+        if self._threads:
+            return
+        self._stop.clear()
+        self.requeue_orphans()
+        self._packager = ThreadPoolExecutor(max_workers=self.package_workers, thread_name_prefix="package-worker")
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker_loop, name=f"build-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Build scheduler started with {self.workers} workers")
+
+    def stop(self, timeout: float = None):
+        """Stop accepting work and wait for the worker threads to exit"""
+        self._stop.set()
+        self.notify()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        if self._packager is not None:
+            self._packager.shutdown(wait=True)
+            self._packager = None
+
+    def notify(self):
+        """Wake idle workers because new builds were queued"""
+        with self._wakeup:
+            self._wakeup.notify_all()
+
+    def requeue_orphans(self):
+        """Return builds stuck in BUILDING (e.g. after a crash) to the queue"""
+        with SessionLocal() as session:
+            result = session.execute(
+                update(PluginBuild)
+                .where(PluginBuild.status == BuildStatus.BUILDING.value)
+                .values(status=BuildStatus.PENDING.value, started_at=None)
+            )
+            # The clones that interrupted packaging needed are gone; those builds stay published
+            packaging = session.execute(
+                update(PluginBuild)
+                .where(PluginBuild.package_status.in_([PackageStatus.PENDING.value, PackageStatus.PACKAGING.value]))
+                .values(package_status=PackageStatus.FAILED.value, package_error="Interrupted by a restart")
+            )
+            session.commit()
+            if result.rowcount:
+                logger.info(f"Requeued {result.rowcount} interrupted builds")
+            if packaging.rowcount:
+                logger.info(f"Marked {packaging.rowcount} interrupted packaging runs as failed")
+
+    def _pending_query(self, session):
+        return (
+            session.query(PluginBuild)
+            .filter(PluginBuild.status == BuildStatus.PENDING.value)
+            .order_by(PluginBuild.created_at, PluginBuild.id)
+        )
+
+    def queue_depth(self) -> int:
+        with SessionLocal() as session:
+            return self._pending_query(session).count()
+
+    def queue_position(self, build_id: str) -> Optional[int]:
+        """1-based position of a pending build in the queue, or None if it is not pending"""
+        with SessionLocal() as session:
+            pending = [row.build_id for row in self._pending_query(session).with_entities(PluginBuild.build_id)]
+        try:
+            return pending.index(build_id) + 1
+        except ValueError:
+            return None
+
+    def status(self) -> Dict[str, Any]:
+        with SessionLocal() as session:
+            pending = [row.build_id for row in self._pending_query(session).with_entities(PluginBuild.build_id)]
+        return {
+            "workers": self.workers,
+            "active": len(self._active),
+            "depth": len(pending),
+            "running": sorted(self._active.values()),
+            "pending": pending,
+        }
+
+    def _claim(self) -> Optional[str]:
+        """Atomically move the oldest PENDING build to BUILDING and return its build_id"""
+        with self._claim_lock, SessionLocal() as session:
+            while True:
+                build = self._pending_query(session).first()
+                if build is None:
+                    return None
+                # Registered before the row turns BUILDING, so cancel() finds it for any running build
+                with self._controls_lock:
+                    self._controls[build.build_id] = BuildControl()
+                claimed = False
+                try:
+                    result = session.execute(
+                        update(PluginBuild)
+                        .where(PluginBuild.id == build.id, PluginBuild.status == BuildStatus.PENDING.value)
+                        .values(status=BuildStatus.BUILDING.value, started_at=datetime.utcnow())
+                    )
+                    session.commit()
+                    claimed = result.rowcount == 1
+                finally:
+                    if not claimed:
+                        with self._controls_lock:
+                            self._controls.pop(build.build_id, None)
+                if claimed:
+                    return build.build_id
+
+    def _worker_loop(self):
+        name = threading.current_thread().name
+        while not self._stop.is_set():
+            try:
+                build_id = self._claim()
+            except Exception as e:
+                logger.error(f"{name} failed to claim a build: {e}")
+                build_id = None
+
+            if build_id is None:
+                with self._wakeup:
+                    self._wakeup.wait(self.poll_interval)
+                continue
+
+            self._active[name] = build_id
+            try:
+                self.run_build(build_id)
+            finally:
+                self._active.pop(name, None)
+                with self._controls_lock:
+                    self._controls.pop(build_id, None)
+
+    def control(self, build_id: str) -> BuildControl:
+        """Cancellation handle of a build this scheduler claimed"""
+        with self._controls_lock:
+            return self._controls.setdefault(build_id, BuildControl())
+
+    def cancel(self, build_id: str) -> Optional[str]:
+        """Cancel a queued or running build
+
+        Pending builds are cancelled on the spot. Running builds have the process group of
+        their current command killed; the worker records CANCELLED and moves on to the next
+        build. Returns the resulting status, "cancelling" for running builds, or None if the
+        build does not exist.
+        """
+        with SessionLocal() as session:
+            result = session.execute(
+                update(PluginBuild)
+                .where(PluginBuild.build_id == build_id, PluginBuild.status == BuildStatus.PENDING.value)
+                .values(
+                    status=BuildStatus.CANCELLED.value,
+                    error_message="Build was cancelled before it started",
+                    finished_at=datetime.utcnow(),
+                )
+            )
+            session.commit()
+            if result.rowcount:
+                BUILDS_TOTAL.inc(status=BuildStatus.CANCELLED.value)
+                logger.info(f"Cancelled queued build {build_id}")
+                return BuildStatus.CANCELLED.value
+
+            build_record = session.query(PluginBuild).filter(PluginBuild.build_id == build_id).first()
+            if build_record is None:
+                return None
+            if build_record.status != BuildStatus.BUILDING.value:
+                return build_record.status
+
+        with self._controls_lock:
+            control = self._controls.get(build_id)
+        if control is None:
+            # It finished since the check above, or another registry process is running it
+            with SessionLocal() as session:
+                build_record = session.query(PluginBuild).filter(PluginBuild.build_id == build_id).first()
+                return build_record.status if build_record else None
+
+        logger.info(f"Cancelling running build {build_id}")
+        control.cancel()
+        return "cancelling"
+
+    def run_build(self, build_id: str):
+        """Run a claimed build and record its outcome"""
+        builder = None
+        packaging = False
+        try:
+            with SessionLocal() as session:
+                build_record = session.query(PluginBuild).filter(PluginBuild.build_id == build_id).first()
+                plugin = build_record.plugin if build_record else None
+                if plugin is None:
+                    raise RuntimeError("Plugin for this build no longer exists")
+                plugin_dict = plugin_to_dict(plugin)
+                plugin_dict["source_archive"] = build_record.source_archive
+
+            logger.info(f"Starting build {build_id} for plugin {plugin_dict['name']}")
+            builder = PluginBuilder(build_id=build_id, control=self.control(build_id))
+            result = builder.build_plugin(plugin_dict)
+
+            with SessionLocal() as session:
+                build_record = session.query(PluginBuild).filter(PluginBuild.build_id == build_id).first()
+                if build_record:
+                    if result["success"]:
+                        build_record.status = BuildStatus.COMPLETED.value
+                        build_record.s3_path = result.get("s3_path")  # Store S3 path if available
+                        build_record.component_entry = result.get("component")
+                        build_record.reused_build_id = result.get("reused_build_id")
+                        if result.get("package"):
+                            build_record.package_status = PackageStatus.PENDING.value
+                        elif result.get("s3_path"):
+                            build_record.package_status = PackageStatus.COMPLETED.value
+                        else:
+                            build_record.package_status = PackageStatus.SKIPPED.value
+                    else:
+                        build_record.status = result.get("status", BuildStatus.FAILED.value)
+                        build_record.error_message = result["error_message"]
+
+                    build_record.fingerprint = result.get("fingerprint")
+                    build_record.step_metrics = result.get("step_metrics")
+                    build_record.build_logs = result["build_logs"]
+                    build_record.finished_at = datetime.utcnow()
+                    build_record.updated_at = datetime.utcnow()
+                    session.commit()
+                    self._observe(build_record, result)
+                    if result["success"]:
+                        get_component_index().invalidate()
+            
+            if result["success"] and result.get("package"):
+                self._packager.submit(self.run_package, build_id, builder, result["package"])
+                packaging = True
+
+        except Exception as e:
+            logger.error(f"Build {build_id} failed: {e}")
+            with SessionLocal() as session:
+                build_record = session.query(PluginBuild).filter(PluginBuild.build_id == build_id).first()
+                if build_record:
+                    build_record.status = BuildStatus.FAILED.value
+                    build_record.error_message = str(e)
+                    if builder is not None:
+                        builder.build_log.write(f"Build failed: {e}")
+                        build_record.build_logs = builder.build_log.read()
+                    build_record.finished_at = datetime.utcnow()
+                    build_record.updated_at = datetime.utcnow()
+                    session.commit()
+                    self._observe(build_record)
+        finally:
+            # The log is persisted on the build record by now, and streams fall back to it;
+            # a build handed to the packager keeps it until run_package finishes
+            if builder is not None and not packaging:
+                builder.build_log.discard()
+
+    def run_package(self, build_id: str, builder: PluginBuilder, package: Dict[str, Any]):
+        """Package stage of a published build: create and upload its SPARC dataset"""
+        try:
+            with SessionLocal() as session:
+                session.execute(
+                    update(PluginBuild)
+                    .where(PluginBuild.build_id == build_id)
+                    .values(package_status=PackageStatus.PACKAGING.value)
+                )
+                session.commit()
+
+            result = builder.package_dataset(package)
+
+            with SessionLocal() as session:
+                build_record = session.query(PluginBuild).filter(PluginBuild.build_id == build_id).first()
+                if build_record:
+                    if result["success"]:
+                        build_record.package_status = PackageStatus.COMPLETED.value
+                        build_record.s3_path = result["s3_path"]
+                    else:
+                        build_record.package_status = PackageStatus.FAILED.value
+                        build_record.package_error = result["error_message"]
+                    build_record.step_metrics = dict(build_record.step_metrics or {}, **result["step_metrics"])
+                    build_record.build_logs = builder.build_log.read()
+                    build_record.packaged_at = datetime.utcnow()
+                    session.commit()
+                    if build_record.finished_at:
+                        PACKAGE_DURATION.observe((build_record.packaged_at - build_record.finished_at).total_seconds())
+        except Exception as e:
+            logger.error(f"Packaging of build {build_id} failed: {e}")
+            with SessionLocal() as session:
+                session.execute(
+                    update(PluginBuild)
+                    .where(PluginBuild.build_id == build_id)
+                    .values(package_status=PackageStatus.FAILED.value, package_error=str(e))
+                )
+                session.commit()
+        finally:
+            builder.build_log.discard()
+
+    def _observe(self, build_record: PluginBuild, result: Optional[Dict[str, Any]] = None):
+        BUILDS_TOTAL.inc(status=build_record.status)
+        if result and result.get("reused_build_id"):
+            BUILDS_REUSED.inc()
+        if build_record.started_at and build_record.finished_at:
+            BUILD_DURATION.observe((build_record.finished_at - build_record.started_at).total_seconds())
+
+
+build_scheduler = None
+
+def get_build_scheduler() -> BuildScheduler:
+    """Get the global build scheduler instance"""
+    global build_scheduler
+    if build_scheduler is None:
+        build_scheduler = BuildScheduler()
+    return build_scheduler
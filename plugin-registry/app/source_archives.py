@@ -0,0 +1,286 @@
+import os
+import io
+import stat
+import queue
+import shutil
+import asyncio
+import hashlib
+import tarfile
+import zipfile
+import tempfile
+import threading
+import uuid
+from pathlib import Path, PurePosixPath
+from typing import Optional, Dict, Any, AsyncIterator
+
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+SOURCE_DIR = Path(os.environ.get("SOURCE_UPLOAD_DIR", "/tmp/plugin_build/sources"))
+MAX_ARCHIVE_BYTES = int(os.environ.get("SOURCE_MAX_ARCHIVE_BYTES", str(256 * 1024 ** 2)))
+MAX_UNPACKED_BYTES = int(os.environ.get("SOURCE_MAX_UNPACKED_BYTES", str(1024 ** 3)))
+MAX_FILES = int(os.environ.get("SOURCE_MAX_FILES", "20000"))
+COPY_CHUNK_SIZE = 1024 * 1024
+ZIP_MAGIC = b"PK\x03\x04"
+
+
+class SourceArchiveError(ValueError):
+    """Raised when an uploaded source archive is malformed or unsafe"""
+
+
+class SourceArchiveTooLarge(SourceArchiveError):
+    """Raised when an upload exceeds the archive, unpacked size or file count limits"""
+
+
+def source_path(plugin_id: str, sha256: str) -> Path:
+    """Directory an uploaded archive was unpacked to"""
+    return SOURCE_DIR / plugin_id / sha256
+
+
+def remove_sources(plugin_id: str):
+    """Delete every uploaded source tree of a plugin"""
+    shutil.rmtree(SOURCE_DIR / plugin_id, ignore_errors=True)
+
+
+class _ChunkReader(io.RawIOBase):
+    """Blocking file object fed with chunks from the event loop
+
+    At most max_chunks chunks are buffered, so a slow unpacker throttles the upload instead
+    of letting it pile up in memory. Once the reader is closed (the unpacker finished or
+    failed) further chunks are dropped.
+    """
+
+    def __init__(self, max_chunks: int = 8):
+        self._queue = queue.Queue(max_chunks)
+        self._buffer = b""
+        self._eof = False
+        self._closed = threading.Event()
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        while not self._buffer and not self._eof:
+            chunk = self._queue.get()
+            if chunk is None:
+                self._eof = True
+            else:
+                self._buffer = chunk
+        size = min(len(b), len(self._buffer))
+        b[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+    def feed(self, chunk: Optional[bytes]):
+        """Queue a chunk (None marks the end); blocks while the buffer is full"""
+        while not self._closed.is_set():
+            try:
+                self._queue.put(chunk, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def finish(self):
+        self._closed.set()
+
+
+class _Unpacker:
+    """Writes archive members under root while enforcing path and size limits"""
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.files = 0
+        self.bytes = 0
+
+    def target(self, name: str) -> Path:
+        path = PurePosixPath(name.replace("\\", "/"))
+        if path.is_absolute() or ".." in path.parts or (path.parts and ":" in path.parts[0]):
+            raise SourceArchiveError(f"Unsafe path in archive: {name}")
+        parts = [part for part in path.parts if part not in ("", ".")]
+        if not parts:
+            return self.root
+        target = self.root
+        for part in parts:
+            # Never write through an extracted symlink; chained links could otherwise escape root
+            if target.is_symlink():
+                raise SourceArchiveError(f"Archive member is inside a symlink: {name}")
+            target = target / part
+        if target.is_symlink():
+            raise SourceArchiveError(f"Archive member replaces a symlink: {name}")
+        return target
+
+    def _count_file(self):
+        self.files += 1
+        if self.files > MAX_FILES:
+            raise SourceArchiveTooLarge(f"Archive has more than {MAX_FILES} entries")
+
+    def directory(self, name: str):
+        self.target(name).mkdir(parents=True, exist_ok=True)
+
+    def file(self, name: str, source, mode: int = 0o644):
+        target = self.target(name)
+        self._count_file()
+        target.parent.mkdir(parents=True, exist_ok=True)
+        with open(target, "wb") as out:
+            while True:
+                chunk = source.read(COPY_CHUNK_SIZE)
+                if not chunk:
+                    break
+                self.bytes += len(chunk)
+                if self.bytes > MAX_UNPACKED_BYTES:
+                    raise SourceArchiveTooLarge(f"Archive unpacks to more than {MAX_UNPACKED_BYTES} bytes")
+                out.write(chunk)
+        os.chmod(target, (mode & 0o755) | 0o600)
+
+    def symlink(self, name: str, link_target: str):
+        target = self.target(name)
+        resolved = os.path.normpath(os.path.join(os.path.dirname(str(target)), link_target))
+        if os.path.isabs(link_target) or not (resolved + os.sep).startswith(str(self.root) + os.sep):
+            raise SourceArchiveError(f"Symlink escapes the archive: {name} -> {link_target}")
+        self._count_file()
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.symlink(link_target, target)
+
+    def hardlink(self, name: str, link_name: str):
+        source = self.target(link_name)
+        if not source.is_file() or source.is_symlink():
+            raise SourceArchiveError(f"Hard link to a missing member: {name} -> {link_name}")
+        self._count_file()
+        target = self.target(name)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.link(source, target)
+
+    def unpack_tar(self, fileobj):
+        try:
+            with tarfile.open(fileobj=fileobj, mode="r|*") as archive:
+                for member in archive:
+                    if member.isdir():
+                        self.directory(member.name)
+                    elif member.isfile():
+                        self.file(member.name, archive.extractfile(member), member.mode)
+                    elif member.issym():
+                        self.symlink(member.name, member.linkname)
+                    elif member.islnk():
+                        self.hardlink(member.name, member.linkname)
+                    else:
+                        raise SourceArchiveError(f"Unsupported member type in archive: {member.name}")
+        except tarfile.TarError as e:
+            raise SourceArchiveError(f"Invalid tar archive: {e}")
+
+    def unpack_zip(self, file_path: Path):
+        try:
+            with zipfile.ZipFile(file_path) as archive:
+                for info in archive.infolist():
+                    mode = info.external_attr >> 16
+                    if info.is_dir():
+                        self.directory(info.filename)
+                    elif stat.S_ISLNK(mode):
+                        self.symlink(info.filename, archive.read(info).decode())
+                    else:
+                        with archive.open(info) as source:
+                            self.file(info.filename, source, mode or 0o644)
+        except (zipfile.BadZipFile, zipfile.LargeZipFile, EOFError) as e:
+            raise SourceArchiveError(f"Invalid zip archive: {e}")
+
+
+def _source_root(staging_dir: Path) -> Path:
+    """Descend into a single top-level directory, as in archives of a repository checkout"""
+    entries = list(staging_dir.iterdir())
+    if len(entries) == 1 and entries[0].is_dir() and not entries[0].is_symlink():
+        return entries[0]
+    return staging_dir
+
+
+async def store_source_archive(plugin_id: str, chunks: AsyncIterator[bytes]) -> Dict[str, Any]:
+    """Unpack a streamed tar (optionally compressed) or zip archive of plugin sources
+
+    Tar streams are unpacked while they arrive, holding only a few chunks in memory; zip
+    archives keep their index at the end, so they are spooled to disk first. The sha256 of
+    the uploaded bytes names the result, source_path(plugin_id, sha256), and re-uploading
+    the same archive reuses it. Raises SourceArchiveError or SourceArchiveTooLarge.
+    """
+    plugin_dir = SOURCE_DIR / plugin_id
+    plugin_dir.mkdir(parents=True, exist_ok=True)
+    staging_dir = plugin_dir / f".staging-{uuid.uuid4().hex[:8]}"
+    staging_dir.mkdir()
+    unpacker = _Unpacker(staging_dir)
+    digest = hashlib.sha256()
+    size = 0
+    archive_format = None
+    reader: Optional[_ChunkReader] = None
+    unpacking: Optional[asyncio.Future] = None
+    spool = None
+
+    try:
+        try:
+            async for chunk in chunks:
+                if not chunk:
+                    continue
+                size += len(chunk)
+                if size > MAX_ARCHIVE_BYTES:
+                    raise SourceArchiveTooLarge(f"Archive is larger than {MAX_ARCHIVE_BYTES} bytes")
+                digest.update(chunk)
+                if archive_format is None:
+                    if chunk.startswith(ZIP_MAGIC):
+                        archive_format = "zip"
+                        spool = tempfile.NamedTemporaryFile(dir=plugin_dir, prefix=".upload-", suffix=".zip")
+                    else:
+                        archive_format = "tar"
+                        reader = _ChunkReader()
+                        unpacking = asyncio.ensure_future(asyncio.to_thread(unpacker.unpack_tar, reader))
+                        unpacking.add_done_callback(lambda _: reader.finish())
+                if spool is not None:
+                    await asyncio.to_thread(spool.write, chunk)
+                else:
+                    if unpacking.done():
+                        if unpacking.exception() is not None:
+                            break
+                        # The tar end marker was reached; keep hashing any trailing padding
+                        continue
+                    await asyncio.to_thread(reader.feed, chunk)
+        finally:
+            if reader is not None:
+                await asyncio.to_thread(reader.feed, None)
+
+        if archive_format is None:
+            raise SourceArchiveError("Empty upload")
+        if spool is not None:
+            spool.flush()
+            await asyncio.to_thread(unpacker.unpack_zip, Path(spool.name))
+        else:
+            await unpacking
+
+        sha256 = digest.hexdigest()
+        destination = source_path(plugin_id, sha256)
+        reused = destination.exists()
+        if not reused:
+            try:
+                os.rename(_source_root(staging_dir), destination)
+            except OSError:
+                # A concurrent upload of the same archive got there first
+                if not destination.exists():
+                    raise
+                reused = True
+        logger.info(
+            f"Stored {archive_format} source archive {sha256[:12]} for plugin {plugin_id}: "
+            f"{size} bytes, {unpacker.files} files, {unpacker.bytes} bytes unpacked"
+            + (" (already stored)" if reused else "")
+        )
+        return {
+            "sha256": sha256,
+            "format": archive_format,
+            "bytes": size,
+            "files": unpacker.files,
+            "unpacked_bytes": unpacker.bytes,
+            "reused": reused,
+        }
+    finally:
+        if reader is not None:
+            reader.finish()
+        if unpacking is not None and not unpacking.done():
+            # The producer failed mid-stream; unblock the unpacker and let it fail on the truncated input
+            await asyncio.gather(unpacking, return_exceptions=True)
+        if spool is not None:
+            spool.close()
+        shutil.rmtree(staging_dir, ignore_errors=True)
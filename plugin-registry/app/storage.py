@@ -0,0 +1,358 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import mimetypes
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from pathlib import Path, PurePosixPath
+from typing import Optional, Dict, Any, List, Tuple, Iterator
+
+from .metrics import registry as metrics_registry
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+UPLOADED_BYTES = metrics_registry.counter(
+    "plugin_upload_bytes_total", "Bytes uploaded to object storage")
+UPLOADED_OBJECTS = metrics_registry.counter(
+    "plugin_upload_objects_total", "Objects uploaded to object storage by outcome")
+
+# Object headers kept by every backend; names follow the S3 ExtraArgs used by the callers
+OBJECT_HEADERS = ("ContentType", "ContentEncoding", "CacheControl")
+
+
+def guess_content_type(file_path: str) -> str:
+    """Determine the MIME type of a file, with fallbacks for bundle formats"""
+    content_type, _ = mimetypes.guess_type(str(file_path))
+    if content_type is None:
+        suffix = Path(file_path).suffix.lower()
+        if suffix in ['.js', '.mjs']:
+            content_type = 'application/javascript'
+        elif suffix == '.css':
+            content_type = 'text/css'
+        else:
+            content_type = 'application/octet-stream'
+    return content_type
+
+
+class ObjectNotFound(LookupError):
+    """Raised when reading an object that does not exist"""
+
+
+class StorageBackend(ABC):
+    """Object storage used for bundles, datasets, blobs and release pointers
+
+    Objects are addressed by slash-separated keys inside one bucket, and s3_path() renders
+    the s3://<bucket>/<key> locators stored on builds whatever the backend. Implementations:
+    MinioClient (S3 API, the default) and LocalStorage (a directory on this host), chosen
+    with STORAGE_BACKEND.
+    """
+
+    bucket_name: str
+    upload_workers: int
+
+    def s3_path(self, object_name: str) -> str:
+        return f"s3://{self.bucket_name}/{object_name}"
+
+    @abstractmethod
+    def put_object(self, object_name: str, data: bytes, content_type: str = 'application/octet-stream', **extra_args) -> str:
+        """Store an in-memory object; extra_args may set CacheControl or ContentEncoding"""
+
+    @abstractmethod
+    def get_object_bytes(self, object_name: str) -> bytes:
+        """Read a whole object into memory; raises ObjectNotFound"""
+
+    @abstractmethod
+    def iter_object(self, object_name: str, start: int = 0, end: Optional[int] = None,
+                    chunk_size: int = 1024 * 1024) -> Iterator[bytes]:
+        """Stream an object, or its bytes start..end (inclusive), in chunks; raises ObjectNotFound"""
+
+    @abstractmethod
+    def list_objects(self, prefix: str = "") -> list:
+        """Keys of the objects under prefix"""
+
+    @abstractmethod
+    def list_object_info(self, prefix: str = "") -> List[Dict[str, Any]]:
+        """Objects under prefix with their size and (timezone-aware) last-modified time"""
+
+    @abstractmethod
+    def delete_object(self, object_name: str):
+        """Delete one object"""
+
+    @abstractmethod
+    def delete_objects(self, object_names: List[str]) -> int:
+        """Delete objects; return how many were deleted"""
+
+    @abstractmethod
+    def object_exists(self, object_name: str) -> bool:
+        """Check if an object exists"""
+
+    @abstractmethod
+    def get_public_url(self, object_name: str) -> str:
+        """URL browsers can load the object from (no expiration)"""
+
+    @abstractmethod
+    def _store_file(self, file_path: Path, object_name: str, extra_args: Dict[str, str]) -> int:
+        """Store one local file; return the bytes written"""
+
+    def local_path(self, object_name: str) -> Optional[Path]:
+        """Path of the object on this host, if the backend keeps it as a plain file"""
+        return None
+
+    def upload_files(self, jobs: List[Tuple[Path, str, Dict[str, str]]]) -> Dict[str, Any]:
+        """Store (local path, object name, extra args) jobs concurrently and report throughput and failures"""
+        start = time.perf_counter()
+        uploaded_bytes = 0
+        uploaded_objects = 0
+        failed = []
+        with ThreadPoolExecutor(max_workers=self.upload_workers, thread_name_prefix="storage-upload") as executor:
+            futures = {executor.submit(self._store_file, *job): job[1] for job in jobs}
+            for future in as_completed(futures):
+                object_name = futures[future]
+                try:
+                    size = future.result()
+                    uploaded_bytes += size
+                    uploaded_objects += 1
+                    UPLOADED_BYTES.inc(size)
+                    UPLOADED_OBJECTS.inc(outcome="uploaded")
+                    logger.debug(f"Uploaded: {object_name}")
+                except Exception as e:
+                    failed.append(object_name)
+                    UPLOADED_OBJECTS.inc(outcome="failed")
+                    logger.error(f"Giving up on {object_name}: {e}")
+
+        seconds = time.perf_counter() - start
+        return {
+            "objects": uploaded_objects,
+            "bytes": uploaded_bytes,
+            "seconds": round(seconds, 3),
+            "bytes_per_second": round(uploaded_bytes / seconds) if seconds > 0 else 0,
+            "failed": failed,
+        }
+
+    def upload_directory_report(self, local_path: str, remote_prefix: str) -> Dict[str, Any]:
+        """Upload a directory concurrently and report throughput and failures"""
+        local_path = Path(local_path)
+        if not local_path.exists():
+            raise FileNotFoundError(f"Local path does not exist: {local_path}")
+
+        jobs = []
+        for root, dirs, files in os.walk(local_path):
+            for file in files:
+                file_path = Path(root) / file
+                relative_path = file_path.relative_to(local_path)
+                object_name = f"{remote_prefix}/{relative_path.as_posix()}"
+                jobs.append((file_path, object_name, {'ContentType': guess_content_type(file_path)}))
+
+        report = self.upload_files(jobs)
+        report["s3_path"] = self.s3_path(remote_prefix)
+        logger.info(
+            f"Uploaded {report['objects']} objects ({report['bytes']} bytes) to {report['s3_path']} "
+            f"in {report['seconds']:.2f}s ({report['bytes_per_second']} B/s), {len(report['failed'])} failed"
+        )
+        return report
+
+    def upload_directory(self, local_path: str, remote_prefix: str) -> str:
+        """Upload a directory"""
+        try:
+            return self.upload_directory_report(local_path, remote_prefix)["s3_path"]
+        except Exception as e:
+            logger.error(f"Failed to upload directory {local_path}: {e}")
+            raise
+
+    def upload_file(self, local_path: str, remote_name: str) -> str:
+        """Store a single file"""
+        if not os.path.exists(local_path):
+            raise FileNotFoundError(f"Local file does not exist: {local_path}")
+        size = self._store_file(Path(local_path), remote_name, {'ContentType': guess_content_type(local_path)})
+        UPLOADED_BYTES.inc(size)
+        UPLOADED_OBJECTS.inc(outcome="uploaded")
+        s3_path = self.s3_path(remote_name)
+        logger.info(f"Uploaded file: {s3_path}")
+        return s3_path
+
+
+class LocalStorage(StorageBackend):
+    """Object storage in a local directory, for single-node deployments, tests and benchmarks
+
+    Each object is a plain file at <root>/<key>, so reads need no network round trip and
+    the artifact routes can send it with sendfile. Writes go to a .staging-* file and are
+    renamed into place, so readers never see a partial object and concurrent writers of the
+    same key (identical content-addressed blobs) simply replace each other. Headers such as
+    ContentEncoding are kept in a sidecar under <root>/.meta. Public URLs point at the
+    registry's /storage route (STORAGE_PUBLIC_URL).
+    """
+
+    META_DIR = ".meta"
+
+    def __init__(self, root: str = None, public_url: str = None, bucket_name: str = None):
+        if root is None:
+            root = os.environ.get("STORAGE_LOCAL_DIR", "/tmp/plugin_build/storage")
+        if public_url is None:
+            public_url = os.environ.get("STORAGE_PUBLIC_URL", f"http://{os.getenv('HOST', 'localhost')}:8000")
+        self.root = Path(root).resolve()
+        self.public_url = public_url.rstrip("/")
+        self.bucket_name = bucket_name or os.getenv("MINIO_BUCKET_NAME", "plugin-builds")
+        self.upload_workers = int(os.getenv("STORAGE_UPLOAD_WORKERS", "8"))
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, object_name: str) -> Path:
+        parts = PurePosixPath(object_name).parts
+        if not parts or parts[0].startswith(".") or ".." in parts or PurePosixPath(object_name).is_absolute():
+            raise ValueError(f"Invalid object name: {object_name}")
+        return self.root.joinpath(*parts)
+
+    def _meta_path(self, object_name: str) -> Path:
+        return self.root / self.META_DIR / f"{object_name}.json"
+
+    def _write(self, object_name: str, write, extra_args: Dict[str, str]):
+        """Write an object through a staging file and rename it into place"""
+        path = self._path(object_name)
+        staging = self.root / f".staging-{uuid.uuid4().hex}"
+        try:
+            write(staging)
+            headers = {key: value for key, value in extra_args.items() if key in OBJECT_HEADERS and value}
+            meta_path = self._meta_path(object_name)
+            if headers:
+                meta_path.parent.mkdir(parents=True, exist_ok=True)
+                meta_staging = self.root / f".staging-{uuid.uuid4().hex}"
+                meta_staging.write_text(json.dumps(headers))
+                os.replace(meta_staging, meta_path)
+            else:
+                meta_path.unlink(missing_ok=True)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(staging, path)
+        except BaseException:
+            staging.unlink(missing_ok=True)
+            raise
+
+    def headers(self, object_name: str) -> Dict[str, str]:
+        """Stored headers of an object, with ContentType guessed from the key if none was given"""
+        try:
+            headers = json.loads(self._meta_path(object_name).read_text())
+        except (OSError, ValueError):
+            headers = {}
+        if "ContentType" not in headers:
+            headers["ContentType"] = guess_content_type(object_name)
+        return headers
+
+    def put_object(self, object_name: str, data: bytes, content_type: str = 'application/octet-stream', **extra_args) -> str:
+        self._write(object_name, lambda staging: staging.write_bytes(data), {"ContentType": content_type, **extra_args})
+        UPLOADED_BYTES.inc(len(data))
+        UPLOADED_OBJECTS.inc(outcome="uploaded")
+        return self.s3_path(object_name)
+
+    def _store_file(self, file_path: Path, object_name: str, extra_args: Dict[str, str]) -> int:
+        # copyfile uses sendfile/copy_file_range on Linux, so the data never passes through Python
+        self._write(object_name, lambda staging: shutil.copyfile(file_path, staging), extra_args)
+        return file_path.stat().st_size
+
+    def download_file(self, remote_name: str, local_path: str):
+        """Copy an object to a local file"""
+        path = self.local_path(remote_name)
+        if path is None:
+            raise ObjectNotFound(remote_name)
+        shutil.copyfile(path, local_path)
+
+    def get_object_bytes(self, object_name: str) -> bytes:
+        try:
+            return self._path(object_name).read_bytes()
+        except (FileNotFoundError, IsADirectoryError):
+            raise ObjectNotFound(object_name)
+
+    def iter_object(self, object_name: str, start: int = 0, end: Optional[int] = None,
+                    chunk_size: int = 1024 * 1024) -> Iterator[bytes]:
+        try:
+            f = open(self._path(object_name), "rb")
+        except (FileNotFoundError, IsADirectoryError):
+            raise ObjectNotFound(object_name)
+        with f:
+            f.seek(start)
+            remaining = None if end is None else end - start + 1
+            while remaining is None or remaining > 0:
+                chunk = f.read(chunk_size if remaining is None else min(chunk_size, remaining))
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+    def _walk(self, prefix: str) -> Iterator[Tuple[str, os.stat_result]]:
+        # Start from the deepest directory the prefix names instead of walking the whole root
+        base = prefix.rsplit("/", 1)[0] if "/" in prefix else ""
+        start = self.root.joinpath(*PurePosixPath(base).parts) if base else self.root
+        for directory, dirs, files in os.walk(start):
+            if Path(directory) == self.root:
+                dirs[:] = [name for name in dirs if not name.startswith(".")]
+                files = [name for name in files if not name.startswith(".")]
+            for name in files:
+                path = Path(directory) / name
+                key = path.relative_to(self.root).as_posix()
+                if key.startswith(prefix):
+                    try:
+                        yield key, path.stat()
+                    except FileNotFoundError:
+                        continue
+
+    def list_objects(self, prefix: str = "") -> list:
+        return sorted(key for key, _ in self._walk(prefix))
+
+    def list_object_info(self, prefix: str = "") -> List[Dict[str, Any]]:
+        return [
+            {
+                "key": key,
+                "size": stat.st_size,
+                "last_modified": datetime.fromtimestamp(stat.st_mtime, timezone.utc),
+            }
+            for key, stat in sorted(self._walk(prefix))
+        ]
+
+    def delete_object(self, object_name: str):
+        self._path(object_name).unlink(missing_ok=True)
+        self._meta_path(object_name).unlink(missing_ok=True)
+        logger.info(f"Deleted object: {object_name}")
+
+    def delete_objects(self, object_names: List[str]) -> int:
+        deleted = 0
+        for object_name in object_names:
+            try:
+                self._path(object_name).unlink()
+                deleted += 1
+            except FileNotFoundError:
+                pass
+            self._meta_path(object_name).unlink(missing_ok=True)
+        return deleted
+
+    def object_exists(self, object_name: str) -> bool:
+        return self._path(object_name).is_file()
+
+    def local_path(self, object_name: str) -> Optional[Path]:
+        try:
+            path = self._path(object_name)
+        except ValueError:
+            return None
+        return path if path.is_file() else None
+
+    def get_public_url(self, object_name: str) -> str:
+        return f"{self.public_url}/storage/{object_name}"
+
+
+storage = None
+
+def get_storage() -> StorageBackend:
+    """Get the configured storage backend (STORAGE_BACKEND=minio or local)"""
+    global storage
+    if storage is None:
+        backend = os.environ.get("STORAGE_BACKEND", "minio").lower()
+        if backend == "local":
+            storage = LocalStorage()
+        elif backend == "minio":
+            from .minio_client import get_minio_client
+            storage = get_minio_client()
+        else:
+            raise ValueError(f"Unknown STORAGE_BACKEND {backend!r}, expected 'minio' or 'local'")
+        logger.info(f"Using {type(storage).__name__} storage backend")
+    return storage
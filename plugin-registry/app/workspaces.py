@@ -0,0 +1,70 @@
+import os
+import fcntl
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict
+
+# Scratch directories (build clones and snapshots, artifact variant dirs) live in the temp dir
+WORKSPACE_ROOT = Path(tempfile.gettempdir())
+WORKSPACE_LOCK_DIR = Path(os.environ.get("WORKSPACE_LOCK_DIR", str(WORKSPACE_ROOT / "plugin_build" / "workspaces")))
+
+# Claimed workspaces of this process -> descriptor of the lock file held for each
+_claimed: Dict[str, int] = {}
+_claimed_lock = threading.Lock()
+
+
+def lock_path(path: Path) -> Path:
+    return WORKSPACE_LOCK_DIR / f"{Path(path).name}.lock"
+
+
+def claim_workspace(path: Path):
+    """Mark a scratch directory as in use until release_workspace()
+
+    Besides the in-process set, the claim holds an exclusive flock on a lock file named
+    after the directory, so retention in another registry process can tell a running
+    workspace from one left behind by a crashed process (whose locks the kernel released).
+    """
+    WORKSPACE_LOCK_DIR.mkdir(parents=True, exist_ok=True)
+    fd = os.open(lock_path(path), os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+    except OSError:
+        os.close(fd)
+        raise
+    with _claimed_lock:
+        previous = _claimed.pop(str(path), None)
+        _claimed[str(path)] = fd
+    if previous is not None:
+        os.close(previous)
+
+
+def release_workspace(path: Path):
+    with _claimed_lock:
+        fd = _claimed.pop(str(path), None)
+    if fd is not None:
+        lock_path(path).unlink(missing_ok=True)
+        os.close(fd)
+
+
+def active_workspaces() -> set:
+    """Workspaces claimed by this process"""
+    with _claimed_lock:
+        return set(_claimed)
+
+
+def workspace_in_use(path: Path) -> bool:
+    """Whether this or any other registry process holds a claim on path"""
+    if str(path) in active_workspaces():
+        return True
+    try:
+        fd = os.open(lock_path(path), os.O_RDWR)
+    except FileNotFoundError:
+        return False
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return True
+    finally:
+        os.close(fd)
+    return False
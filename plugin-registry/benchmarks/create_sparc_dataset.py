@@ -0,0 +1,80 @@
+"""Micro-benchmark of PluginBuilder.create_sparc_dataset with and without the skeleton cache
+
+Run from plugin-registry/:
+
+    uv run python -m benchmarks.create_sparc_dataset [--runs 10] [--files 200]
+
+"before" builds every dataset through sparc_me (create_empty_dataset + save), "after" links
+the cached 2.0.0 skeleton and only writes dataset_description.xlsx. The first "after" run,
+which generates the skeleton, is reported separately.
+"""
+import argparse
+import os
+import shutil
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from app.build import PluginBuilder
+from app.dataset_skeleton import DatasetSkeletonCache
+import app.dataset_skeleton as dataset_skeleton
+
+
+def make_project(root: Path, files: int) -> Path:
+    project_dir = root / "project"
+    (project_dir / "src" / "components").mkdir(parents=True)
+    (project_dir / "dist").mkdir()
+    (project_dir / "package.json").write_text('{"name": "bench-plugin"}')
+    for i in range(files):
+        (project_dir / "src" / "components" / f"Component{i}.vue").write_text("<template><div/></template>\n" * 20)
+    (project_dir / "dist" / "my-app.umd.js").write_text("console.log('bench');\n" * 5000)
+    return project_dir
+
+
+def run(builder: PluginBuilder, project_dir: Path, runs: int) -> list:
+    timings = []
+    for i in range(runs):
+        start = time.perf_counter()
+        dataset_dir = builder.create_sparc_dataset(project_dir, project_dir / "dist", f"bench_{i}")
+        timings.append(time.perf_counter() - start)
+        shutil.rmtree(dataset_dir)
+    return timings
+
+
+def report(label: str, timings: list):
+    print(f"{label:<22} runs={len(timings):<3} mean={statistics.mean(timings) * 1000:8.1f} ms  "
+          f"median={statistics.median(timings) * 1000:8.1f} ms  min={min(timings) * 1000:8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--files", type=int, default=200, help="number of source files in the fake project")
+    args = parser.parse_args()
+
+    root = Path(tempfile.mkdtemp(prefix="bench_sparc_"))
+    try:
+        project_dir = make_project(root, args.files)
+        builder = PluginBuilder(dataset_dir=str(root / "datasets"))
+
+        cache = DatasetSkeletonCache(skeleton_dir=str(root / "skeletons"))
+        dataset_skeleton.dataset_skeleton_cache = cache
+
+        cache.enabled = False
+        before = run(builder, project_dir, args.runs)
+
+        cache.enabled = True
+        first = run(builder, project_dir, 1)
+        after = run(builder, project_dir, args.runs)
+
+        report("before (sparc_me)", before)
+        report("after, cold skeleton", first)
+        report("after (skeleton)", after)
+        print(f"speedup (median): {statistics.median(before) / statistics.median(after):.1f}x")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+#!/usr/bin/env node
+// Long-lived Vite build server for the plugin registry.
+//
+// The registry sends newline-delimited JSON requests over a unix socket:
+//   {"op": "ping"}
+//   {"op": "stats"}
+//   {"op": "build", "root": "/tmp/plugin_build_x", "cacheKey": "<plugin id>",
+//    "modulesDir": "<npm cache entry>/node_modules", "mode": "production", "wait": false}
+// A build streams {"type": "log", "level", "line"} messages and ends with one
+// {"type": "result", "success", "durationMs", "warm", "error"} message.
+//
+// What a repeat build saves is Node start-up and the import of Vite (with the Rollup and
+// esbuild it loads), which happen once per Vite installation instead of once per build:
+// Vite is resolved from the shared npm cache entry when the registry passes one, whose path
+// is stable across build workspaces, so later builds reuse the loaded module. Every build
+// still transforms and bundles all of its modules from scratch; Vite only reuses Rollup's
+// module cache in watch mode, and module ids are absolute paths that change with each
+// workspace. Each plugin (cacheKey) gets its own Vite cacheDir, which Vite uses for its
+// dependency optimizer rather than for build transforms. Builds run one at a time because
+// Vite configs may resolve paths against process.cwd(); a request with "wait": false is
+// answered with {"type": "busy"} instead of queueing while another build is running or queued.
+//
+// Loaded Vite installations are kept in a small LRU (BUILD_DAEMON_MAX_VITE); entries whose
+// package directory has been deleted are dropped. Node cannot unload an imported module, so
+// after BUILD_DAEMON_MAX_IMPORTS imports the daemon exits once idle and the registry starts
+// a fresh one for the next build.
+
+import fs from 'node:fs'
+import net from 'node:net'
+import path from 'node:path'
+import { pathToFileURL } from 'node:url'
+import { performance } from 'node:perf_hooks'
+
+const SOCKET_PATH = process.env.BUILD_DAEMON_SOCKET || '/tmp/plugin_build/vite-daemon.sock'
+const CACHE_ROOT = process.env.BUILD_DAEMON_CACHE_DIR || '/tmp/plugin_build/vite-cache'
+
+const MAX_VITE = Math.max(1, Number(process.env.BUILD_DAEMON_MAX_VITE) || 4)
+const MAX_IMPORTS = Math.max(MAX_VITE, Number(process.env.BUILD_DAEMON_MAX_IMPORTS) || 16)
+
+const viteModules = new Map() // real path of a vite package -> imported module, least recently used first
+const stats = { startedAt: new Date().toISOString(), builds: 0, failures: 0, warmBuilds: 0, busyRejections: 0, imports: 0 }
+let pending = 0 // builds queued or running; counted when queued so "wait": false sees them
+let queue = Promise.resolve()
+
+function send (socket, message) {
+  if (!socket.destroyed) socket.write(JSON.stringify(message) + '\n')
+}
+
+function resolveVitePackage (root, modulesDir) {
+  for (const base of [modulesDir, path.join(root, 'node_modules')]) {
+    if (!base) continue
+    const manifest = path.join(base, 'vite', 'package.json')
+    if (fs.existsSync(manifest)) return fs.realpathSync(path.dirname(manifest))
+  }
+  throw new Error(`vite is not installed in ${root}`)
+}
+
+function esmEntry (packageDir) {
+  const manifest = JSON.parse(fs.readFileSync(path.join(packageDir, 'package.json'), 'utf8'))
+  let entry = manifest.exports && (manifest.exports['.'] ?? manifest.exports)
+  if (entry && typeof entry === 'object') entry = entry.import ?? entry.default
+  if (entry && typeof entry === 'object') entry = entry.default
+  return path.join(packageDir, entry || manifest.module || manifest.main || 'index.js')
+}
+
+async function loadVite (packageDir) {
+  for (const dir of viteModules.keys()) {
+    if (!fs.existsSync(dir)) viteModules.delete(dir)
+  }
+  const loaded = viteModules.get(packageDir)
+  if (loaded) {
+    viteModules.delete(packageDir)
+    viteModules.set(packageDir, loaded)
+    return { vite: loaded, warm: true }
+  }
+  const vite = await import(pathToFileURL(esmEntry(packageDir)).href)
+  stats.imports++
+  viteModules.set(packageDir, vite)
+  while (viteModules.size > MAX_VITE) viteModules.delete(viteModules.keys().next().value)
+  return { vite, warm: false }
+}
+
+function jobLogger (socket) {
+  const warned = new Set()
+  const logged = new WeakSet()
+  const emit = (level, message) => {
+    for (const line of String(message).split('\n')) send(socket, { type: 'log', level, line })
+  }
+  const logger = {
+    hasWarned: false,
+    info (message) { emit('info', message) },
+    warn (message) { logger.hasWarned = true; emit('warn', message) },
+    warnOnce (message) {
+      if (warned.has(message)) return
+      warned.add(message)
+      logger.warn(message)
+    },
+    error (message, options) {
+      logger.hasWarned = true
+      if (options && options.error) logged.add(options.error)
+      emit('error', message)
+    },
+    clearScreen () {},
+    hasErrorLogged (error) { return logged.has(error) }
+  }
+  return logger
+}
+
+async function build (request, socket) {
+  const root = path.resolve(request.root)
+  const cacheKey = String(request.cacheKey || 'default').replace(/[^A-Za-z0-9_.-]/g, '_')
+  const started = performance.now()
+  const previousCwd = process.cwd()
+  try {
+    const { vite, warm } = await loadVite(resolveVitePackage(root, request.modulesDir))
+    process.chdir(root)
+    await vite.build({
+      root,
+      mode: request.mode || 'production',
+      cacheDir: path.join(CACHE_ROOT, cacheKey),
+      customLogger: jobLogger(socket),
+      clearScreen: false
+    })
+    stats.builds++
+    if (warm) stats.warmBuilds++
+    send(socket, { type: 'result', success: true, warm, durationMs: Math.round(performance.now() - started) })
+  } catch (error) {
+    stats.failures++
+    send(socket, {
+      type: 'result',
+      success: false,
+      error: (error && (error.stack || error.message)) || String(error),
+      durationMs: Math.round(performance.now() - started)
+    })
+  } finally {
+    process.chdir(previousCwd)
+    pending--
+    if (pending === 0 && stats.imports >= MAX_IMPORTS) {
+      console.log(`Loaded ${stats.imports} Vite installations, exiting to release them`)
+      server.close()
+      fs.rmSync(SOCKET_PATH, { force: true })
+      if (socket.destroyed) process.exit(0)
+      socket.end(() => process.exit(0))
+    }
+  }
+}
+
+function handle (line, socket) {
+  let request
+  try {
+    request = JSON.parse(line)
+  } catch (error) {
+    send(socket, { type: 'result', success: false, error: `Invalid request: ${error.message}` })
+    return
+  }
+  switch (request.op) {
+    case 'ping':
+      send(socket, { type: 'pong', pid: process.pid, node: process.version })
+      break
+    case 'stats':
+      send(socket, { type: 'stats', ...stats, busy: pending > 0, pending, vite: [...viteModules.keys()] })
+      break
+    case 'build':
+      if (pending > 0 && request.wait === false) {
+        stats.busyRejections++
+        send(socket, { type: 'busy' })
+        break
+      }
+      pending++
+      queue = queue.then(() => build(request, socket))
+      break
+    default:
+      send(socket, { type: 'result', success: false, error: `Unknown op: ${request.op}` })
+  }
+}
+
+const server = net.createServer((socket) => {
+  let buffer = ''
+  socket.setEncoding('utf8')
+  socket.on('error', () => {})
+  socket.on('data', (chunk) => {
+    buffer += chunk
+    let newline
+    while ((newline = buffer.indexOf('\n')) >= 0) {
+      const line = buffer.slice(0, newline)
+      buffer = buffer.slice(newline + 1)
+      if (line.trim()) handle(line, socket)
+    }
+  })
+})
+
+function shutdown () {
+  server.close()
+  fs.rmSync(SOCKET_PATH, { force: true })
+  process.exit(0)
+}
+
+fs.mkdirSync(path.dirname(SOCKET_PATH), { recursive: true })
+fs.mkdirSync(CACHE_ROOT, { recursive: true })
+fs.rmSync(SOCKET_PATH, { force: true })
+server.listen(SOCKET_PATH, () => {
+  fs.chmodSync(SOCKET_PATH, 0o600)
+  console.log(`Vite build daemon ${process.pid} listening on ${SOCKET_PATH}`)
+})
+process.on('SIGTERM', shutdown)
+process.on('SIGINT', shutdown)
@@ -0,0 +1,52 @@
+"""Schema operations shared by the revisions
+
+Databases created before the registry used migrations were brought up to date column by
+column at start-up, so they may already hold part of what a revision adds. init_db() stamps
+them at the baseline revision and upgrades them with these helpers, which skip whatever is
+already there.
+"""
+import sqlalchemy as sa
+from alembic import op
+
+
+def _inspector():
+    return sa.inspect(op.get_bind())
+
+
+def has_table(table: str) -> bool:
+    return _inspector().has_table(table)
+
+
+def add_columns(table: str, *columns: sa.Column):
+    """Add the columns the table does not have yet"""
+    existing = {column["name"] for column in _inspector().get_columns(table)}
+    missing = [column for column in columns if column.name not in existing]
+    if missing:
+        with op.batch_alter_table(table) as batch:
+            for column in missing:
+                batch.add_column(column)
+
+
+def create_index(name: str, table: str, columns: list, unique: bool = False):
+    """Create an index unless one of that name exists"""
+    if name not in {index["name"] for index in _inspector().get_indexes(table)}:
+        op.create_index(name, table, columns, unique=unique)
+
+
+def create_foreign_key(name: str, table: str, referent: str, columns: list, remote_columns: list):
+    """Add a foreign key unless the columns already reference another table"""
+    constrained = [key["constrained_columns"] for key in _inspector().get_foreign_keys(table)]
+    if columns not in constrained:
+        with op.batch_alter_table(table) as batch:
+            batch.create_foreign_key(name, referent, columns, remote_columns)
+
+
+def drop_columns(table: str, *columns: str, indexes: tuple = ()):
+    """Drop columns together with the indexes on them"""
+    existing = {index["name"] for index in _inspector().get_indexes(table)}
+    with op.batch_alter_table(table) as batch:
+        for index in indexes:
+            if index in existing:
+                batch.drop_index(index)
+        for column in columns:
+            batch.drop_column(column)
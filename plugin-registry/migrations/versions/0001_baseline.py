@@ -0,0 +1,54 @@
+"""Plugins and their builds, as created before migrations were introduced
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "plugins",
+        sa.Column("id", sa.String(), nullable=False),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("version", sa.String(), nullable=False),
+        sa.Column("description", sa.Text(), nullable=True),
+        sa.Column("author", sa.String(), nullable=True),
+        sa.Column("repository_url", sa.String(), nullable=True),
+        sa.Column("plugin_metadata", sa.JSON(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_plugins_id", "plugins", ["id"])
+    op.create_index("ix_plugins_name", "plugins", ["name"], unique=True)
+
+    op.create_table(
+        "plugin_builds",
+        sa.Column("id", sa.String(), nullable=False),
+        sa.Column("plugin_id", sa.String(), nullable=False),
+        sa.Column("build_id", sa.String(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("build_logs", sa.Text(), nullable=True),
+        sa.Column("error_message", sa.Text(), nullable=True),
+        sa.Column("s3_path", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["plugin_id"], ["plugins.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_plugin_builds_id", "plugin_builds", ["id"])
+    op.create_index("ix_plugin_builds_build_id", "plugin_builds", ["build_id"], unique=True)
+
+
+def downgrade():
+    op.drop_table("plugin_builds")
+    op.drop_table("plugins")
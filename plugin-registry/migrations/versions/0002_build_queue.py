@@ -0,0 +1,27 @@
+"""Queue timestamps of builds run by the worker pool
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 00:00:00
+"""
+import sqlalchemy as sa
+
+from migrations.helpers import add_columns, drop_columns
+
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    add_columns(
+        "plugin_builds",
+        sa.Column("started_at", sa.DateTime(), nullable=True),
+        sa.Column("finished_at", sa.DateTime(), nullable=True),
+    )
+
+
+def downgrade():
+    drop_columns("plugin_builds", "started_at", "finished_at")
@@ -0,0 +1,32 @@
+"""Build fingerprints and the component entry a reused build republishes
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 00:00:00
+"""
+import sqlalchemy as sa
+
+from migrations.helpers import add_columns, create_index, drop_columns
+
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    add_columns(
+        "plugin_builds",
+        sa.Column("fingerprint", sa.String(), nullable=True),
+        sa.Column("component_entry", sa.JSON(), nullable=True),
+        sa.Column("reused_build_id", sa.String(), nullable=True),
+    )
+    create_index("ix_plugin_builds_fingerprint", "plugin_builds", ["fingerprint"])
+
+
+def downgrade():
+    drop_columns(
+        "plugin_builds", "fingerprint", "component_entry", "reused_build_id",
+        indexes=("ix_plugin_builds_fingerprint",),
+    )
@@ -0,0 +1,23 @@
+"""Per-step timings of a build
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 00:00:00
+"""
+import sqlalchemy as sa
+
+from migrations.helpers import add_columns, drop_columns
+
+
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    add_columns("plugin_builds", sa.Column("step_metrics", sa.JSON(), nullable=True))
+
+
+def downgrade():
+    drop_columns("plugin_builds", "step_metrics")
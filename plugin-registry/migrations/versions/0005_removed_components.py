@@ -0,0 +1,32 @@
+"""Tombstones of deleted plugins for /components?since=
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.helpers import has_table, create_index
+
+
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if not has_table("removed_components"):
+        op.create_table(
+            "removed_components",
+            sa.Column("plugin_id", sa.String(), nullable=False),
+            sa.Column("name", sa.String(), nullable=True),
+            sa.Column("removed_at", sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint("plugin_id"),
+        )
+    create_index("ix_removed_components_removed_at", "removed_components", ["removed_at"])
+
+
+def downgrade():
+    op.drop_table("removed_components")
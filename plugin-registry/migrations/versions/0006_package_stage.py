@@ -0,0 +1,28 @@
+"""State of the deferred package stage of a build
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 00:00:00
+"""
+import sqlalchemy as sa
+
+from migrations.helpers import add_columns, drop_columns
+
+
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    add_columns(
+        "plugin_builds",
+        sa.Column("package_status", sa.String(), nullable=True),
+        sa.Column("package_error", sa.Text(), nullable=True),
+        sa.Column("packaged_at", sa.DateTime(), nullable=True),
+    )
+
+
+def downgrade():
+    drop_columns("plugin_builds", "package_status", "package_error", "packaged_at")
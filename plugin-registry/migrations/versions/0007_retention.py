@@ -0,0 +1,23 @@
+"""When retention removed the artifacts of a build
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 00:00:00
+"""
+import sqlalchemy as sa
+
+from migrations.helpers import add_columns, drop_columns
+
+
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    add_columns("plugin_builds", sa.Column("pruned_at", sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    drop_columns("plugin_builds", "pruned_at")
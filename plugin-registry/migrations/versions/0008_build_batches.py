@@ -0,0 +1,36 @@
+"""Batches of builds queued together by POST /builds/batch
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.helpers import has_table, add_columns, create_index, create_foreign_key, drop_columns
+
+
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if not has_table("build_batches"):
+        op.create_table(
+            "build_batches",
+            sa.Column("id", sa.String(), nullable=False),
+            sa.Column("selection", sa.JSON(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint("id"),
+        )
+    create_index("ix_build_batches_id", "build_batches", ["id"])
+    add_columns("plugin_builds", sa.Column("batch_id", sa.String(), nullable=True))
+    create_foreign_key("fk_plugin_builds_batch_id", "plugin_builds", "build_batches", ["batch_id"], ["id"])
+    create_index("ix_plugin_builds_batch_id", "plugin_builds", ["batch_id"])
+
+
+def downgrade():
+    drop_columns("plugin_builds", "batch_id", indexes=("ix_plugin_builds_batch_id",))
+    op.drop_table("build_batches")
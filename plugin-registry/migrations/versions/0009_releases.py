@@ -0,0 +1,27 @@
+"""The build a plugin currently serves, for instant rollback
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18 00:00:00
+"""
+import sqlalchemy as sa
+
+from migrations.helpers import add_columns, drop_columns
+
+
+revision = '0009'
+down_revision = '0008'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    add_columns(
+        "plugins",
+        sa.Column("current_build_id", sa.String(), nullable=True),
+        sa.Column("activated_at", sa.DateTime(), nullable=True),
+    )
+
+
+def downgrade():
+    drop_columns("plugins", "current_build_id", "activated_at")
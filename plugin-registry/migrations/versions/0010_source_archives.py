@@ -0,0 +1,23 @@
+"""Uploaded source archive a build was made from
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-18 00:00:00
+"""
+import sqlalchemy as sa
+
+from migrations.helpers import add_columns, drop_columns
+
+
+revision = '0010'
+down_revision = '0009'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    add_columns("plugin_builds", sa.Column("source_archive", sa.String(), nullable=True))
+
+
+def downgrade():
+    drop_columns("plugin_builds", "source_archive")
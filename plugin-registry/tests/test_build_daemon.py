@@ -0,0 +1,40 @@
+import json
+
+import pytest
+
+from app.build_daemon import BuildDaemon
+
+
+@pytest.fixture
+def daemon(tmp_path):
+    return BuildDaemon(str(tmp_path / "daemon.sock"), enabled=False)
+
+
+def project(tmp_path, scripts: dict):
+    (tmp_path / "package.json").write_text(json.dumps({"scripts": scripts}))
+    return tmp_path
+
+
+def test_plan_accepts_plain_vite_build(tmp_path, daemon):
+    assert daemon.plan(tmp_path, "vite build") == []
+    assert daemon.plan(project(tmp_path, {"build": "vite build"}), "npm run build") == []
+
+
+def test_plan_returns_steps_before_vite_build(tmp_path, daemon):
+    root = project(tmp_path, {"build": "vue-tsc -b && vite build"})
+    assert daemon.plan(root, "npm run build") == [["vue-tsc", "-b"]]
+
+
+@pytest.mark.parametrize("scripts", [
+    {"build": "vite build && cp dist/a.js dist/b.js"},
+    {"build": "rm -rf dist; vite build"},
+    {"build": "NODE_ENV=production $(which vite) build"},
+    {"build": "vite build", "prebuild": "node gen.js"},
+    {"build": "webpack"},
+])
+def test_plan_rejects_scripts_the_daemon_cannot_run(tmp_path, daemon, scripts):
+    assert daemon.plan(project(tmp_path, scripts), "npm run build") is None
+
+
+def test_plan_rejects_custom_build_commands(tmp_path, daemon):
+    assert daemon.plan(project(tmp_path, {"build": "vite build"}), "yarn build") is None
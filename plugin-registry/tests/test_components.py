@@ -0,0 +1,39 @@
+import json
+from datetime import datetime, timedelta
+
+from app.components import ComponentIndex
+
+
+def loaded_index(components: dict, removed: dict = None, since_window: float = 30) -> ComponentIndex:
+    index = ComponentIndex(ttl=3600, since_window=since_window)
+    index.refresh = lambda: None
+    index.components = components
+    index.removed = removed or {}
+    index.last_modified = max(changed_at for changed_at, _ in components.values())
+    return index
+
+
+def test_since_repeats_changes_inside_the_window():
+    cursor = datetime(2026, 1, 1, 12, 0, 0)
+    index = loaded_index({
+        # Stamped before a later build, but committed after the poller saw the cursor
+        "late": (cursor - timedelta(seconds=5), {"id": "late"}),
+        "seen": (cursor, {"id": "seen"}),
+        "old": (cursor - timedelta(minutes=5), {"id": "old"}),
+    }, removed={"gone": (cursor - timedelta(seconds=1), "gone")})
+
+    body, _ = index.manifest(since=cursor)
+    payload = json.loads(body)
+    assert [entry["id"] for entry in payload["components"]] == ["late", "seen"]
+    assert payload["removed"] == [{"id": "gone", "name": "gone"}]
+
+
+def test_since_without_window_returns_only_later_changes():
+    cursor = datetime(2026, 1, 1, 12, 0, 0)
+    index = loaded_index({
+        "before": (cursor - timedelta(seconds=5), {"id": "before"}),
+        "after": (cursor + timedelta(seconds=1), {"id": "after"}),
+    }, since_window=0)
+
+    body, _ = index.manifest(since=cursor)
+    assert [entry["id"] for entry in json.loads(body)["components"]] == ["after"]
@@ -0,0 +1,80 @@
+import subprocess
+
+import pytest
+
+from app.git_mirror import GitMirrorCache
+
+pytestmark = pytest.mark.skipif(subprocess.run(["git", "--version"], capture_output=True).returncode != 0,
+                                reason="git is not installed")
+
+
+def git(*args, cwd=None) -> str:
+    return subprocess.run(["git", *args], cwd=cwd, capture_output=True, text=True, check=True).stdout.strip()
+
+
+def commit(work, message: str) -> str:
+    (work / "file.txt").write_text(message)
+    git("add", "file.txt", cwd=work)
+    git("-c", "user.name=test", "-c", "user.email=test@example.com", "commit", "-q", "-m", message, cwd=work)
+    return git("rev-parse", "HEAD", cwd=work)
+
+
+@pytest.fixture
+def remote(tmp_path):
+    """A local bare repository and a working copy that pushes to it"""
+    bare = tmp_path / "remote.git"
+    git("init", "-q", "--bare", "-b", "main", str(bare))
+    work = tmp_path / "work"
+    git("clone", "-q", str(bare), str(work))
+    git("checkout", "-q", "-b", "main", cwd=work)
+    return bare, work
+
+
+def test_checkout_follows_new_commits(tmp_path, remote):
+    bare, work = remote
+    cache = GitMirrorCache(str(tmp_path / "mirrors"))
+    first = commit(work, "first")
+    git("push", "-q", "origin", "main", cwd=work)
+
+    assert cache.checkout(str(bare), "main", tmp_path / "a", cache.ls_remote(str(bare), "main")) == first
+
+    second = commit(work, "second")
+    git("push", "-q", "origin", "main", cwd=work)
+    head = cache.ls_remote(str(bare), "main")
+    assert head == second
+    assert cache.checkout(str(bare), "main", tmp_path / "b", head) == second
+    assert (tmp_path / "b" / "file.txt").read_text() == "second"
+    assert cache.stats()["clones"] == 1 and cache.stats()["fetches"] == 1
+
+
+def test_checkout_after_force_push_to_a_cached_commit(tmp_path, remote):
+    bare, work = remote
+    cache = GitMirrorCache(str(tmp_path / "mirrors"))
+    first = commit(work, "first")
+    git("push", "-q", "origin", "main", cwd=work)
+    second = commit(work, "second")
+    git("push", "-q", "origin", "main", cwd=work)
+    assert cache.checkout(str(bare), "main", tmp_path / "a", second) == second
+
+    # The remote goes back to a commit the mirror already has, so no fetch happens
+    git("reset", "-q", "--hard", first, cwd=work)
+    git("push", "-q", "--force", "origin", "main", cwd=work)
+    head = cache.ls_remote(str(bare), "main")
+    assert head == first
+
+    assert cache.checkout(str(bare), "main", tmp_path / "b", head) == first
+    assert (tmp_path / "b" / "file.txt").read_text() == "first"
+    assert git("rev-parse", "--abbrev-ref", "HEAD", cwd=tmp_path / "b") == "main"
+    assert cache.stats()["hits"] == 1
+
+
+def test_checkout_without_expected_sha_uses_the_fetched_branch_head(tmp_path, remote):
+    bare, work = remote
+    cache = GitMirrorCache(str(tmp_path / "mirrors"))
+    commit(work, "first")
+    git("push", "-q", "origin", "main", cwd=work)
+    cache.checkout(str(bare), "main", tmp_path / "a")
+    second = commit(work, "second")
+    git("push", "-q", "origin", "main", cwd=work)
+
+    assert cache.checkout(str(bare), "main", tmp_path / "b") == second
@@ -0,0 +1,54 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from app import workspaces
+from app.workspaces import claim_workspace, release_workspace, workspace_in_use
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+@pytest.fixture
+def lock_dir(tmp_path, monkeypatch):
+    path = tmp_path / "locks"
+    monkeypatch.setattr(workspaces, "WORKSPACE_LOCK_DIR", path)
+    return path
+
+
+def test_claim_until_release(tmp_path, lock_dir):
+    workspace = tmp_path / "plugin_build_0001"
+    assert not workspace_in_use(workspace)
+
+    claim_workspace(workspace)
+    assert workspace_in_use(workspace)
+    assert str(workspace) in workspaces.active_workspaces()
+
+    release_workspace(workspace)
+    assert not workspace_in_use(workspace)
+    assert not (lock_dir / "plugin_build_0001.lock").exists()
+
+
+def test_claim_held_by_another_process(tmp_path, lock_dir):
+    workspace = tmp_path / "plugin_build_0002"
+    script = (
+        "import sys; from pathlib import Path; from app.workspaces import claim_workspace;"
+        f"claim_workspace(Path({str(workspace)!r})); print('claimed', flush=True); sys.stdin.read()"
+    )
+    owner = subprocess.Popen(
+        [sys.executable, "-c", script], cwd=ROOT, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True,
+        env={**os.environ, "WORKSPACE_LOCK_DIR": str(lock_dir)},
+    )
+    try:
+        assert owner.stdout.readline().strip() == "claimed"
+        assert str(workspace) not in workspaces.active_workspaces()
+        assert workspace_in_use(workspace)
+    finally:
+        owner.stdin.close()
+        owner.wait(timeout=10)
+
+    # The owner exited without releasing: its lock file remains but nobody holds it
+    assert (lock_dir / "plugin_build_0002.lock").exists()
+    assert not workspace_in_use(workspace)